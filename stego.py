@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Dependencies:
-    pip install Pillow
+    pip install Pillow numpy
 """
 # Written by: Levi Torres, Lawrence Skergan, Andrew Kolb, Ryan Hunt
 # Project Start: 02/07/2025
@@ -15,163 +15,3334 @@ Dependencies:
 #     python stego.py extract -s out.bmp -o recovered.bin -M 2
 
 import argparse
-import time
+import asyncio
+import cProfile
+import csv
+import hashlib
+import importlib
+import io
+import json
+import math
+import mmap
+import os
+import platform
+import pstats
+import shutil
+import struct
 import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from urllib.parse import parse_qsl, urlsplit
+
+# pixels examined per step by the incremental decoder
+CHUNK_PIXELS = 1 << 16
+
+# bytes per read and write when streaming messages through files and pipes
+IO_BLOCK = 1 << 20
+
+# samples per row strip read, embedded and written by the strip-wise engine
+STRIP_SAMPLES = 1 << 20
+
+# images smaller than this are decoded in-process; a pool would cost more than it saves
+PARALLEL_MIN_SAMPLES = 8 * STRIP_SAMPLES
+
+# run lengths tried by `--min-run auto`, and the leading samples of a strip-read
+# image it scores them on (the header region; only a checksum is read past it)
+AUTO_MIN_RUNS = range(1, 17)
+DETECT_SAMPLES = 1 << 20
+
+# extended header: this top byte in the first 32-bit word (a length no cover could
+# hold) is followed by version, flag and codec bytes and then the real length
+HEADER_MAGIC = 0xE5
+HEADER_VERSION = 1
+FLAG_CONCATENATED = 0x01  # channel planes stored one after another, not interleaved
+FLAG_SHARD = 0x02         # the length is followed by a shard manifest
+FLAG_CRC32 = 0x04         # ... and then by a CRC32 of the stored payload
+FLAG_BLAKE2 = 0x08        # ... or by a 16-byte BLAKE2b digest of it
+FLAG_CONTAINER = 0x10     # the payload is a multi-file container (see pack_container)
+
+# payload checksums: header flag and digest size in bytes
+CHECKSUMS = {'none': (0, 0), 'crc32': (FLAG_CRC32, 4), 'blake2': (FLAG_BLAKE2, 16)}
+
+# shard manifest: shard index, total shards, first 8 bytes of the message's sha256
+SHARD_MANIFEST = struct.Struct('>HH8s')
+
+# container index: entry count and the checksum flag of the entry digests, then per
+# entry its name and codec, stored size, original size and run offset in samples
+CONTAINER_HEAD = struct.Struct('>HB')
+CONTAINER_ENTRY = struct.Struct('>BIIQ')
+
+# payload compression applied before the RLE encoder, by header codec id
+CODECS = {'none': 0, 'zlib': 1, 'bz2': 2, 'lzma': 3}
+
+# image modes whose samples can carry LSB runs, and how channels are ordered
+COVER_MODES = ('L', 'RGB', 'RGBA', 'I;16')
+BMP_MODES = ('L', 'RGB')
+LAYOUTS = ('interleaved', 'concatenated')
+
+# cover index written into each directory scanned by `catalog`
+CATALOG_NAME = '.stego-catalog.json'
+CATALOG_VERSION = 3
+
+# decoded cover bytes each process keeps in its CoverCache (serve --cache-mb)
+COVER_CACHE_BYTES = 256 << 20
+
+# per-directory cache of cover-independent `analyze` statistics, keyed by sha256
+ANALYSIS_NAME = '.stego-analysis.json'
+ANALYSIS_VERSION = 2
+
+# bundled corpus used by `bench`
+TESTFILES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testfiles')
+
+# dependency check (Pillow is imported lazily by _pil())
+try:
+    import numpy as np
+except ImportError:
+    if __name__ != '__main__':
+        raise
+    print("Error: dependency 'numpy' not installed. Please install by running: pip install numpy",
+          file=sys.stderr)
+    sys.exit(1)
+
+Image = None
+
+
+class StegoError(Exception):
+    """Raised by hide()/extract() for bad input; main() reports it and exits."""
+
+
+class ImageFormatError(StegoError):
+    """The image is not one the LSB scheme can use (e.g. not 8-bit grayscale)."""
+
+
+class CapacityError(StegoError):
+    """The cover has fewer pixels than the payload's runs need."""
+
+
+class NoPayloadError(StegoError):
+    """No length header could be decoded from the image."""
+
+
+class Stats:
+    """
+    Per-stage timings and counters for one hide/extract call.
+
+    `stages` maps stage name → seconds and `counters` holds bytes, pixels, runs and
+    LSB flips. If `profile` names a stage ('*' for all), that stage also runs under
+    cProfile and its profiler is kept in `profiles`. Engines take stats=None by
+    default and then skip all of this.
+    """
+
+    def __init__(self, profile=None):
+        self.stages = {}
+        self.counters = {}
+        self.profile = profile
+        self.profiles = {}
+
+    @contextmanager
+    def stage(self, name):
+        # a stage entered repeatedly (per block) keeps adding to one profiler
+        prof = None
+        if self.profile in (name, '*'):
+            prof = self.profiles.get(name) or cProfile.Profile()
+        start = time.perf_counter()
+        if prof:
+            prof.enable()
+        try:
+            yield
+        finally:
+            if prof:
+                prof.disable()
+                self.profiles[name] = prof
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, n):
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def as_dict(self):
+        return {'stages': dict(self.stages), 'total_s': sum(self.stages.values()),
+                'counters': dict(self.counters)}
+
+
+def _stage(stats, name):
+    return stats.stage(name) if stats else nullcontext()
+
+
+def _pil():
+    # Pillow is imported on first use, so the module loads (and fails) cleanly without it
+    global Image
+    if Image is None:
+        try:
+            from PIL import Image as pil_image
+        except ImportError:
+            raise StegoError("dependency 'Pillow' not installed. Please install by running: pip install Pillow")
+        Image = pil_image
+    return Image
+
+
+def read_message(path, limit=None):
+    """
+    Reads a message file, or standard input for '-', in IO_BLOCK reads.
+    Raises CapacityError as soon as more than `limit` bytes arrive, so an
+    oversized pipe is refused without buffering all of it.
+    """
+    buf = bytearray()
+    try:
+        f = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    except OSError as e:
+        raise StegoError(f"cannot open message file '{path}': {e}")
+    try:
+        while True:
+            block = f.read(IO_BLOCK)
+            if not block:
+                break
+            buf += block
+            if limit is not None and len(buf) > limit:
+                raise CapacityError(f"message exceeds the {limit} bytes the cover could hold")
+    except OSError as e:
+        raise StegoError(f"cannot read message file '{path}': {e}")
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+    return bytes(buf)
+
+
+def file_to_binary_string(filepath):
+    # read an arbitrary file (or '-' for stdin) and return its bits as a '0'/'1' string
+    bits = np.unpackbits(np.frombuffer(read_message(filepath), dtype=np.uint8))
+    return (bits + ord('0')).tobytes().decode('ascii')
+
+
+def find_runs(lsbs):
+    """
+    Splits a 0/1 array into maximal runs of equal bits.
+    Returns (starts, lengths) as int64 arrays, one entry per run.
+    """
+    a = np.asarray(lsbs, dtype=np.uint8).ravel()
+    if a.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    # a run starts at 0 and wherever a bit differs from its predecessor
+    starts = np.concatenate(([0], np.flatnonzero(a[1:] != a[:-1]) + 1))
+    lengths = np.diff(np.append(starts, a.size))
+    return starts, lengths
+
+
+def decode_runs(lsbs, M):
+    """
+    Vectorized RLE decoder over an LSB array.
+    Every run of length >= M yields one bit: even → 0, odd → 1.
+    Returns a uint8 array of the decoded bits.
+    """
+    if M <= 0:
+        raise ValueError("Minimum length M must be greater than 0.")
+    _, lengths = find_runs(lsbs)
+    return (lengths[lengths >= M] & 1).astype(np.uint8)
+
+
+def iter_run_bits(pixels, M, chunk=CHUNK_PIXELS):
+    """
+    Incremental form of decode_runs: walks the pixel array `chunk` pixels at a time
+    and yields the bits of the LSB runs closed so far. A run that reaches the end of
+    a chunk is carried into the next one, so the concatenated output is exactly
+    decode_runs(pixels & 1, M) however the stream is split.
+    """
+    a = np.asarray(pixels).ravel()
+    return iter_block_run_bits((a[pos:pos + chunk] for pos in range(0, a.size, chunk)), M)
+
+
+def iter_block_run_bits(blocks, M):
+    # iter_run_bits over a sample stream that arrives as non-empty blocks (strips)
+    return stitch_runs((summarize_runs(block & 1, M) for block in blocks), M)
+
+
+def _leading_run(lsbs):
+    # length of the run `lsbs` starts with, looking a chunk at a time
+    for pos in range(0, lsbs.size, CHUNK_PIXELS):
+        differs = lsbs[pos:pos + CHUNK_PIXELS] != lsbs[0]
+        if differs.any():
+            return pos + int(differs.argmax())
+    return lsbs.size
+
+
+def summarize_runs(lsbs, M):
+    """
+    Decodes one non-empty chunk of an LSB stream on its own. The first and last
+    runs may continue into the neighbouring chunks, so they are returned as
+    (bit, length) and only the runs strictly inside are decoded:
+    (first_bit, first_len, inner_bits, last_bit, last_len, single), where
+    `single` means the whole chunk is one run.
+    """
+    if lsbs.size <= CHUNK_PIXELS:
+        _, lengths = find_runs(lsbs)
+        inner = lengths[1:-1]
+        return (int(lsbs[0]), int(lengths[0]), (inner[inner >= M] & 1).astype(np.uint8),
+                int(lsbs[-1]), int(lengths[-1]), len(lengths) == 1)
+    # a strip: find the edge runs directly and decode the runs between them in
+    # cache-sized chunks
+    first_len = _leading_run(lsbs)
+    if first_len == lsbs.size:
+        return int(lsbs[0]), first_len, np.zeros(0, dtype=np.uint8), int(lsbs[0]), first_len, True
+    last_len = _leading_run(lsbs[::-1])
+    inner = np.concatenate(list(iter_run_bits(lsbs[first_len:lsbs.size - last_len], M, CHUNK_PIXELS)))
+    return int(lsbs[0]), first_len, inner, int(lsbs[-1]), last_len, False
+
+
+def stitch_runs(summaries, M):
+    """
+    Joins the summarize_runs results of consecutive chunks, merging the runs that
+    cross each boundary, and yields the decoded bits once per chunk (plus the
+    run closed by the end of the stream), exactly as decode_runs would produce
+    them over the whole stream.
+    """
+    if M <= 0:
+        raise ValueError("Minimum length M must be greater than 0.")
+    empty = np.zeros(0, dtype=np.uint8)
+    carry_bit, carry_len = 0, 0
+    for first_bit, first_len, inner, last_bit, last_len, single in summaries:
+        out = []
+        if carry_len and first_bit == carry_bit:
+            first_len += carry_len
+        elif carry_len >= M:
+            out.append(carry_len & 1)
+        if single:
+            # the whole chunk continues one run, which may go on further still
+            carry_bit, carry_len = first_bit, first_len
+            yield np.array(out, dtype=np.uint8)
+            continue
+        if first_len >= M:
+            out.append(first_len & 1)
+        yield np.concatenate((np.array(out, dtype=np.uint8), inner)) if out else inner
+        carry_bit, carry_len = last_bit, last_len
+    # the last run is closed by the end of the image
+    yield np.array([carry_len & 1], dtype=np.uint8) if carry_len >= M else empty
+
+
+class BitReader:
+    """
+    Hands out decoded bits from an LSB sample stream on demand, decoding only as
+    many chunks as the bits asked for so far need. Each chunk arrives from the
+    run decoder as a 0/1 array and is packed into a BitStream buffer right away,
+    so bits not yet handed out take one bit each. Once `total` is set, `progress`
+    is called with (bits_read, total) after each read, ending at total once the
+    last of those bits has been read.
+    """
+
+    def __init__(self, samples, M, progress=None):
+        self.size = np.size(samples)
+        self.M = M
+        self.progress = progress
+        self.total = None
+        self.chunks = 0
+        self.block = CHUNK_PIXELS  # samples behind each decoded chunk
+        self._runs = iter_run_bits(samples, M)
+        self._bits = BitStream()
+        self._pos = 0
+        self._dropped = 0  # bits handed out before the buffer's first bit
+        self._seen = None  # samples delivered, when they arrive in blocks
+        self.ones = 0  # set bits handed out, for sample positions in overwrite streams
+
+    @classmethod
+    def from_blocks(cls, blocks, size, M, progress=None):
+        # reader over a sample stream of `size` samples delivered in blocks
+        reader = cls(np.zeros(0, dtype=np.uint8), M, progress)
+        reader.size = size
+        reader._seen = 0
+        reader._runs = iter_block_run_bits(reader._tally(blocks), M)
+        return reader
+
+    def _tally(self, blocks):
+        # passes the blocks on, counting the samples decoded so far for `scanned`
+        for block in blocks:
+            self._seen += block.size
+            yield block
+
+    @classmethod
+    def from_run_bits(cls, run_bits, size, M, block=CHUNK_PIXELS):
+        # reader over chunks of bits decoded elsewhere (each from `block` of the
+        # stream's `size` samples), such as iter_parallel_run_bits
+        reader = cls(np.zeros(0, dtype=np.uint8), M)
+        reader.size = size
+        reader.block = block
+        reader._runs = run_bits
+        return reader
+
+    @classmethod
+    def from_bits(cls, bits, size, M):
+        # reader over bits already decoded elsewhere, for a stream of `size` samples
+        return cls.from_run_bits(iter((bits,)), size, M, size)
+
+    def read_packed(self, n):
+        # next n bits as a BitStream, or fewer if the image runs out of runs first
+        if len(self._bits) < self._pos + n:
+            # a view of the unread bits: extending it copies them, so the bits
+            # already handed out keep their buffer
+            buf = self._bits[self._pos:]
+            for bits in self._runs:
+                self.chunks += 1
+                buf.extend(bits)
+                if len(buf) >= n:
+                    break
+            self._dropped += self._pos
+            self._bits, self._pos = buf, 0
+        out = self._bits[self._pos:self._pos + n]
+        self._pos += len(out)
+        self.ones += out.count()
+        if self.progress and self.total:
+            self.progress(min(self.consumed, self.total), self.total)
+        return out
+
+    def read(self, n):
+        # next n bits as a 0/1 array, or fewer if the image runs out of runs first
+        return self.read_packed(n).unpack()
+
+    def read_bytes(self, n):
+        # next n bytes (fewer if the runs give out), a chunk at a time so progress
+        # keeps moving
+        out = bytearray()
+        step = max(CHUNK_PIXELS // 8, 1) * 8
+        while len(out) < n:
+            want = min((n - len(out)) * 8, step)
+            bits = self.read_packed(want)
+            out += bits_to_bytes(bits)
+            if len(bits) < want:
+                break
+        return bytes(out)
+
+    @property
+    def consumed(self):
+        return self._dropped + self._pos
+
+    @property
+    def scanned(self):
+        if self._seen is not None:
+            return self._seen
+        return min(self.chunks * self.block, self.size)
+
+
+def bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big') >> (-len(bits) % 8)
+
+
+def read_header(reader):
+    """
+    Parses the payload header from a BitReader: either the legacy 32-bit length or
+    the extended form (magic, version, flags, codec, then the 32-bit length and,
+    for shards, the shard manifest, then the payload checksum if any).
+    Returns a dict with length, flags, codec, extended, shard (an (index, total,
+    digest) tuple or None) and checksum (a (name, digest) pair or None).
+    Raises ValueError if absent or if the length could not fit in the image at
+    the reader's M, which is what a wrong M usually produces.
+    """
+    word = reader.read(32)
+    if len(word) < 32:
+        raise ValueError("no hidden data found (fewer than 32 header bits)")
+    w = bits_to_int(word)
+    if w >> 24 != HEADER_MAGIC:
+        header = {'length': w, 'flags': 0, 'codec': 0, 'extended': False, 'shard': None,
+                  'checksum': None}
+        check_length(header, reader)
+        return header
+    version, flags, codec = (w >> 16) & 0xFF, (w >> 8) & 0xFF, w & 0xFF
+    if version != HEADER_VERSION:
+        raise ValueError(f"unsupported header version {version}")
+    word = reader.read(32)
+    if len(word) < 32:
+        raise ValueError("truncated extended header")
+    shard = None
+    if flags & FLAG_SHARD:
+        bits = reader.read(SHARD_MANIFEST.size * 8)
+        if len(bits) < SHARD_MANIFEST.size * 8:
+            raise ValueError("truncated shard manifest")
+        shard = SHARD_MANIFEST.unpack(np.packbits(bits).tobytes())
+    checksum = None
+    for name, (flag, size) in CHECKSUMS.items():
+        if flag and flags & flag:
+            bits = reader.read(size * 8)
+            if len(bits) < size * 8:
+                raise ValueError("truncated payload checksum")
+            checksum = (name, np.packbits(bits).tobytes())
+    header = {'length': bits_to_int(word), 'flags': flags, 'codec': codec, 'extended': True,
+              'shard': shard, 'checksum': checksum}
+    check_length(header, reader)
+    return header
+
+
+def check_length(header, reader):
+    # fail fast: every payload bit still to come needs a run of at least M samples
+    room = max(reader.size // reader.M - reader.consumed, 0) // 8
+    if header['length'] > room:
+        raise ValueError(f"header claims {header['length']} bytes but this image holds at most "
+                         f"{room} at M={reader.M} (wrong M, or no hidden data)")
+
+
+def build_header(length, flags=0, extended=False, codec=0, shard=None, checksum=None):
+    # legacy 32-bit length unless flags, a codec, a shard, a checksum (or the caller)
+    # need the extended form; `checksum` is a (name, digest) pair
+    if shard is not None:
+        flags |= FLAG_SHARD
+    if checksum is not None:
+        flags |= CHECKSUMS[checksum[0]][0]
+    if not (flags or codec or extended):
+        return length.to_bytes(4, 'big')
+    header = bytes([HEADER_MAGIC, HEADER_VERSION, flags, codec]) + length.to_bytes(4, 'big')
+    if shard is not None:
+        header += SHARD_MANIFEST.pack(*shard)
+    if checksum is not None:
+        header += checksum[1]
+    return header
+
+
+class Crc32:
+    # hashlib-style wrapper so CRC32 and BLAKE2b share one streaming interface
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def digest(self):
+        return self.value.to_bytes(4, 'big')
+
+
+def new_checksum(name):
+    if name not in CHECKSUMS or name == 'none':
+        raise StegoError(f"unknown checksum {name!r} (expected one of {', '.join(CHECKSUMS)})")
+    return Crc32() if name == 'crc32' else hashlib.blake2b(digest_size=CHECKSUMS[name][1])
+
+
+def payload_checksum(data, name):
+    # (name, digest) for build_header, or None for 'none'
+    if name == 'none':
+        return None
+    h = new_checksum(name)
+    h.update(data)
+    return name, h.digest()
+
+
+def find_runs_and_convert_to_output_string(s: str, M: int) -> str:
+    """
+    Finds all non-overlapping runs of at least length M in the binary string s.
+    Even-length runs → '0', odd-length runs → '1'.
+    """
+    if M <= 0:
+        raise ValueError("Minimum length M must be greater than 0.")
+    # only equality between neighbours matters, so the raw character codes will do
+    bits = decode_runs(np.frombuffer(s.encode('latin-1'), dtype=np.uint8), M)
+    return (bits + ord('0')).tobytes().decode('ascii')
+
+
+def bits_to_bytes(bits):
+    # pack a 0/1 array or BitStream MSB-first; a trailing partial byte keeps only its own bits
+    full = len(bits) - len(bits) % 8
+    if isinstance(bits, BitStream):
+        return bits[:full].tobytes() + bits_to_bytes(bits[full:].unpack())
+    out = np.packbits(bits[:full]).tobytes()
+    if full < len(bits):
+        tail = 0
+        for b in bits[full:]:
+            tail = (tail << 1) | int(b)
+        out += bytes([tail])
+    return out
+
+
+def payload_bits(data, header=None):
+    # header (default: 32-bit big-endian length) followed by the data, as a BitStream
+    if header is None:
+        header = build_header(len(data))
+    return BitStream(header + bytes(data))
+
+
+# set bits per byte value
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1, dtype=np.uint8)
+
+
+class BitStream:
+    """
+    A sequence of bits packed eight to a byte, MSB first, over a bytes-like
+    buffer: one bit of memory per bit where a 0/1 array takes a byte and a
+    '0'/'1' string or list of ints far more. Slices are views sharing the
+    buffer; extending one copies it first, so a view never changes under
+    another. Bits go in as bytes or 0/1 arrays and come out as bytes or 0/1
+    uint8 blocks for the vectorized encoders.
+    """
+
+    def __init__(self, data=b'', nbits=None):
+        # wraps `data` without copying; `nbits` (default: all of it) counts from its first bit
+        self._buf = data
+        self._off = 0
+        self._len = len(data) * 8 if nbits is None else nbits
+        self._owned = False  # a bytearray only this stream uses, which extend may grow
+
+    @classmethod
+    def from_array(cls, bits):
+        # packs a 0/1 array (or list)
+        bits = np.asarray(bits, dtype=np.uint8)
+        return cls(bytearray(np.packbits(bits).tobytes()), len(bits))
+
+    @classmethod
+    def of(cls, bits):
+        # `bits` as a BitStream: passed through, packed from a 0/1 array, or wrapping bytes
+        if isinstance(bits, cls):
+            return bits
+        if isinstance(bits, (bytes, bytearray, memoryview)):
+            return cls(bits)
+        return cls.from_array(bits)
+
+    def __len__(self):
+        return self._len
+
+    def __repr__(self):
+        return f"<BitStream of {self._len} bits>"
+
+    def _bytes(self):
+        return np.frombuffer(self._buf, dtype=np.uint8)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._len)
+            if step != 1:
+                return BitStream.from_array(self.unpack()[key])
+            view = BitStream(self._buf, max(stop - start, 0))
+            view._off = self._off + start
+            return view
+        i = key + self._len if key < 0 else key
+        if not 0 <= i < self._len:
+            raise IndexError("bit index out of range")
+        i += self._off
+        return (self._buf[i >> 3] >> (7 - (i & 7))) & 1
+
+    def unpack(self, start=0, stop=None):
+        # bits [start, stop) as a 0/1 uint8 array
+        stop = self._len if stop is None else min(stop, self._len)
+        if start >= stop:
+            return np.zeros(0, dtype=np.uint8)
+        a, b = self._off + start, self._off + stop
+        bits = np.unpackbits(self._bytes()[a >> 3:(b + 7) >> 3])
+        return bits[a & 7:(a & 7) + b - a]
+
+    def blocks(self, size=None):
+        # the bits as 0/1 uint8 arrays of `size` (default CHUNK_PIXELS) bits, the last maybe shorter
+        size = size or CHUNK_PIXELS
+        for pos in range(0, self._len, size):
+            yield self.unpack(pos, pos + size)
+
+    def count(self):
+        # number of set bits
+        if not self._len:
+            return 0
+        a, b = self._off, self._off + self._len
+        edge = self._bytes()[a >> 3:((b - 1) >> 3) + 1]
+        ones = int(POPCOUNT[edge].sum(dtype=np.int64))
+        ones -= int(POPCOUNT[edge[0] >> (8 - (a & 7))]) if a & 7 else 0
+        ones -= int(POPCOUNT[edge[-1] & ((1 << (-b % 8)) - 1)])
+        return ones
+
+    def tobytes(self):
+        # the bits packed MSB first, a final partial byte padded with zero bits
+        if self._off & 7:
+            # whole bytes per block, so only the last one is padded
+            size = max(8, CHUNK_PIXELS & ~7)
+            return b''.join(np.packbits(block).tobytes() for block in self.blocks(size))
+        data = bytes(self._buf[self._off >> 3:(self._off + self._len + 7) >> 3])
+        if self._len & 7:
+            data = data[:-1] + bytes([data[-1] & (0xFF << (8 - (self._len & 7))) & 0xFF])
+        return data
+
+    def _own(self):
+        # copy the bits into a bytearray of our own before they are extended
+        if not self._owned:
+            self._buf, self._off, self._owned = bytearray(self.tobytes()), 0, True
+
+    def extend(self, bits):
+        # appends a BitStream or 0/1 array
+        self._own()
+        for block in (bits.blocks() if isinstance(bits, BitStream) else (np.asarray(bits, dtype=np.uint8),)):
+            r = self._len & 7
+            if r:
+                # merge with the final partial byte
+                block = np.concatenate((self.unpack(self._len - r), block))
+                del self._buf[-1]
+            self._buf += np.packbits(block).tobytes()
+            self._len += len(block) - r
+
+
+def _codec_module(codec):
+    # zlib is always built in; bz2 and lzma are optional parts of a Python build
+    if codec == 'zlib':
+        return zlib
+    try:
+        return importlib.import_module(codec)
+    except ImportError:
+        raise StegoError(f"codec {codec!r} is not available in this Python build")
+
+
+def compress_payload(data, codec='none'):
+    """
+    Runs `data` through a compression codec before it is embedded. 'auto' tries
+    every available codec and keeps the smallest result, which may be 'none'
+    (a codec also costs the 4 extra bytes of the extended header).
+    Returns (codec_name, payload_bytes).
+    """
+    if codec == 'auto':
+        results = []
+        for name in CODECS:
+            try:
+                results.append(compress_payload(data, name))
+            except StegoError:
+                continue
+        return min(results, key=lambda r: len(r[1]) + (4 if r[0] != 'none' else 0))
+    if codec not in CODECS:
+        raise StegoError(f"unknown codec {codec!r} (expected one of {', '.join(CODECS)}, auto)")
+    if codec == 'none':
+        return codec, bytes(data)
+    level = {'zlib': {'level': 9}, 'bz2': {'compresslevel': 9}, 'lzma': {'preset': 9}}[codec]
+    return codec, _codec_module(codec).compress(bytes(data), **level)
+
+
+def decompress_payload(data, codec_id):
+    """
+    Inverts compress_payload for the codec id stored in the header, feeding the
+    decompressor in chunks. Raises NoPayloadError for an unknown codec or a stream
+    that does not decode cleanly (e.g. extraction with the wrong M).
+    """
+    blocks = (data[pos:pos + CHUNK_PIXELS] for pos in range(0, len(data), CHUNK_PIXELS))
+    return b''.join(iter_decompress(blocks, codec_id))
+
+
+def iter_decompress(blocks, codec_id, stats=None):
+    # streaming form of decompress_payload over an iterable of compressed blocks; only
+    # the decompressor calls count toward the 'decompress' stage, not producing `blocks`
+    names = {v: k for k, v in CODECS.items()}
+    if codec_id not in names:
+        raise NoPayloadError(f"payload uses unknown codec id {codec_id}")
+    codec = names[codec_id]
+    if codec == 'none':
+        yield from blocks
+        return
+    mod = _codec_module(codec)
+    errors = (zlib.error, OSError, EOFError, ValueError)
+    if codec == 'zlib':
+        d = zlib.decompressobj()
+    elif codec == 'bz2':
+        d = mod.BZ2Decompressor()
+    else:
+        d = mod.LZMADecompressor()
+        errors += (mod.LZMAError,)
+    try:
+        for block in blocks:
+            with _stage(stats, 'decompress'):
+                piece = d.decompress(block)
+            yield piece
+        if codec == 'zlib':
+            with _stage(stats, 'decompress'):
+                piece = d.flush()
+            yield piece
+    except errors as e:
+        raise NoPayloadError(f"{codec} payload is corrupt: {e}")
+    if not d.eof:
+        raise NoPayloadError(f"{codec} payload is truncated")
+
+
+def encode_runs(bits, M, first):
+    """
+    Vectorized RLE encoder: bit b becomes a run of M + b equal LSBs.
+    Runs alternate starting from `first`, so each one is maximal.
+    Returns the LSB stream as a uint8 array of length sum(M + b).
+    """
+    lengths = M + bits.astype(np.int64)
+    values = (np.arange(len(bits)) & 1).astype(np.uint8) ^ first
+    return np.repeat(values, lengths)
+
+
+def needed_pixels(bits, M):
+    # pixels consumed by the RLE stream: sum(M + b) over header and data bits
+    bits = BitStream.of(bits)
+    return len(bits) * M + bits.count()
+
+
+def max_payload_bytes(samples, M, header_bytes=4):
+    # largest payload that fits whatever its bits are (every bit costing M + 1)
+    return max(samples // (8 * (M + 1)) - header_bytes, 0)
+
+
+def embed_lsbs(pixels, bits, M, progress=None):
+    """
+    Writes the RLE stream for `bits` (a BitStream or 0/1 array) into the LSBs of the
+    flat sample array `pixels` (any unsigned integer dtype) in place and returns the
+    number of pixels used. `pixels` may be a prefix of the image as long as it
+    extends one pixel past the stream (or to the image end).
+    The runs are encoded CHUNK_PIXELS bits at a time, calling progress(done, needed)
+    after each chunk when given.
+    """
+    bits = BitStream.of(bits)
+    needed = needed_pixels(bits, M)
+    first = pixels[0] & 1
+
+    # Replace only the LSB, keep other bits intact; runs alternate across chunks
+    clear = ~pixels.dtype.type(1)
+    pos = 0
+    for k, block in enumerate(bits.blocks(CHUNK_PIXELS)):
+        stego_lsbs = encode_runs(block, M, first ^ ((k * CHUNK_PIXELS) & 1))
+        end = pos + len(stego_lsbs)
+        pixels[pos:end] &= clear
+        pixels[pos:end] |= stego_lsbs
+        pos = end
+        if progress:
+            progress(end, needed)
+
+    # Close the last run: if the next cover pixel carries the same LSB the run
+    # would merge with it and decode with the wrong parity
+    if len(bits) and needed < pixels.size and (pixels[needed] & 1) == first ^ ((len(bits) - 1) & 1):
+        pixels[needed] ^= 1
+    return needed
+
+
+def calculate_minimum_length(bits, M):
+    # shortest stream holding `bits` as runs of length >= M whose parity is the bit
+    bits = BitStream.of(bits)
+    ones = bits.count()
+    return len(bits) * M + (ones if M % 2 == 0 else len(bits) - ones)
+
+
+def adaptive_flips(lsbs, bits, M, progress=None):
+    """
+    Adaptive embedder: reuses the cover's own LSB runs and only adjusts the parity
+    of the runs that carry payload bits (the approach of the v4 prototype's
+    hide_message_and_obfuscate, done in one pass over the run list).
+
+    Walking the runs of length >= M in order, a run whose parity differs from its bit
+    is fixed by flipping one pixel:
+      - longer than M: its last pixel joins the next run
+      - exactly M: it takes the first pixel of the next run, or, when that run is a
+        single pixel, absorbs it and the run after and is checked again
+    Every flip is at or after the current run, so earlier runs are never disturbed.
+    `bits` is a BitStream or 0/1 array. Returns the sorted positions of the LSBs to flip.
+    """
+    if M <= 0:
+        raise ValueError("Minimum length M must be greater than 0.")
+    bits = BitStream.of(bits)
+    lsbs = np.asarray(lsbs, dtype=np.uint8).ravel()
+    _, lengths = find_runs(lsbs)
+
+    # quick rejection: the runs the cover already has, and the shortest possible stream
+    available = int(np.count_nonzero(lengths >= M))
+    if available < len(bits) or lsbs.size < calculate_minimum_length(bits, M):
+        raise CapacityError(f"cover has {available} runs of length >= {M}; "
+                            f"the payload needs {len(bits)}")
+
+    # the run ends and the bits come out as lists a chunk at a time, never all at
+    # once, and the flips collect in a packed int64 array
+    cum = np.cumsum(lengths)
+    nbits, R = len(bits), len(cum)
+    window = CHUNK_PIXELS + 3  # run k and the two after it are always in the list
+    ends, ebase, elimit = [], 0, 0
+    blocks = bits.blocks(CHUNK_PIXELS)
+    chunk, base, climit = [], 0, 0
+    flips = array('q')
+    pos = k = i = 0
+    while i < nbits:
+        if k >= R:
+            raise CapacityError(f"cover ran out of runs of length >= {M} after {i} of {nbits} bits")
+        if k >= elimit:
+            ebase, ends = k, cum[k:k + window].tolist()
+            elimit = k + len(ends) - 2
+        end = ends[k - ebase]
+        if end - pos < M:
+            pos, k = end, k + 1
+            continue
+        if i >= climit:
+            base, chunk = climit, next(blocks).tolist()
+            climit = base + len(chunk)
+        while (end - pos) & 1 != chunk[i - base]:
+            if end - pos > M:
+                end -= 1
+                flips.append(end)
+            elif k + 1 < R and ends[k + 1 - ebase] - end >= 2:
+                flips.append(end)
+                end += 1
+            elif k + 1 < R:
+                flips.append(end)
+                k = min(k + 2, R - 1)
+                if k >= elimit:
+                    ebase, ends = k, cum[k:k + window].tolist()
+                    elimit = k + len(ends) - 2
+                end = ends[k - ebase]
+            else:
+                raise CapacityError(f"cover ran out of runs of length >= {M} after {i} of {nbits} bits")
+        pos, k, i = end, k + 1, i + 1
+        if progress and (i % CHUNK_PIXELS == 0 or i == nbits):
+            progress(i, nbits)
+    return np.frombuffer(flips, dtype=np.int64)
+
+
+def bmp_pixel_view(mm):
+    """
+    Parses an uncompressed 8-bit grayscale BMP held in a writable buffer and returns
+    a (height, width) uint8 view of its pixel array in top-to-bottom row order.
+    Row padding is sliced away and bottom-up files are viewed upside down, so the
+    view's row-major order matches Pillow's getdata() order.
+    """
+    if mm[:2] != b'BM':
+        raise ValueError("not a BMP file")
+    offset, = struct.unpack_from('<I', mm, 10)
+    dib_size, width, height = struct.unpack_from('<Iii', mm, 14)
+    if dib_size < 40:
+        raise ValueError("unsupported BMP header (OS/2 BITMAPCOREHEADER)")
+    bpp, compression = struct.unpack_from('<HI', mm, 28)
+    if bpp != 8 or compression != 0:
+        raise ValueError("cover must be an uncompressed 8-bit BMP for in-place embedding")
+
+    # palette indices are only gray values if the palette is the identity ramp; the
+    # palette is copied out so a failed check leaves no view of `mm` behind
+    colors, = struct.unpack_from('<I', mm, 46)
+    colors = colors or 256
+    palette = np.frombuffer(mm[14 + dib_size:14 + dib_size + colors * 4], dtype=np.uint8)
+    ramp = np.arange(colors, dtype=np.uint8)
+    palette = palette.reshape(colors, 4)[:, :3]
+    if not (palette == ramp[:, None]).all():
+        raise ValueError("cover must be an 8-bit grayscale BMP for LSB embedding")
+
+    rows = abs(height)
+    stride = (width + 3) & ~3  # rows are padded to 4-byte boundaries
+    view = np.frombuffer(mm, dtype=np.uint8, count=stride * rows, offset=offset)
+    view = view.reshape(rows, stride)[:, :width]
+    return view[::-1] if height > 0 else view
+
+
+def hide_bmp_inplace(bits, stego_file, M, progress=None, mode='overwrite'):
+    """
+    Embeds `bits` by memory-mapping the BMP at `stego_file` and rewriting only the
+    pixel rows that hold payload runs. Returns the number of pixels used (for the
+    adaptive mode, the number of LSBs flipped).
+    """
+    with open(stego_file, 'r+b') as f, mmap.mmap(f.fileno(), 0) as mm:
+        view = bmp_pixel_view(mm)
+        try:
+            height, width = view.shape
+            if mode == 'adaptive':
+                flips = adaptive_flips(view & 1, bits, M, progress)
+                view[flips // width, flips % width] ^= 1
+                used = len(flips)
+            else:
+                used = needed_pixels(bits, M)
+                if used > height * width:
+                    raise ValueError(f"cover capacity ({height * width}) insufficient; need {used}.")
+
+                # rows holding the runs plus the pixel that closes the last one
+                used_rows = min(height, used // width + 1)
+                prefix = view[:used_rows].copy().ravel()
+                embed_lsbs(prefix, bits, M, progress)
+                view[:used_rows] = prefix.reshape(used_rows, width)
+        finally:
+            del view  # release the exported buffer before the map is closed
+        mm.flush()
+    return used
+
+
+def file_sha256(path, block=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def update_catalog(cover_dir):
+    """
+    Brings the cover index in `cover_dir` up to date and returns (covers, changed, removed).
+    Only files whose size or mtime differ from the index are opened, and only their
+    headers are read: dimensions, mode, format (with the BMP compression type) and
+    pixel capacity come from Image.open without decoding. Files Pillow cannot
+    open are recorded with mode None.
+    """
+    index_path = os.path.join(cover_dir, CATALOG_NAME)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        # older indexes counted pixels rather than samples; rebuild them
+        covers = index.get('covers', {}) if index.get('version') == CATALOG_VERSION else {}
+    except (OSError, ValueError):
+        covers = {}
+
+    try:
+        files = {e.name: e.stat() for e in os.scandir(cover_dir)
+                 if e.is_file() and e.name != CATALOG_NAME}
+    except OSError as e:
+        raise StegoError(f"cannot scan cover directory '{cover_dir}': {e}")
+
+    removed = [name for name in covers if name not in files]
+    for name in removed:
+        del covers[name]
+
+    changed = 0
+    for name, st in files.items():
+        entry = covers.get(name)
+        if entry and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime_ns:
+            continue
+        path = os.path.join(cover_dir, name)
+        entry = {'size': st.st_size, 'mtime': st.st_mtime_ns,
+                 'width': 0, 'height': 0, 'mode': None, 'format': None, 'capacity': 0}
+        try:
+            with _pil().open(path) as img:
+                entry.update(width=img.width, height=img.height, mode=img.mode,
+                             format=img.format, compression=img.info.get('compression'),
+                             capacity=img.width * img.height * len(img.getbands()))
+            entry['sha256'] = file_sha256(path)
+        except Exception:
+            pass  # not an image; remembered so it is not probed again
+        covers[name] = entry
+        changed += 1
+
+    if changed or removed:
+        tmp = f"{index_path}.{os.getpid()}.tmp"  # concurrent batch workers may refresh too
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'version': CATALOG_VERSION, 'covers': covers}, f, indent=1, sort_keys=True)
+            os.replace(tmp, index_path)
+        except OSError as e:
+            raise StegoError(f"cannot write catalog '{index_path}': {e}")
+    return covers, changed, len(removed)
+
+
+def select_cover(cover_dir, needed, in_place=False, output=None):
+    # smallest indexed cover of a supported mode whose sample capacity fits `needed`;
+    # in-place embedding patches the file itself, so only uncompressed 8-bit
+    # grayscale BMPs qualify, and a BMP `output` only stores BMP_MODES
+    bmp = output is not None and os.path.splitext(output)[1].lower() in ('.bmp', '.dib')
+    covers, _, _ = update_catalog(cover_dir)
+    fits = [(entry['capacity'], name) for name, entry in covers.items()
+            if entry['mode'] in (BMP_MODES if bmp else COVER_MODES) and entry['capacity'] >= needed
+            and (not in_place or (entry['mode'] == 'L' and entry['format'] == 'BMP'
+                                  and entry.get('compression') == 0))]
+    if not fits:
+        kind = ('uncompressed 8-bit grayscale BMP ' if in_place
+                else f"{'/'.join(BMP_MODES)} " if bmp else '')
+        raise StegoError(f"no {kind}cover in '{cover_dir}' has capacity for {needed} pixels")
+    return os.path.join(cover_dir, min(fits)[1])
+
+
+def cataloged_covers(cover_dir):
+    # indexed covers of a supported mode, largest first (fewest shards)
+    covers, _, _ = update_catalog(cover_dir)
+    usable = [(-entry['capacity'], name) for name, entry in covers.items()
+              if entry['mode'] in COVER_MODES]
+    return [os.path.join(cover_dir, name) for _, name in sorted(usable)]
+
+
+def catalog(cover_dir):
+    covers, changed, removed = update_catalog(cover_dir)
+    for name, entry in sorted(covers.items(), key=lambda kv: (kv[1]['capacity'], kv[0])):
+        if entry['mode'] is not None:
+            print(f"  {name:<40} {entry['width']:>6}x{entry['height']:<6} {entry['mode']:<5} "
+                  f"{entry['capacity']:>10}")
+    print(f"(✓): Catalog '{cover_dir}': {len(covers)} files ({changed} updated, {removed} removed)")
+
+
+def open_image(src):
+    """
+    Opens `src` as a Pillow image: a path or file object, encoded image bytes
+    (bytes, bytearray or memoryview), or an Image that is returned as is.
+    """
+    pil = _pil()
+    if isinstance(src, pil.Image):
+        return src
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        src = io.BytesIO(src)
+    try:
+        return pil.open(src)
+    except Exception as e:
+        raise ImageFormatError(f"cannot open image: {e}")
+
+
+class CachedCover:
+    """
+    A decoded cover held by CoverCache: its mode and size, the pixel array and
+    its LSB plane (uint8), both read-only so every embed can share them. Stands
+    in for the Pillow image in hide_image; np.array(cover) gives a writable copy.
+    """
+
+    def __init__(self, img):
+        self.mode = img.mode
+        self.size = img.size
+        self.width, self.height = img.size
+        self.bands = img.getbands()
+        self.array = np.asarray(img)
+        self.array.flags.writeable = False
+        self.lsbs = (self.array & 1).astype(np.uint8)
+        self.lsbs.flags.writeable = False
+        self.nbytes = self.array.nbytes + self.lsbs.nbytes
+
+    def getbands(self):
+        return self.bands
+
+    def __array__(self, dtype=None, copy=None):
+        # the shared read-only array, unless a copy is asked for (np.array does)
+        if dtype is not None:
+            return self.array.astype(dtype)
+        return self.array.copy() if copy else self.array
+
+
+class CoverCache:
+    """
+    Least-recently-used cache of CachedCover entries by path, for processes that
+    embed into the same covers over and over. An entry is reused while the
+    file's size and mtime are unchanged and decoded again otherwise; entries are
+    evicted oldest first once they hold more than `max_bytes` (a cover bigger
+    than that is decoded but not kept). Not shared between processes.
+    """
+
+    def __init__(self, max_bytes=COVER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._entries = OrderedDict()  # abspath → ((size, mtime_ns), CachedCover)
+
+    def get(self, path):
+        key = os.path.abspath(path)
+        try:
+            st = os.stat(key)
+        except OSError as e:
+            raise ImageFormatError(f"cannot open image: {e}")
+        stamp = (st.st_size, st.st_mtime_ns)
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] == stamp:
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return cached[1]
+        self.counters['misses'] += 1
+        if cached is not None:
+            self._drop(key)
+        entry = CachedCover(open_image(key))
+        if entry.nbytes <= self.max_bytes:
+            self._entries[key] = (stamp, entry)
+            self.bytes += entry.nbytes
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.counters['evictions'] += 1
+        return entry
+
+    def _drop(self, key):
+        _, entry = self._entries.pop(key)
+        self.bytes -= entry.nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return dict(self.counters, entries=len(self._entries), bytes=self.bytes,
+                    max_bytes=self.max_bytes)
+
+
+# this process's cover cache (used by serve workers)
+cover_cache = CoverCache()
+
+
+EMBED_MODES = ('overwrite', 'adaptive')
+
+
+def sample_stream(arr, layout):
+    """
+    Flattens an image array into the sample order the LSB stream runs through:
+    pixel by pixel with channels interleaved (a view), or each channel plane in
+    turn for 'concatenated' (a copy). Single-channel images are the same either way.
+    """
+    if arr.ndim == 3 and layout == 'concatenated':
+        return np.ascontiguousarray(arr.transpose(2, 0, 1)).ravel()
+    return arr.reshape(-1)
+
+
+def restore_stream(samples, shape, layout):
+    # inverse of sample_stream
+    if len(shape) == 3 and layout == 'concatenated':
+        height, width, channels = shape
+        return np.ascontiguousarray(samples.reshape(channels, height, width).transpose(1, 2, 0))
+    return samples.reshape(shape)
+
+
+def hide_image(data, cover, M=2, progress=None, stats=None, mode='overwrite',
+               layout='interleaved', compress='none', shard=None, checksum='none', container=False):
+    """
+    Embeds the bytes-like `data` into the Pillow image (or CachedCover) `cover`
+    and returns the stego image. Raises ImageFormatError for unsupported modes and CapacityError when
+    the cover is too small.
+    mode 'overwrite' writes fresh runs of M + b pixels from the start of the image;
+    'adaptive' keeps the cover's runs and only fixes their parity (fewer flips,
+    less capacity). Both decode with the same extract().
+    Multi-channel covers (RGB, RGBA) use every channel's LSB plane as one stream,
+    interleaved per pixel or concatenated plane by plane; the choice goes into an
+    extended header. 'L' covers keep the legacy 32-bit length header unless
+    `compress` names a codec (or 'auto'), which is recorded there as well.
+    With `shard` (index, total, digest) the header carries a shard manifest and
+    `data` is one slice of a payload that `compress` was already applied to.
+    `checksum` ('crc32' or 'blake2') adds a digest of the stored payload.
+    `container` marks `data` as a pack_container payload, which needs the
+    overwrite mode for its run offsets to hold.
+    """
+    if mode not in EMBED_MODES:
+        raise StegoError(f"unknown embedding mode {mode!r} (expected one of {', '.join(EMBED_MODES)})")
+    if container and mode != 'overwrite':
+        raise StegoError("a multi-file container needs the overwrite mode")
+    if layout not in LAYOUTS:
+        raise StegoError(f"unknown channel layout {layout!r} (expected one of {', '.join(LAYOUTS)})")
+    if cover.mode not in COVER_MODES:
+        raise ImageFormatError(f"cover mode {cover.mode} is not supported for LSB embedding "
+                               f"(use {', '.join(COVER_MODES)})")
+    with _stage(stats, 'decode'):
+        arr = np.array(cover)  # writable copy, (h, w) or (h, w, channels)
+        pixels = sample_stream(arr, layout)
+    multi = arr.ndim == 3
+    flags = FLAG_CONCATENATED if multi and layout == 'concatenated' else 0
+    flags |= FLAG_CONTAINER if container else 0
+    message_bytes = len(data)
+    if shard is None:
+        with _stage(stats, 'compress'):
+            codec, data = compress_payload(data, compress)
+    else:
+        codec = compress
+    with _stage(stats, 'checksum'):
+        digest = payload_checksum(data, checksum)
+    with _stage(stats, 'bits'):
+        bits = payload_bits(data, build_header(len(data), flags, multi, CODECS[codec], shard, digest))
+    if stats:
+        stats.count('payload_bytes', len(data))
+
+    if mode == 'adaptive':
+        with _stage(stats, 'encode'):
+            lsbs = sample_stream(cover.lsbs, layout) if isinstance(cover, CachedCover) else pixels & 1
+            flips = adaptive_flips(lsbs, bits, M, progress)
+            pixels[flips] ^= 1
+        if stats:
+            stats.count('message_bytes', message_bytes)
+            stats.count('payload_bits', len(bits))
+            stats.count('runs_emitted', len(bits))
+            stats.count('pixels', pixels.size)
+            stats.count('pixels_used', flips[-1] + 1 if len(flips) else 0)
+            stats.count('lsb_flips', len(flips))
+    else:
+        # Capacity check
+        cap = pixels.size
+        needed = needed_pixels(bits, M)
+        if needed > cap:
+            raise CapacityError(f"cover capacity ({cap}) insufficient; need {needed}.")
+
+        # RLE encode on LSB stream; pixels past `needed` keep their cover LSBs
+        if stats:
+            before = pixels[:needed + 1] & 1
+        with _stage(stats, 'encode'):
+            embed_lsbs(pixels, bits, M, progress)
+        if stats:
+            stats.count('message_bytes', message_bytes)
+            stats.count('payload_bits', len(bits))
+            stats.count('runs_emitted', len(bits))
+            stats.count('pixels', cap)
+            stats.count('pixels_used', needed)
+            stats.count('lsb_flips', np.count_nonzero(before != (pixels[:needed + 1] & 1)))
+
+    # Pillow wraps the buffer directly
+    arr = restore_stream(pixels, arr.shape, layout)
+    return _pil().frombuffer(cover.mode, cover.size, arr, 'raw', cover.mode, 0, 1)
+
+
+def locate_payload(stego, M=2, workers=1):
+    """
+    Finds the payload header in the Pillow image (or StripReader) `stego` and
+    returns (header, reader), the BitReader positioned at the first payload bit.
+    Multi-channel images are read in each layout until one yields an extended
+    header that names that layout. M may be 'auto' (see detect_min_run).
+    A large StripReader read from raw tiles is decoded on a pool of `workers`
+    processes (None for one per core; see iter_parallel_run_bits).
+    Raises ImageFormatError for unsupported modes and NoPayloadError when no
+    plausible header can be decoded.
+    """
+    if stego.mode not in COVER_MODES:
+        raise ImageFormatError(f"stego image mode {stego.mode} is not supported for LSB extraction "
+                               f"(use {', '.join(COVER_MODES)})")
+    if M == 'auto':
+        M = detect_min_run(stego)
+    strips = isinstance(stego, StripReader)
+    parallel = (strips and stego.streaming and (workers or os.cpu_count() or 1) > 1
+                and stego.samples >= PARALLEL_MIN_SAMPLES)
+    arr = None if strips else np.asarray(stego)
+    multi = stego.bands > 1 if strips else arr.ndim == 3
+
+    def open_reader(layout):
+        if parallel:
+            block = stego.rows * stego.width * (1 if layout == 'concatenated' else stego.bands)
+            return BitReader.from_run_bits(iter_parallel_run_bits(stego, layout, M, workers),
+                                           stego.samples, M, block)
+        if strips:
+            return BitReader.from_blocks(stego.sample_blocks(layout), stego.samples, M)
+        return BitReader(sample_stream(arr, layout), M)
+
+    error = "no hidden data found"
+    for layout in (LAYOUTS if multi else LAYOUTS[:1]):
+        reader = open_reader(layout)
+        try:
+            header = read_header(reader)
+        except ValueError as e:
+            error = str(e)
+            continue
+        if not multi or (header['extended'] and
+                         bool(header['flags'] & FLAG_CONCATENATED) == (layout == 'concatenated')):
+            return header, reader
+        error = "no hidden data found (no channel layout matches the header)"
+    raise NoPayloadError(error)
+
+
+def detect_min_run(stego, candidates=AUTO_MIN_RUNS):
+    """
+    Finds the M the Pillow image (or StripReader) `stego` was written with. The LSB
+    run lengths are computed once per channel layout and every candidate M only
+    filters them (runs >= M) and parses a header from their parities. Candidates
+    whose header is missing, too long for the image or fails its checksum are
+    dropped; the rest rank by a verified checksum, an extended header, then
+    payload runs of only M or M + 1 (what the overwrite encoder writes; largest
+    such M first).
+    A StripReader is scored on its first DETECT_SAMPLES samples, read a strip at
+    a time; only a checksum that reaches past them is checked by streaming the
+    payload, so memory stays bounded as in extraction.
+    Returns M; raises NoPayloadError when no candidate is plausible, or when
+    several are and none has any of that evidence (a legacy adaptive payload
+    without a checksum), rather than guess.
+    """
+    if stego.mode not in COVER_MODES:
+        raise ImageFormatError(f"stego image mode {stego.mode} is not supported for LSB extraction "
+                               f"(use {', '.join(COVER_MODES)})")
+    strips = isinstance(stego, StripReader)
+    arr = None if strips else np.asarray(stego)
+    multi = stego.bands > 1 if strips else arr.ndim == 3
+    size = stego.samples if strips else arr.size
+    scores = []
+    for layout in (LAYOUTS if multi else LAYOUTS[:1]):
+        if strips:
+            blocks, have = [], 0
+            for block in stego.sample_blocks(layout):
+                blocks.append(block)
+                have += block.size
+                if have >= DETECT_SAMPLES:
+                    break
+            samples = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.uint8)
+        else:
+            samples = sample_stream(arr, layout)
+        whole = samples.size == size
+        _, lengths = find_runs(samples & 1)
+        if not whole:
+            lengths = lengths[:-1]  # the last run may go on past the prefix
+        for M in candidates:
+            runs = lengths[lengths >= M]
+            reader = BitReader.from_bits((runs & 1).astype(np.uint8), size, M)
+            try:
+                header = read_header(reader)
+            except ValueError:
+                continue
+            if multi and not (header['extended'] and
+                              bool(header['flags'] & FLAG_CONCATENATED) == (layout == 'concatenated')):
+                continue
+            nbits = header['length'] * 8
+            end = reader.consumed + nbits
+            if whole and len(runs) < end:
+                continue
+            verified = False
+            if header['checksum']:
+                name, digest = header['checksum']
+                if len(runs) < end:
+                    # the payload goes on past the prefix: stream it strip by strip
+                    reader = BitReader.from_blocks(stego.sample_blocks(layout), size, M)
+                    read_header(reader)
+                data = reader.read_bytes(header['length'])
+                if len(data) < header['length'] or payload_checksum(data, name)[1] != digest:
+                    continue
+                verified = True
+            # overwrite writes only runs of M or M + 1, which a smaller M also decodes
+            # correctly, so that signature picks the largest such M (judged on the
+            # payload runs at hand, all of them unless a prefix was read)
+            head = runs[:end]
+            overwrite = np.count_nonzero(head <= M + 1) >= 0.99 * len(head)
+            scores.append((verified, header['extended'], overwrite, M))
+    if not scores:
+        raise NoPayloadError(f"no hidden data found for any M from {candidates[0]} to {candidates[-1]}")
+    best = max(scores)
+    if not any(best[:3]) and len(scores) > 1:
+        Ms = ', '.join(str(score[-1]) for score in sorted(scores, key=lambda x: x[-1]))
+        raise NoPayloadError(f"cannot tell M apart: {Ms} all yield plausible headers "
+                             f"(pass -M, or hide with --checksum)")
+    return best[-1]
+
+
+def extract_payload(stego, M=2, progress=None, stats=None):
+    """
+    Returns (header, payload_bytes) for the Pillow image `stego`, the payload as
+    stored (still compressed, and only this image's slice for a shard), checked
+    against the header's checksum when it has one. Raises like locate_payload,
+    and NoPayloadError on a checksum mismatch.
+    """
+    # RLE decode on LSB stream, stopping once the payload is complete
+    with _stage(stats, 'rle_decode'):
+        header, reader = locate_payload(stego, M)
+        nbits = header['length'] * 8
+        reader.total = reader.consumed + nbits
+        reader.progress = progress
+        data = reader.read_bytes(header['length'])
+    if stats:
+        stats.count('pixels_scanned', reader.scanned)
+        stats.count('runs_decoded', reader.consumed)
+    if header['checksum'] is not None:
+        with _stage(stats, 'checksum'):
+            name, digest = header['checksum']
+            if payload_checksum(data, name)[1] != digest:
+                raise NoPayloadError(f"payload fails its {name} check (damaged image or wrong M)")
+    if stats:
+        stats.count('pixels', reader.size)
+    return header, data
+
+
+def verify_image(stego, M=2):
+    """
+    Decodes the payload of the Pillow image `stego` a chunk at a time, hashing it
+    as it goes and keeping none of it. Returns a dict with the stored length,
+    the checksum name (None when the header has none), the M used, and ok:
+    whether every payload bit was present and, with a checksum, matched it.
+    Raises like locate_payload.
+    """
+    header, reader = locate_payload(stego, M)
+    name = header['checksum'][0] if header['checksum'] else None
+    h = new_checksum(name) if name else None
+    remaining = header['length'] * 8
+    while remaining:
+        bits = reader.read_packed(min(remaining, CHUNK_PIXELS))
+        if not len(bits):
+            break
+        if h:
+            h.update(bits_to_bytes(bits))
+        remaining -= len(bits)
+    ok = remaining == 0 and (h is None or h.digest() == header['checksum'][1])
+    return {'length': header['length'], 'checksum': name, 'M': reader.M, 'ok': ok}
+
+
+def extract_image(stego, M=2, progress=None, stats=None):
+    """
+    Returns the payload hidden in the Pillow image `stego` as bytes, decompressed
+    with the codec the header names. Raises like extract_payload, and with
+    NoPayloadError for one shard of a multi-image payload (see extract_shards).
+    """
+    header, data = extract_payload(stego, M, progress, stats)
+    if header['shard'] is not None:
+        index, total, _ = header['shard']
+        if total != 1:
+            raise NoPayloadError(f"image holds shard {index + 1} of {total}; "
+                                 f"extract it together with the other shards")
+        return join_shards([(header, data)])
+    if header['codec']:
+        if stats:
+            stats.count('payload_bytes', len(data))
+        with _stage(stats, 'decompress'):
+            data = decompress_payload(data, header['codec'])
+    if stats:
+        stats.count('message_bytes', len(data))
+    return data
+
+
+def iter_extract(stego, M=2, progress=None, stats=None, block_bits=IO_BLOCK, workers=1,
+                 located=None):
+    """
+    Streaming form of extract_image: decodes, checks and decompresses the payload
+    `block_bits` bits at a time and yields the message in pieces, so memory is
+    bounded by the block rather than the payload. A checksum mismatch raises
+    NoPayloadError after the last piece, before the generator finishes.
+    `workers` is passed to locate_payload; `located` is the (header, reader)
+    pair it returned, when the caller has already read the header.
+    """
+    with _stage(stats, 'rle_decode'):
+        header, reader = located or locate_payload(stego, M, workers)
+    if header['shard'] is not None:
+        # shards are checked against the whole message's hash; decode in one go
+        yield extract_image(stego, M, progress, stats)
+        return
+    nbits = header['length'] * 8
+    reader.total = reader.consumed + nbits
+    reader.progress = progress
+    h = new_checksum(header['checksum'][0]) if header['checksum'] else None
+    counts = {'payload_bytes': 0, 'message_bytes': 0}
+
+    def stored_blocks():
+        remaining = nbits
+        while remaining:
+            with _stage(stats, 'rle_decode'):
+                bits = reader.read_packed(min(remaining, block_bits))
+            if not len(bits):
+                break
+            remaining -= len(bits)
+            with _stage(stats, 'pack'):
+                piece = bits_to_bytes(bits)
+            if h:
+                with _stage(stats, 'checksum'):
+                    h.update(piece)
+            counts['payload_bytes'] += len(piece)
+            yield piece
+        if h and h.digest() != header['checksum'][1]:
+            raise NoPayloadError(f"payload fails its {header['checksum'][0]} check "
+                                 f"(damaged image or wrong M)")
+
+    for piece in iter_decompress(stored_blocks(), header['codec'], stats):
+        counts['message_bytes'] += len(piece)
+        yield piece
+    if stats:
+        stats.count('pixels_scanned', reader.scanned)
+        stats.count('runs_decoded', reader.consumed)
+        stats.count('pixels', reader.size)
+        if header['codec']:
+            stats.count('payload_bytes', counts['payload_bytes'])
+        stats.count('message_bytes', counts['message_bytes'])
+
+
+def check_output_format(mode, format):
+    # Pillow's BMP writer drops the alpha channel and cannot store 16-bit samples
+    if format.upper() == 'BMP' and mode not in BMP_MODES:
+        raise ImageFormatError(f"{mode} stego images cannot be stored as BMP without losing "
+                               f"LSBs; use a lossless format such as PNG or TIFF")
+
+
+def hide_bytes(data, cover, M=2, format=None, progress=None, stats=None, mode='overwrite',
+               layout='interleaved', compress='none', checksum='none', cache=None):
+    """
+    In-memory hide: embeds `data` into `cover` (path, encoded image bytes or Pillow
+    image) and returns the stego image encoded as `format` bytes (BMP for L and
+    RGB covers and PNG otherwise when not given). A path is looked up in the
+    CoverCache `cache` when one is given.
+    """
+    with _stage(stats, 'open'):
+        img = cache.get(cover) if cache is not None and isinstance(cover, str) else open_image(cover)
+    if format is None:
+        format = 'BMP' if img.mode in BMP_MODES else 'PNG'
+    check_output_format(img.mode, format)
+    out_img = hide_image(data, img, M, progress, stats, mode, layout, compress,
+                         checksum=checksum)
+    out = io.BytesIO()
+    with _stage(stats, 'save'):
+        out_img.save(out, format)
+    return out.getvalue()
+
+
+def extract_bytes(stego, M=2, progress=None, stats=None):
+    """In-memory extract: returns the payload hidden in `stego` (path, bytes or image)."""
+    with _stage(stats, 'open'):
+        img = open_image(stego)
+    return extract_image(img, M, progress, stats)
+
+
+# Pillow raw tile layouts the strip reader can map straight onto numpy:
+# (image mode, raw mode) → (file dtype, samples per pixel in the file, channel order)
+RAW_LAYOUTS = {
+    ('L', 'L'): ('u1', 1, None),
+    ('RGB', 'RGB'): ('u1', 3, None),
+    ('RGB', 'BGR'): ('u1', 3, (2, 1, 0)),
+    ('RGB', 'RGBX'): ('u1', 4, (0, 1, 2)),
+    ('RGB', 'BGRX'): ('u1', 4, (2, 1, 0)),
+    ('RGBA', 'RGBA'): ('u1', 4, None),
+    ('RGBA', 'BGRA'): ('u1', 4, (2, 1, 0, 3)),
+    ('I;16', 'I;16'): ('<u2', 1, None),
+    ('I;16', 'I;16B'): ('>u2', 1, None),
+}
+
+
+class StripReader:
+    """
+    Reads an image file a strip of rows at a time, as the (rows, width) or
+    (rows, width, channels) arrays np.asarray would give for those rows.
+    Formats Pillow decodes as raw, uncompressed tiles (BMP, TIFF, PPM/PGM, TGA)
+    are read straight from the file, so only one strip is ever in memory; any
+    other format (PNG, ...) is decoded by Pillow once and then sliced.
+    np.asarray(reader) loads the whole image. Opening raises what Pillow's
+    open() raises.
+    """
+
+    def __init__(self, path, rows=None):
+        # only the header is parsed here; Pillow's decompression bomb limit is
+        # for full decodes, which raw tiles never need and image() still checks
+        pil = _pil()
+        limit, pil.MAX_IMAGE_PIXELS = pil.MAX_IMAGE_PIXELS, None
+        try:
+            img = pil.open(path)
+        finally:
+            pil.MAX_IMAGE_PIXELS = limit
+        self.path = path
+        self.mode = img.mode
+        self.size = img.size
+        self.width, self.height = img.size
+        self.bands = len(img.getbands())
+        self.samples = self.width * self.height * self.bands
+        self.rows = rows or max(1, STRIP_SAMPLES // max(self.width * self.bands, 1))
+        self._tiles = self._raw_tiles(img)
+        self._img = None
+        img.close()
+
+    def _raw_tiles(self, img):
+        # full-width raw tiles covering every row in order, or None
+        tiles, y = [], 0
+        for tile in sorted(getattr(img, 'tile', None) or (), key=lambda t: t[1][1]):
+            name, (x0, y0, x1, y1), offset, args = tile
+            args = (args,) if isinstance(args, str) else tuple(args)
+            rawmode, stride, orientation = (args + (0, 1))[:3]
+            layout = RAW_LAYOUTS.get((img.mode, rawmode))
+            if name != 'raw' or layout is None or (x0, x1) != (0, self.width) or y0 != y:
+                return None
+            dtype, step, order = layout
+            row_bytes = self.width * step * np.dtype(dtype).itemsize
+            tiles.append((y0, y1, offset, stride or row_bytes, orientation < 0, np.dtype(dtype), step, order))
+            y = y1
+        return tiles if tiles and y == self.height else None
+
+    @property
+    def streaming(self):
+        # whether strips come from the file without decoding the whole image
+        return self._tiles is not None
+
+    def image(self):
+        # the whole image as a Pillow image (decoded in full)
+        if self._img is None:
+            self._img = _pil().open(self.path)
+        return self._img
+
+    def __array__(self, dtype=None, copy=None):
+        arr = np.asarray(self.image())
+        return arr if dtype is None else arr.astype(dtype)
+
+    def _read_rows(self, f, a, b):
+        out = []
+        for y0, y1, offset, stride, bottom_up, dtype, step, order in self._tiles:
+            lo, hi = max(a, y0), min(b, y1)
+            if lo >= hi:
+                continue
+            first = (y1 - hi) if bottom_up else (lo - y0)
+            f.seek(offset + first * stride)
+            raw = f.read((hi - lo) * stride)
+            if len(raw) < (hi - lo) * stride:
+                raise ImageFormatError(f"'{self.path}' is truncated")
+            rows = np.frombuffer(raw, dtype=np.uint8).reshape(hi - lo, stride)
+            rows = rows[:, :self.width * step * dtype.itemsize].view(dtype)
+            rows = rows.reshape(hi - lo, self.width, step)
+            if order is not None:
+                rows = rows[..., order]
+            elif self.bands == 1:
+                rows = rows[..., 0]
+            out.append(rows[::-1] if bottom_up else rows)
+        strip = out[0] if len(out) == 1 else np.concatenate(out)
+        return np.array(strip, dtype=strip.dtype.newbyteorder('='), order='C')  # writable copy
+
+    def strips(self, first=0):
+        """Yields (first_row, writable strip array) from row `first` down."""
+        if self._tiles is None:
+            arr = np.asarray(self.image())
+            for y in range(first, self.height, self.rows):
+                yield y, arr[y:y + self.rows].copy()
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                for y in range(first, self.height, self.rows):
+                    yield y, self._read_rows(f, y, min(y + self.rows, self.height))
+        except OSError as e:
+            raise StegoError(f"cannot read '{self.path}': {e}")
+
+    def read(self, a, b):
+        # rows [a, b) of an image read from raw tiles
+        try:
+            with open(self.path, 'rb') as f:
+                return self._read_rows(f, a, b)
+        except OSError as e:
+            raise StegoError(f"cannot read '{self.path}': {e}")
+
+    def sample_blocks(self, layout='interleaved', start=0):
+        # the sample_stream of the image from sample `start` on, in CHUNK_PIXELS
+        # blocks, one strip in memory
+        concatenated = self.bands > 1 and layout == 'concatenated'
+        row = self.width * (1 if concatenated else self.bands)
+        for c in (range(self.bands) if concatenated else (None,)):
+            skip = start - (c * self.width * self.height if concatenated else 0)
+            if skip >= row * self.height:
+                continue
+            for y, strip in self.strips(max(skip, 0) // row):
+                flat = strip.reshape(-1) if c is None else strip[..., c].reshape(-1)
+                if skip > y * row:
+                    flat = flat[skip - y * row:]
+                for pos in range(0, flat.size, CHUNK_PIXELS):
+                    yield flat[pos:pos + CHUNK_PIXELS]
+
+
+class BmpStripWriter:
+    """
+    Writes an L or RGB image as the BMP file Pillow's encoder would produce, one
+    strip of rows at a time. BMP stores rows bottom-up, so each strip is written
+    at its own offset in a file sized for the whole image.
+    """
+
+    def __init__(self, f, mode, size):
+        probe = io.BytesIO()
+        _pil().new(mode, (size[0], 1)).save(probe, 'BMP')
+        header = bytearray(probe.getvalue())
+        self.offset, = struct.unpack_from('<I', header, 10)
+        self.stride = len(header) - self.offset
+        self.height = size[1]
+        self.mode = mode
+        # the one-row header, resized for the full height
+        struct.pack_into('<I', header, 2, self.offset + self.stride * self.height)
+        struct.pack_into('<i', header, 22, self.height)
+        struct.pack_into('<I', header, 34, self.stride * self.height)
+        self.f = f
+        f.write(header[:self.offset])
+
+    def write(self, y, strip):
+        rows = strip[..., ::-1] if self.mode == 'RGB' else strip  # RGB is stored as BGR
+        rows = rows.reshape(len(strip), -1)
+        out = np.zeros((len(strip), self.stride), dtype=np.uint8)
+        out[:, :rows.shape[1]] = rows
+        self.f.seek(self.offset + (self.height - y - len(strip)) * self.stride)
+        self.f.write(out[::-1].tobytes())
+
+    def close(self):
+        self.f.seek(0, os.SEEK_END)
+
+
+class PngStripWriter:
+    """
+    Writes an image as a PNG one strip of rows at a time, deflating the rows
+    (filter type 0) into IDAT chunks as they arrive.
+    """
+    COLOR_TYPES = {'L': 0, 'I;16': 0, 'RGB': 2, 'RGBA': 6}
+
+    def __init__(self, f, mode, size):
+        self.f = f
+        self.mode = mode
+        self.z = zlib.compressobj()
+        depth = 16 if mode == 'I;16' else 8
+        f.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', size[0], size[1], depth,
+                                         self.COLOR_TYPES[mode], 0, 0, 0))
+
+    def _chunk(self, tag, data):
+        self.f.write(struct.pack('>I', len(data)) + tag + data +
+                     struct.pack('>I', zlib.crc32(tag + data)))
+
+    def write(self, y, strip):
+        rows = strip.astype('>u2') if self.mode == 'I;16' else strip
+        rows = rows.reshape(len(strip), -1).view(np.uint8)
+        out = np.zeros((len(strip), rows.shape[1] + 1), dtype=np.uint8)  # filter byte 0
+        out[:, 1:] = rows
+        data = self.z.compress(out.tobytes())
+        if data:
+            self._chunk(b'IDAT', data)
+
+    def close(self):
+        self._chunk(b'IDAT', self.z.flush())
+        self._chunk(b'IEND', b'')
+
+
+# stego file extensions the strip-wise engine writes, and their writers
+STRIP_WRITERS = {'.bmp': BmpStripWriter, '.dib': BmpStripWriter, '.png': PngStripWriter}
+
+
+class RunStream:
+    """
+    Random access to the overwrite encoder's LSB stream for the bytes `stored`
+    (header and payload): lsbs(start, stop, first) equals
+    encode_runs(payload_bits, M, first)[start:stop] but encodes only the blocks
+    of bits that reach those samples, so the stream is never built in full.
+    """
+    BLOCK = CHUNK_PIXELS  # bits per block; even, so every block starts on `first`
 
-# dependency check
-try:
-    from PIL import Image
-except ImportError:
-    print("Error: dependency 'Pillow' not installed. Please install by running: pip install Pillow",
-          file=sys.stderr)
-    sys.exit(1)
+    def __init__(self, stored, M):
+        self.stored = np.frombuffer(stored, dtype=np.uint8)
+        self.M = M
+        self.nbits = self.stored.size * 8
+        step = self.BLOCK // 8
+        starts = np.arange(0, self.stored.size, step)
+        ones = (np.add.reduceat(POPCOUNT[self.stored], starts, dtype=np.int64)
+                if self.stored.size else np.zeros(0, dtype=np.int64))
+        block_bits = np.minimum(self.BLOCK, self.nbits - starts * 8)
+        self.offsets = np.concatenate(([0], np.cumsum(block_bits * M + ones)))
+        self.needed = int(self.offsets[-1])  # same as needed_pixels
 
+    def last(self, first):
+        # LSB of the final run, which the sample after the stream must not continue
+        return first ^ ((self.nbits - 1) & 1)
 
-def file_to_binary_string(filepath):
-    # read an arbitrary file and return its bits as a '0'/'1' string
+    def lsbs(self, start, stop, first):
+        stop = min(stop, self.needed)
+        if start >= stop:
+            return np.zeros(0, dtype=np.uint8)
+        k0 = int(np.searchsorted(self.offsets, start, 'right')) - 1
+        k1 = int(np.searchsorted(self.offsets, stop, 'left'))
+        step = self.BLOCK // 8
+        bits = np.unpackbits(self.stored[k0 * step:k1 * step])
+        base = int(self.offsets[k0])
+        return encode_runs(bits, self.M, first)[start - base:stop - base]
+
+
+def embed_stream(samples, pos, stream, first):
+    """
+    Strip form of embed_lsbs: `samples` (flat, written in place) are stream
+    positions pos..pos + len(samples) of the image. Writes the RunStream LSBs
+    falling there and, if the sample after the stream is among them, breaks
+    the last run as embed_lsbs does.
+    """
+    lsbs = stream.lsbs(pos, pos + samples.size, first)
+    if len(lsbs):
+        clear = ~samples.dtype.type(1)
+        samples[:len(lsbs)] &= clear
+        samples[:len(lsbs)] |= lsbs
+    end = stream.needed - pos
+    if 0 <= end < samples.size and (samples[end] & 1) == stream.last(first):
+        samples[end] ^= 1
+
+
+def hide_strips(data, cover_file, stego_file, M=2, progress=None, stats=None,
+                layout='interleaved', compress='none', checksum='none', container=False):
+    """
+    Bounded-memory form of hide_image for the overwrite mode: reads `cover_file`
+    a strip of rows at a time (StripReader), writes the payload runs that fall in
+    each strip (RunStream) and hands the strip to the STRIP_WRITERS entry for
+    `stego_file`'s extension, so memory is set by the strip size and the
+    payload rather than the image. The image written is the one hide_image
+    would return; a BMP output is byte-for-byte the same file.
+    Output goes to a temporary file renamed over `stego_file` when complete.
+    """
+    if layout not in LAYOUTS:
+        raise StegoError(f"unknown channel layout {layout!r} (expected one of {', '.join(LAYOUTS)})")
     try:
-        with open(filepath, 'rb') as f:
-            data = f.read()
+        with _stage(stats, 'open'):
+            source = StripReader(cover_file)
+    except StegoError:
+        raise
     except Exception as e:
-        print(f"Error: cannot open file '{filepath}': {e}", file=sys.stderr)
-        sys.exit(1)
-    return ''.join(f'{byte:08b}' for byte in data)
+        raise ImageFormatError(f"cannot open cover file '{cover_file}': {e}")
+    if source.mode not in COVER_MODES:
+        raise ImageFormatError(f"cover mode {source.mode} is not supported for LSB embedding "
+                               f"(use {', '.join(COVER_MODES)})")
+    writer_class = STRIP_WRITERS[os.path.splitext(stego_file)[1].lower()]
+    check_output_format(source.mode, 'BMP' if writer_class is BmpStripWriter else 'PNG')
+    multi = source.bands > 1
+    flags = FLAG_CONCATENATED if multi and layout == 'concatenated' else 0
+    flags |= FLAG_CONTAINER if container else 0
+    message_bytes = len(data)
+    with _stage(stats, 'compress'):
+        codec, data = compress_payload(data, compress)
+    with _stage(stats, 'checksum'):
+        digest = payload_checksum(data, checksum)
+    with _stage(stats, 'bits'):
+        header = build_header(len(data), flags, multi, CODECS[codec], None, digest)
+        stream = RunStream(header + bytes(data), M)
+    if stream.needed > source.samples:
+        raise CapacityError(f"cover capacity ({source.samples}) insufficient; need {stream.needed}.")
 
+    width, height = source.size
+    plane = width * height
+    tmp = f"{stego_file}.{os.getpid()}.tmp"
+    first, flips = None, 0
+    try:
+        with open(tmp, 'wb') as f:
+            writer = writer_class(f, source.mode, source.size)
+            strips = source.strips()
+            while True:
+                with _stage(stats, 'decode'):
+                    y, strip = next(strips, (None, None))
+                if strip is None:
+                    break
+                with _stage(stats, 'encode'):
+                    if stats:
+                        before = strip & 1
+                    if multi and layout == 'concatenated':
+                        spans = [(strip[..., c], c * plane + y * width) for c in range(source.bands)]
+                    else:
+                        spans = [(strip, y * width * source.bands)]
+                    for view, pos in spans:
+                        if pos > stream.needed and first is not None:
+                            continue
+                        flat = view.reshape(-1)  # a copy for a concatenated plane
+                        if first is None:
+                            first = flat[0] & 1
+                        embed_stream(flat, pos, stream, first)
+                        view[...] = flat.reshape(view.shape)
+                    if stats:
+                        flips += np.count_nonzero(before != (strip & 1))
+                with _stage(stats, 'save'):
+                    writer.write(y, strip)
+                if progress:
+                    # every strip is rewritten, payload or not, so progress counts rows
+                    progress(y + len(strip), height)
+            writer.close()
+        os.replace(tmp, stego_file)
+    except OSError as e:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise StegoError(f"cannot save stego file '{stego_file}': {e}")
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if stats:
+        stats.count('payload_bytes', len(data))
+        stats.count('message_bytes', message_bytes)
+        stats.count('payload_bits', stream.nbits)
+        stats.count('runs_emitted', stream.nbits)
+        stats.count('pixels', source.samples)
+        stats.count('pixels_used', stream.needed)
+        stats.count('lsb_flips', flips)
 
-def find_runs_and_convert_to_output_string(s: str, M: int) -> str:
+
+def _summarize_strip(task):
+    # process-pool worker: summarize_runs over rows [a, b) of one image (or one plane)
+    path, a, b, plane, M = task
+    strip = StripReader(path).read(a, b)
+    lsbs = (strip.reshape(-1) if plane is None else strip[..., plane].reshape(-1)) & 1
+    first_bit, first_len, inner, last_bit, last_len, single = summarize_runs(lsbs, M)
+    return first_bit, first_len, np.packbits(inner), len(inner), last_bit, last_len, single
+
+
+def iter_parallel_run_bits(source, layout, M, workers=None):
     """
-    Finds all non-overlapping runs of at least length M in the binary string s.
-    Even-length runs → '0', odd-length runs → '1'.
+    iter_block_run_bits for a StripReader read from raw tiles, on a process pool:
+    each worker reads and summarizes its own strips of the file, and the results
+    are stitched in order, so the bits are exactly the sequential decoder's.
+    Two strips per worker are kept in flight, so a payload near the top of a
+    large image does not wait for the rest of it to be decoded.
     """
-    if M <= 0:
-        raise ValueError("Minimum length M must be greater than 0.")
+    planes = range(source.bands) if source.bands > 1 and layout == 'concatenated' else (None,)
+    tasks = [(source.path, y, min(y + source.rows, source.height), c, M)
+             for c in planes for y in range(0, source.height, source.rows)]
 
-    i, n = 0, len(s)
-    output_bits = []
-    while i < n:
-        bit = s[i]
-        start = i
-        while i < n and s[i] == bit:
-            i += 1
-        run_len = i - start
-        if run_len >= M:
-            output_bits.append('1' if run_len % 2 else '0')
-    return ''.join(output_bits)
-
-
-def hide(message_file, cover_file, stego_file, M, threshold):
-    # Read payload and prepend 32-bit length header
-    with open(message_file, 'rb') as mf:
-        data = mf.read()
-    length = len(data)
-    header_bits = ''.join(str((length >> i) & 1) for i in range(31, -1, -1))
-    payload = header_bits + ''.join(f'{b:08b}' for b in data)
-    bits = [int(b) for b in payload]
-
-    # Load cover (must be 8-bit grayscale)
-    try:
-        img = Image.open(cover_file)
-    except Exception as e:
-        print(f"Error: cannot open cover file '{cover_file}': {e}", file=sys.stderr)
-        sys.exit(1)
-    if img.mode != 'L':
-        print("Error: cover must be 8-bit grayscale BMP for LSB embedding", file=sys.stderr)
-        sys.exit(1)
+    def summaries():
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            ahead = 2 * (workers or os.cpu_count() or 1)
+            pending = [pool.submit(_summarize_strip, task) for task in tasks[:ahead]]
+            for task in tasks[ahead:] + [None] * len(pending):
+                first_bit, first_len, packed, n, last_bit, last_len, single = pending.pop(0).result()
+                if task is not None:
+                    pending.append(pool.submit(_summarize_strip, task))
+                yield first_bit, first_len, np.unpackbits(packed, count=n), last_bit, last_len, single
+        finally:
+            # a reader abandoned early (header only, wrong layout) leaves work queued
+            pool.shutdown(wait=False, cancel_futures=True)
 
-    pixels = list(img.getdata())  # values 0–255
-    cover_lsbs = [px & 1 for px in pixels]
+    return stitch_runs(summaries(), M)
 
-    # Capacity check
-    cap = len(cover_lsbs)
-    needed = sum(M + b for b in bits)
-    if needed > cap:
-        print(f"Error: cover capacity ({cap}) insufficient; need {needed}.", file=sys.stderr)
-        sys.exit(1)
 
-    # RLE encode on LSB stream
-    stego_lsbs = []
-    cur = cover_lsbs[0]
-    for b in bits:
-        stego_lsbs.extend([cur] * (M + b))
-        cur ^= 1
-    stego_lsbs.extend(cover_lsbs[len(stego_lsbs):])
+def hide(message_file, cover_file, stego_file, M, threshold, in_place=False, cover_dir=None,
+         progress=None, stats=None, mode='overwrite', layout='interleaved', compress='none',
+         checksum='none'):
+    """
+    Embeds `message_file` into `cover_file`, or into the smallest fitting cover in
+    `cover_dir` when that is given. Returns the path of the cover used.
+    '-' reads the message from standard input or writes the stego image (BMP,
+    or PNG for RGBA and 16-bit covers) to standard output.
+    A list of several message files is stored as a multi-file container
+    (pack_container) that extract_entry can read one file of.
+    `compress` names a codec from CODECS, or 'auto' for the smallest result, and
+    `checksum` one from CHECKSUMS to record a digest of the stored payload.
+    `progress(done, total)` is called as payload pixels are written, and a Stats
+    object passed as `stats` collects per-stage timings and counters.
+    """
+    if in_place and stego_file == '-':
+        raise StegoError("--in-place patches a file; it cannot write to standard output")
+    if isinstance(message_file, (list, tuple)) and len(message_file) == 1:
+        message_file = message_file[0]
+    container = isinstance(message_file, (list, tuple))
+    if container and mode != 'overwrite':
+        raise StegoError("a multi-file container needs the overwrite mode (entry offsets "
+                         "count overwrite runs); drop --mode adaptive")
+    if container and '-' in message_file:
+        raise StegoError("container entries are named after their files; stdin ('-') cannot be one")
+
+    # The length header precedes the runs, so the message is read in full, but
+    # never past the most any payload could take of the cover (every bit needs a
+    # run of at least M samples)
+    limit = None
+    if cover_file is not None and compress == 'none' and not container:
+        try:
+            limit = StripReader(cover_file).samples // M // 8  # header only
+        except StegoError:
+            raise
+        except Exception:
+            pass  # reported when the cover is loaded below
+
+    # Read payload
+    with _stage(stats, 'read_message'):
+        if container:
+            entries = [(os.path.basename(path), read_message(path)) for path in message_file]
+        else:
+            data = read_message(message_file, limit)
+    if container:
+        # entries are compressed one by one, so the payload itself is stored as is
+        with _stage(stats, 'compress'):
+            data = pack_container(entries, M, compress, checksum)
+        compress = 'none'
+
+    if cover_dir is not None or in_place:
+        # size (or embed) the payload as it will be stored; resolving 'auto' here
+        # means the embedding below reruns only the codec that won
+        with _stage(stats, 'compress'):
+            compress, payload = compress_payload(data, compress)
 
-    # Rebuild pixels: replace only the LSB, keep other bits intact
-    out_pixels = [ (pixels[i] & 0xFE) | stego_lsbs[i] for i in range(cap) ]
+    if cover_dir is not None:
+        # the catalog sizes covers by the overwrite cost; adaptive capacity depends on content
+        with _stage(stats, 'select_cover'):
+            header = build_header(len(payload), extended=True,
+                                  checksum=payload_checksum(payload, checksum))
+            cover_file = select_cover(cover_dir, needed_pixels(payload_bits(payload, header), M),
+                                      in_place, stego_file)
+
+    if in_place:
+        # Patch the pixel rows of a copy of the cover (or the cover itself when
+        # it is also the output) instead of re-encoding the whole image
+        copied = False
+        try:
+            if not (os.path.exists(stego_file) and os.path.samefile(cover_file, stego_file)):
+                with _stage(stats, 'copy'):
+                    shutil.copyfile(cover_file, stego_file)
+                copied = True
+            with _stage(stats, 'bits'):
+                header = build_header(len(payload), FLAG_CONTAINER if container else 0,
+                                      codec=CODECS[compress],
+                                      checksum=payload_checksum(payload, checksum))
+                bits = payload_bits(payload, header)
+            with _stage(stats, 'encode_inplace'):
+                needed = hide_bmp_inplace(bits, stego_file, M, progress, mode)
+        except (OSError, ValueError, StegoError) as e:
+            if copied:
+                os.remove(stego_file)  # an untouched copy of the cover is no stego image
+            if isinstance(e, StegoError):
+                raise  # e.g. the adaptive embedder's CapacityError, reported as is
+            raise StegoError(f"cannot embed in place into '{stego_file}': {e}")
+        if stats:
+            stats.count('message_bytes', len(data))
+            stats.count('payload_bytes', len(payload))
+            stats.count('payload_bits', len(bits))
+            stats.count('runs_emitted', len(bits))
+            stats.count('lsb_flips' if mode == 'adaptive' else 'pixels_used', needed)
+        return cover_file
+
+    if mode == 'overwrite' and os.path.splitext(stego_file)[1].lower() in STRIP_WRITERS:
+        # strip by strip, so memory does not grow with the cover
+        hide_strips(data, cover_file, stego_file, M, progress, stats, layout, compress, checksum,
+                    container)
+        return cover_file
+
+    # Load cover
+    try:
+        with _stage(stats, 'open'):
+            img = _pil().open(cover_file)
+    except StegoError:
+        raise
+    except Exception as e:
+        raise ImageFormatError(f"cannot open cover file '{cover_file}': {e}")
+    if os.path.splitext(stego_file)[1].lower() in ('.bmp', '.dib'):
+        check_output_format(img.mode, 'BMP')
+    out_img = hide_image(data, img, M, progress, stats, mode, layout, compress,
+                         checksum=checksum, container=container)
 
     # Save stego image
-    out_img = Image.new('L', img.size)
-    out_img.putdata(out_pixels)
     try:
-        out_img.save(stego_file)
+        with _stage(stats, 'save'):
+            if stego_file == '-':
+                out = io.BytesIO()
+                out_img.save(out, 'BMP' if img.mode in BMP_MODES else 'PNG')
+                sys.stdout.buffer.write(out.getbuffer())
+                sys.stdout.buffer.flush()
+            else:
+                out_img.save(stego_file)
     except Exception as e:
-        print(f"Error: cannot save stego file '{stego_file}': {e}", file=sys.stderr)
-        sys.exit(1)
+        raise StegoError(f"cannot save stego file '{stego_file}': {e}")
+    return cover_file
+
+
+def open_stego(stego_file):
+    # the image to extract from: standard input for '-', else a file decoded a strip
+    # at a time (see StripReader)
+    try:
+        return (_pil().open(io.BytesIO(sys.stdin.buffer.read())) if stego_file == '-'
+                else StripReader(stego_file))
+    except StegoError:
+        raise
+    except Exception as e:
+        raise ImageFormatError(f"cannot open stego file '{stego_file}': {e}")
 
 
-def extract(stego_file, message_file, M, threshold):
+def extract(stego_file, message_file, M, threshold, progress=None, stats=None, workers=1,
+            name=None):
+    """
+    Recovers the payload hidden in `stego_file` into `message_file`; '-' reads
+    the image from standard input or writes the message to standard output.
+    M may be 'auto' to detect it (see detect_min_run). Returns the M used.
+    The message is decoded and written in blocks (see iter_extract), a large
+    image on `workers` processes (None for one per core), into a temporary
+    file renamed over `message_file` once complete, so an error leaves no
+    partial file.
+    `progress(done, total)` is called as payload bits are decoded, and a Stats
+    object passed as `stats` collects per-stage timings and counters.
+    A multi-file container is written out as its files: only the entry `name`
+    (to `message_file`, or a file of that name) when given, all of them into
+    the directory `message_file` otherwise. Without a container, `name` raises
+    NoPayloadError and a `message_file` of None means 'message.bin'.
+    """
     # Load stego image
+    with _stage(stats, 'open'):
+        img = open_stego(stego_file)
+    if M == 'auto':
+        with _stage(stats, 'detect_min_run'):
+            M = detect_min_run(img)
+    with _stage(stats, 'rle_decode'):
+        located = locate_payload(img, M, workers)
+    if located[0]['flags'] & FLAG_CONTAINER:
+        extract_container(img, located, message_file, name, progress, stats)
+        return M
+    if name is not None:
+        raise NoPayloadError(f"'{stego_file}' holds a single payload, not a multi-file container")
+    if message_file is None:
+        message_file = 'message.bin'
+
+    # Write recovered file as it is decoded, IO_BLOCK bytes at a time, into a
+    # temporary file that replaces `message_file` only once the payload is complete
+    tmp = None if message_file == '-' else f"{message_file}.{os.getpid()}.tmp"
+    try:
+        mf = open(tmp, 'wb') if tmp else sys.stdout.buffer
+        try:
+            pending = bytearray()
+            for piece in iter_extract(img, M, progress, stats, workers=workers, located=located):
+                pending += piece
+                if len(pending) >= IO_BLOCK:
+                    with _stage(stats, 'write'):
+                        mf.write(pending)
+                    pending.clear()
+            with _stage(stats, 'write'):
+                mf.write(pending)
+                mf.flush()
+        finally:
+            if tmp:
+                mf.close()
+        if tmp:
+            os.replace(tmp, message_file)
+    except OSError as e:
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+        raise StegoError(f"cannot write message file '{message_file}': {e}")
+    except BaseException:
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return M
+
+
+def _entry_path(directory, name):
+    # where an entry is written: its base name only, so an index cannot escape `directory`
+    base = os.path.basename(name.replace('\\', '/'))
+    if base in ('', '.', '..'):
+        raise NoPayloadError(f"container entry {name!r} has no usable file name")
+    return os.path.join(directory, base)
+
+
+def write_output(path, data):
+    # writes a whole recovered file, '-' meaning standard output
+    try:
+        if path == '-':
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+        else:
+            with open(path, 'wb') as f:
+                f.write(data)
+    except OSError as e:
+        raise StegoError(f"cannot write message file '{path}': {e}")
+
+
+def extract_container(img, located, output, name=None, progress=None, stats=None):
+    """
+    extract() for a container: with `name`, seeks to that entry's runs and
+    writes it to `output` (its own name when None); otherwise decodes the
+    entries in order into the directory `output`. Each entry is checked
+    against its digest before it is written.
+    """
+    with _stage(stats, 'rle_decode'):
+        header, reader, kind, entries, base = open_container(img, located=located)
+    if name is not None:
+        entry = find_entry(entries, name)
+        with _stage(stats, 'rle_decode'):
+            data = read_entry_at(img, header, reader.M, base + entry['offset'], entry, kind)
+        with _stage(stats, 'write'):
+            write_output(output or _entry_path('.', entry['name']), data)
+        if stats:
+            stats.count('message_bytes', len(data))
+        return
+    listing = ', '.join(e['name'] for e in entries)
+    if output is None or output == '-':
+        raise StegoError(f"image holds a container of {len(entries)} files ({listing}); "
+                         f"pick one with --name or give a directory with -o")
+    try:
+        os.makedirs(output, exist_ok=True)
+    except OSError as e:
+        raise StegoError(f"cannot create output directory '{output}': {e}")
+    # the entries follow the index back to back, so one pass reads them all
+    for i, entry in enumerate(entries):
+        with _stage(stats, 'rle_decode'):
+            stored = reader.read_bytes(entry['stored'])
+        with _stage(stats, 'decompress' if entry['codec'] else 'pack'):
+            data = container_entry_data(entry, kind, stored)
+        with _stage(stats, 'write'):
+            write_output(_entry_path(output, entry['name']), data)
+        if stats:
+            stats.count('message_bytes', len(data))
+        if progress:
+            progress(i + 1, len(entries))
+
+
+def rewrite_payload(samples, bits, old_nbits, M):
+    """
+    Replaces the `old_nbits`-bit stream (header included) hidden in the flat sample
+    array `samples` with `bits`, in place and without the cover: the runs before the
+    first bit that changes are kept and the rest of `bits` is written as fresh
+    overwrite runs from there. When the new stream ends first, the samples the
+    old one still held are set to alternating LSBs, which hold no run of M or
+    more. The old runs are found in the samples rather than computed, so
+    adaptive images can be rewritten too. Returns the (start, stop) range of
+    samples rewritten, or None when the stream is unchanged.
+    """
+    bits = BitStream.of(bits)
+    # only the prefix holding the old runs is split into runs; an overwrite stream
+    # fits in the first guess, an adaptive one may need it doubled
+    limit = min(samples.size, old_nbits * (M + 1) + 1)
+    while True:
+        lsbs = (samples[:limit] & 1).astype(np.uint8)
+        starts, lengths = find_runs(lsbs)
+        keep = lengths >= M
+        starts, lengths = starts[keep][:old_nbits], lengths[keep][:old_nbits]
+        if limit == samples.size or len(starts) == old_nbits and starts[-1] + lengths[-1] < limit:
+            break
+        limit = min(samples.size, 2 * limit)
+    if len(starts) < old_nbits:
+        raise NoPayloadError(f"image holds {len(starts)} runs but its header claims {old_nbits} bits")
+    old = (lengths & 1).astype(np.uint8)
+    n = min(old_nbits, len(bits))
+    diff = np.flatnonzero(old[:n] != bits.unpack(0, n))
+    k = int(diff[0]) if len(diff) else n
+    if k == old_nbits == len(bits):
+        return None
+    old_stop = min(int(starts[-1] + lengths[-1]) + 1, samples.size)  # with the closing sample
+
+    tail = bits[k:]
+    start = int(starts[k]) if k < old_nbits else int(starts[-1] + lengths[-1])
+    needed = needed_pixels(tail, M)
+    if start + needed > samples.size:
+        raise CapacityError(f"image capacity ({samples.size}) insufficient; need {start + needed}.")
+    # the first new run (or the closing sample) must not merge with the run kept before it
+    if start and start < samples.size and (samples[start] & 1) == lsbs[start - 1]:
+        samples[start] ^= 1
+    if len(tail):
+        embed_lsbs(samples[start:], tail, M)
+    stop = min(start + needed + 1, samples.size)
+    if stop < old_stop:
+        clear = ~samples.dtype.type(1)
+        pattern = (np.arange(old_stop - stop) & 1).astype(samples.dtype) ^ (1 - (samples[stop - 1] & 1))
+        samples[stop:old_stop] &= clear
+        samples[stop:old_stop] |= pattern
+    return start, max(stop, old_stop)
+
+
+def update_bits(data, header, multi, compress=None, checksum=None, container=False):
+    """
+    The header and payload bits that replace the payload described by `header`
+    (from locate_payload): the channel layout is kept, and `compress` and
+    `checksum` default to the codec and checksum it already uses.
+    Returns (bits, codec, stored payload).
+    """
+    if header['shard'] is not None:
+        raise StegoError("image holds one shard of a message; embed the new message with hide --shards")
+    if compress is None:
+        compress = {v: k for k, v in CODECS.items()}.get(header['codec'], 'none')
+    if checksum is None:
+        checksum = header['checksum'][0] if header['checksum'] else 'none'
+    codec, stored = compress_payload(data, compress)
+    flags = (header['flags'] & FLAG_CONCATENATED) | (FLAG_CONTAINER if container else 0)
+    digest = payload_checksum(stored, checksum)
+    return payload_bits(stored, build_header(len(stored), flags, multi, CODECS[codec], None, digest)), codec, stored
+
+
+def update_image(data, stego, M=2, compress=None, checksum=None, container=False, located=None):
+    """
+    Replaces the payload hidden in the Pillow image `stego` with the bytes-like
+    `data`, rewriting only the samples from the first run whose bit changes
+    (see rewrite_payload), so no cover is needed. `located` is the (header,
+    reader) pair locate_payload already returned, if any. Returns the updated
+    image and the (start, stop) samples rewritten (None when nothing changed).
+    """
+    header, reader = located or locate_payload(stego, M)
+    arr = np.array(stego)  # writable copy
+    bits, _, _ = update_bits(data, header, arr.ndim == 3, compress, checksum, container)
+    layout = 'concatenated' if header['flags'] & FLAG_CONCATENATED else 'interleaved'
+    samples = sample_stream(arr, layout)
+    span = rewrite_payload(samples, bits, reader.consumed + header['length'] * 8, reader.M)
+    arr = restore_stream(samples, arr.shape, layout)
+    return _pil().frombuffer(stego.mode, stego.size, arr, 'raw', stego.mode, 0, 1), span
+
+
+def update_bmp_inplace(bits, old_nbits, stego_file, M):
+    """
+    rewrite_payload on the memory-mapped 8-bit BMP at `stego_file`, writing back
+    only the pixel rows whose samples changed. Returns (span, rows written).
+    Raises ValueError for a BMP bmp_pixel_view cannot map.
+    """
+    with open(stego_file, 'r+b') as f, mmap.mmap(f.fileno(), 0) as mm:
+        view = bmp_pixel_view(mm)
+        try:
+            width = view.shape[1]
+            samples = view.copy().reshape(-1)
+            span = rewrite_payload(samples, bits, old_nbits, M)
+            rows = 0
+            if span:
+                a, b = span[0] // width, (span[1] - 1) // width + 1
+                new = samples[a * width:b * width].reshape(-1, width)
+                changed = np.flatnonzero((new != view[a:b]).any(axis=1))
+                view[a + changed] = new[changed]
+                rows = len(changed)
+        finally:
+            del view  # release the exported buffer before the map is closed
+        mm.flush()
+    return span, rows
+
+
+def update(message_file, stego_file, out_file=None, M=2, compress=None, checksum=None):
+    """
+    Replaces the payload hidden in `stego_file` with `message_file` (a list of
+    several: a multi-file container) without the original cover: only the
+    samples from the first run whose bit changes onward are rewritten (see
+    rewrite_payload). The result goes to `out_file` ('-' for standard output),
+    or back into `stego_file` when None, where an uncompressed 8-bit BMP is
+    patched in place, writing only the pixel rows that changed, and other
+    formats are re-saved through a temporary file. M may be 'auto'.
+    Returns a dict with M, start and stop (the samples rewritten, None when
+    the payload is unchanged), samples and, for a patched BMP, rows.
+    """
+    if isinstance(message_file, (list, tuple)) and len(message_file) == 1:
+        message_file = message_file[0]
+    container = isinstance(message_file, (list, tuple))
+    if container and '-' in message_file:
+        raise StegoError("container entries are named after their files; stdin ('-') cannot be one")
+    out_file = out_file or stego_file
     try:
-        img = Image.open(stego_file)
+        img = _pil().open(stego_file)
+        img.load()
     except Exception as e:
-        print(f"Error: cannot open stego file '{stego_file}': {e}", file=sys.stderr)
-        sys.exit(1)
-    if img.mode != 'L':
-        print("Error: stego image must be 8-bit grayscale BMP for LSB extraction", file=sys.stderr)
-        sys.exit(1)
+        raise ImageFormatError(f"cannot open stego file '{stego_file}': {e}")
+    if M == 'auto':
+        M = detect_min_run(img)
+    header, reader = located = locate_payload(img, M)
+    old_nbits = reader.consumed + header['length'] * 8
+
+    if container:
+        entries = [(os.path.basename(path), read_message(path)) for path in message_file]
+        kind = checksum or (header['checksum'][0] if header['checksum'] else 'none')
+        data = pack_container(entries, M, compress or 'none', kind)
+        compress = 'none'
+    else:
+        data = read_message(message_file)
+    result = {'M': M, 'start': None, 'stop': None, 'samples': img.width * img.height * len(img.getbands())}
+
+    ext = os.path.splitext(out_file)[1].lower()
+    if out_file == stego_file and ext in ('.bmp', '.dib') and img.mode == 'L':
+        bits, _, _ = update_bits(data, header, False, compress, checksum, container)
+        img.close()
+        try:
+            span, result['rows'] = update_bmp_inplace(bits, old_nbits, stego_file, M)
+        except ValueError:
+            span = False  # not a BMP the pixel view maps; re-save it below
+        except OSError as e:
+            raise StegoError(f"cannot update '{stego_file}' in place: {e}")
+        if span is not False:
+            result['start'], result['stop'] = span or (None, None)
+            return result
+        img = _pil().open(stego_file)
+
+    out_img, span = update_image(data, img, M, compress, checksum, container, located)
+    result['start'], result['stop'] = span or (None, None)
+    if ext in ('.bmp', '.dib'):
+        check_output_format(img.mode, 'BMP')
+    try:
+        if out_file == '-':
+            out = io.BytesIO()
+            out_img.save(out, 'BMP' if img.mode in BMP_MODES else 'PNG')
+            sys.stdout.buffer.write(out.getbuffer())
+            sys.stdout.buffer.flush()
+        elif out_file == stego_file:
+            tmp = f"{out_file}.{os.getpid()}.tmp"
+            try:
+                out_img.save(tmp, img.format)
+                os.replace(tmp, out_file)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        else:
+            out_img.save(out_file)
+    except Exception as e:
+        raise StegoError(f"cannot save stego file '{out_file}': {e}")
+    return result
+
+
+def shard_capacity(cover_file, M, checksum='none'):
+    # payload bytes one shard can hold in this cover (overwrite cost, shard header)
+    img = open_image(cover_file)
+    if img.mode not in COVER_MODES:
+        return img.mode, 0
+    samples = img.width * img.height * len(img.getbands())
+    header_bytes = 8 + SHARD_MANIFEST.size + CHECKSUMS[checksum][1]
+    return img.mode, max_payload_bytes(samples, M, header_bytes)
+
+
+def _hide_shard(task):
+    # process-pool worker: embed one slice and save it
+    cover_file, stego_file, chunk, M, codec, layout, shard, checksum = task
+    out = hide_image(chunk, open_image(cover_file), M, layout=layout, compress=codec, shard=shard,
+                     checksum=checksum)
+    out.save(stego_file)
+    return stego_file
+
+
+def hide_shards(message_file, cover_files, out_dir, M=2, workers=None, compress='none',
+                layout='interleaved', checksum='none'):
+    """
+    Splits `message_file` (after `compress`) into slices sized to each cover's
+    capacity, in the order given, and embeds them on a process pool of `workers`
+    processes. Every shard records its index, the shard count and a hash of the
+    message (and with `checksum`, a digest of its own slice).
+    Returns [(cover, stego_file, slice_bytes)] for the covers used.
+    """
+    if checksum not in CHECKSUMS:
+        raise StegoError(f"unknown checksum {checksum!r} (expected one of {', '.join(CHECKSUMS)})")
+    data = read_message(message_file)
+    digest = hashlib.sha256(data).digest()[:8]
+    codec, payload = compress_payload(data, compress)
+
+    plan, pos = [], 0
+    for cover_file in cover_files:
+        if pos >= len(payload) and plan:
+            break
+        mode, cap = shard_capacity(cover_file, M, checksum)
+        if cap <= 0:
+            continue
+        plan.append((cover_file, mode, payload[pos:pos + cap]))
+        pos += cap
+    if pos < len(payload):
+        raise CapacityError(f"covers hold {pos} bytes at M={M}; the payload needs {len(payload)}")
+    if len(plan) > 0xFFFF:
+        raise CapacityError(f"payload would need {len(plan)} shards (at most 65535)")
+
+    os.makedirs(out_dir, exist_ok=True)
+    stem = 'stdin' if message_file == '-' else os.path.splitext(os.path.basename(message_file))[0]
+    tasks = []
+    for index, (cover_file, mode, chunk) in enumerate(plan):
+        ext = '.bmp' if mode in BMP_MODES else '.png'
+        stego_file = os.path.join(out_dir, f"{stem}.shard{index:03d}{ext}")
+        tasks.append((cover_file, stego_file, chunk, M, codec, layout, (index, len(plan), digest),
+                      checksum))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_hide_shard, tasks))
+    return [(task[0], task[1], len(task[2])) for task in tasks]
+
+
+def _extract_shard(task):
+    # process-pool worker: decode one stego image's header and raw slice
+    stego_file, M = task
+    try:
+        return extract_payload(open_image(stego_file), M)
+    except StegoError as e:
+        raise StegoError(f"'{stego_file}': {e}")
+
+
+def join_shards(parts):
+    """
+    Reassembles [(header, slice)] pairs in any order into the original message:
+    checks that they share one manifest and codec and that none is missing, then
+    decompresses and verifies the message hash.
+    """
+    manifests = {(h['shard'][1], h['shard'][2], h['codec']) if h['shard'] else None
+                 for h, _ in parts}
+    if None in manifests:
+        raise NoPayloadError("an image holds a whole payload, not a shard")
+    if len(manifests) != 1:
+        raise NoPayloadError("images belong to different sharded payloads")
+    total, digest, codec = manifests.pop()
+    slices = {}
+    for header, data in parts:
+        slices.setdefault(header['shard'][0], data)
+    missing = [i + 1 for i in range(total) if i not in slices]
+    if missing:
+        raise NoPayloadError(f"missing shard(s) {', '.join(map(str, missing))} of {total}")
+    data = decompress_payload(b''.join(slices[i] for i in range(total)), codec)
+    if hashlib.sha256(data).digest()[:8] != digest:
+        raise NoPayloadError("reassembled payload does not match its hash")
+    return data
+
+
+def extract_shards(stego_files, message_file, M=2, workers=None):
+    """
+    Decodes the shards in `stego_files` (any order) on a process pool, then
+    reassembles and writes the message. Returns the number of shards.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(_extract_shard, [(f, M) for f in stego_files]))
+    data = join_shards(parts)
+    try:
+        if message_file == '-':
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+        else:
+            with open(message_file, 'wb') as mf:
+                mf.write(data)
+    except OSError as e:
+        raise StegoError(f"cannot write message file '{message_file}': {e}")
+    return parts[0][0]['shard'][1]
+
+
+def pack_container(entries, M=2, compress='none', checksum='none'):
+    """
+    Builds the payload of a multi-file container from (name, data) pairs: the
+    index (CONTAINER_HEAD, then per entry a 16-bit name length, the UTF-8 name,
+    CONTAINER_ENTRY and a digest) followed by each entry's stored bytes,
+    compressed on its own with `compress` so it can be decoded on its own.
+    An entry records its codec, stored and original sizes, a digest of the
+    stored bytes ('crc32' unless `checksum` is 'blake2') and the sample offset of
+    its first run counted from the end of the index. The offset holds for
+    the overwrite encoder at this M, whose runs are exactly M + b samples.
+    """
+    kind = 'blake2' if checksum == 'blake2' else 'crc32'
+    names = [name for name, _ in entries]
+    if len(set(names)) != len(names):
+        raise StegoError("container entries need distinct file names")
+    if len(entries) > 0xFFFF:
+        raise StegoError("a container holds at most 65535 files")
+    index = [CONTAINER_HEAD.pack(len(entries), CHECKSUMS[kind][0])]
+    blobs, offset = [], 0
+    for name, data in entries:
+        codec, stored = compress_payload(data, compress)
+        if len(data) > 0xFFFFFFFF:
+            raise CapacityError(f"'{name}' is too large for a container entry")
+        encoded = name.encode('utf-8')
+        index.append(struct.pack('>H', len(encoded)) + encoded +
+                     CONTAINER_ENTRY.pack(CODECS[codec], len(stored), len(data), offset) +
+                     payload_checksum(stored, kind)[1])
+        blobs.append(stored)
+        offset += len(stored) * 8 * M + BitStream(stored).count()
+    return b''.join(index + blobs)
+
+
+def read_container_index(read):
+    """
+    Parses a container index, `read(n)` returning the next n payload bytes.
+    Returns (checksum name, entries), each entry a dict with name, codec,
+    stored, size, offset and digest. Raises NoPayloadError when the index is
+    truncated or malformed.
+    """
+    def take(n):
+        data = read(n)
+        if len(data) < n:
+            raise NoPayloadError("container index is truncated")
+        return data
+
+    count, flag = CONTAINER_HEAD.unpack(take(CONTAINER_HEAD.size))
+    kind = next((name for name, (f, _) in CHECKSUMS.items() if f and f == flag), None)
+    if kind is None:
+        raise NoPayloadError(f"container index names an unknown checksum ({flag:#x})")
+    entries = []
+    for _ in range(count):
+        n, = struct.unpack('>H', take(2))
+        try:
+            name = take(n).decode('utf-8')
+        except UnicodeDecodeError:
+            raise NoPayloadError("container index holds a malformed name")
+        codec, stored, size, offset = CONTAINER_ENTRY.unpack(take(CONTAINER_ENTRY.size))
+        entries.append({'name': name, 'codec': codec, 'stored': stored, 'size': size,
+                        'offset': offset, 'digest': take(CHECKSUMS[kind][1])})
+    return kind, entries
+
+
+def open_container(stego, M=2, workers=1, located=None):
+    """
+    Reads the header and index of a container hidden in the Pillow image (or
+    StripReader) `stego`, or past the (header, reader) pair `located` that
+    locate_payload already returned. Returns (header, reader, kind, entries,
+    base): the BitReader positioned after the index and `base`, the sample where
+    the index ends, to which each entry's offset is added. Raises like
+    locate_payload, and NoPayloadError when the image holds a single payload.
+    """
+    header, reader = located or locate_payload(stego, M, workers)
+    if not header['flags'] & FLAG_CONTAINER:
+        raise NoPayloadError("image holds a single payload, not a multi-file container")
+    kind, entries = read_container_index(reader.read_bytes)
+    # every run so far took M + b samples
+    return header, reader, kind, entries, reader.consumed * reader.M + reader.ones
+
+
+def container_entry_data(entry, kind, stored):
+    # checks an entry's stored bytes against its digest and decompresses them
+    if len(stored) < entry['stored']:
+        raise NoPayloadError(f"'{entry['name']}' is truncated")
+    if payload_checksum(stored, kind)[1] != entry['digest']:
+        raise NoPayloadError(f"'{entry['name']}' fails its {kind} check (damaged image or wrong M)")
+    return decompress_payload(stored, entry['codec']) if entry['codec'] else stored
+
+
+def find_entry(entries, name):
+    entry = next((e for e in entries if e['name'] == name), None)
+    if entry is None:
+        raise NoPayloadError(f"no file {name!r} in the container (it holds "
+                             f"{', '.join(e['name'] for e in entries)})")
+    return entry
+
+
+def read_entry_at(stego, header, M, start, entry, kind):
+    # decodes `entry` from sample `start` on, without the runs before it
+    layout = 'concatenated' if header['flags'] & FLAG_CONCATENATED else 'interleaved'
+    if isinstance(stego, StripReader):
+        reader = BitReader.from_blocks(stego.sample_blocks(layout, start),
+                                       max(stego.samples - start, 0), M)
+    else:
+        reader = BitReader(sample_stream(np.asarray(stego), layout)[start:], M)
+    return container_entry_data(entry, kind, reader.read_bytes(entry['stored']))
+
 
-    pixels = list(img.getdata())
-    lsbs = [px & 1 for px in pixels]
+def extract_entry(stego, name, M=2, workers=1):
+    """
+    Returns the file `name` from a container hidden in `stego` (path, bytes, Pillow
+    image or StripReader). Only the header and index are decoded from the start
+    of the image; the entry's runs are then decoded from the sample its index
+    entry points at, so the work follows the entry's size rather than the
+    container's. Raises NoPayloadError for a missing or damaged entry.
+    """
+    if isinstance(stego, str):
+        stego = StripReader(stego)
+    elif not isinstance(stego, StripReader):
+        stego = open_image(stego)
+    header, reader, kind, entries, base = open_container(stego, M, workers)
+    entry = find_entry(entries, name)
+    return read_entry_at(stego, header, reader.M, base + entry['offset'], entry, kind)
 
-    # RLE decode on LSB stream
-    raw = find_runs_and_convert_to_output_string(''.join(str(b) for b in lsbs), M)
 
-    # First 32 bits = length header
-    length = int(raw[:32], 2)
-    data_bits = raw[32:32 + length * 8]
+def list_entries(stego, M=2):
+    # the index entries of a container hidden in `stego` (as for extract_entry)
+    if isinstance(stego, str):
+        stego = StripReader(stego)
+    elif not isinstance(stego, StripReader):
+        stego = open_image(stego)
+    return open_container(stego, M)[3]
 
-    # Write recovered file
+
+def _verify_file(task):
+    # process-pool worker: (result, None) or (None, error)
+    stego_file, M = task
     try:
-        with open(message_file, 'wb') as mf:
-            for i in range(0, len(data_bits), 8):
-                byte = data_bits[i:i+8]
-                mf.write(int(byte, 2).to_bytes(1, 'big'))
+        return verify_image(StripReader(stego_file), M), None
+    except StegoError as e:
+        return None, str(e)
     except Exception as e:
-        print(f"Error: cannot write message file '{message_file}': {e}", file=sys.stderr)
-        sys.exit(1)
+        return None, f"cannot open image: {e}"
+
+
+def verify(stego_files, M=2, workers=None):
+    """
+    Checks each stego image's payload against its header checksum on a process
+    pool, reading only, and prints one line per image. Images without a checksum
+    pass when their payload is complete. Returns the number that failed.
+    """
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_verify_file, (f, M)): f for f in stego_files}
+        for fut in as_completed(futures):
+            stego_file = futures[fut]
+            result, error = fut.result()
+            if error is None and not result['ok']:
+                error = (f"{result['checksum']} mismatch" if result['checksum']
+                         else "payload is truncated")
+            if error is not None:
+                failed += 1
+                print(f"(✗): '{stego_file}': {error}")
+            elif result['checksum']:
+                print(f"(✓): '{stego_file}': {result['length']} bytes, {result['checksum']} ok"
+                      f"{' (M=%d)' % result['M'] if M == 'auto' else ''}")
+            else:
+                print(f"(?): '{stego_file}': {result['length']} bytes, complete but no checksum"
+                      f"{' (M=%d)' % result['M'] if M == 'auto' else ''}")
+    print(f"(=): {len(stego_files)} images, {failed} failed")
+    return failed
+
+
+def load_manifest(path):
+    """
+    Reads a batch manifest, JSON Lines (.jsonl/.json) or CSV with a header row.
+    Each job is a dict with an `op` of hide or extract plus that command's options:
+      hide:    message, cover or cover_dir, output, M, in_place, mode, layout, compress, checksum
+      extract: stego, output, M
+    Paths are relative to the current directory, like on the command line.
+    """
+    try:
+        with open(path, newline='') as f:
+            if path.endswith(('.jsonl', '.json')):
+                return [json.loads(line) for line in f if line.strip()]
+            return [{k: v for k, v in row.items() if v not in (None, '')}
+                    for row in csv.DictReader(f)]
+    except (OSError, ValueError) as e:
+        raise StegoError(f"cannot read manifest '{path}': {e}")
+
+
+def min_run_arg(value):
+    # -M / manifest / query value for extracting: an integer or 'auto'
+    return 'auto' if str(value).strip().lower() == 'auto' else int(value)
+
+
+def _flag(value):
+    # manifest booleans arrive as JSON true/false or CSV text
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def run_job(job):
+    """
+    Runs one manifest job in a batch worker. Failures are returned, not raised,
+    so one bad job does not stop the rest. Returns (error or None, seconds).
+    """
+    start = time.perf_counter()
+    error = None
+    try:
+        op = job.get('op')
+        M = min_run_arg(job.get('M', 2)) if op == 'extract' else int(job.get('M', 2))
+        if op == 'hide':
+            if 'cover' not in job and 'cover_dir' not in job:
+                raise KeyError('cover')
+            hide(job['message'], job.get('cover'), job.get('output', 'stego.bmp'), M, None,
+                 in_place=_flag(job.get('in_place', False)), cover_dir=job.get('cover_dir'),
+                 mode=job.get('mode', 'overwrite'), layout=job.get('layout', 'interleaved'),
+                 compress=job.get('compress', 'none'), checksum=job.get('checksum', 'none'))
+        elif op == 'extract':
+            extract(job['stego'], job.get('output', 'message.bin'), M, None)
+        else:
+            raise StegoError(f"unknown op {op!r} (expected hide or extract)")
+    except KeyError as e:
+        error = f"missing field {e}"
+    except (StegoError, OSError, ValueError) as e:
+        error = str(e)
+    return error, time.perf_counter() - start
+
+
+def describe_job(job):
+    if job.get('op') == 'hide':
+        return f"hide '{job.get('message')}' → '{job.get('output', 'stego.bmp')}'"
+    if job.get('op') == 'extract':
+        return f"extract '{job.get('stego')}' → '{job.get('output', 'message.bin')}'"
+    return f"{job.get('op')!r}"
+
+
+def batch(manifest, workers=None):
+    """
+    Runs every job in `manifest` on a process pool of `workers` processes
+    (default: one per CPU), printing each job's status and time as it finishes.
+    Returns the number of failed jobs.
+    """
+    jobs = load_manifest(manifest)
+    failed = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job): i for i, job in enumerate(jobs, 1)}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            error, seconds = fut.result()
+            if error is None:
+                print(f"(✓): job {i} {describe_job(jobs[i - 1])} ({seconds:.3f}s)")
+            else:
+                failed += 1
+                print(f"(✗): job {i} {describe_job(jobs[i - 1])}: {error} ({seconds:.3f}s)")
+    print(f"(=): {len(jobs)} jobs, {failed} failed in {time.perf_counter() - start:.3f}s")
+    return failed
+
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+                422: 'Unprocessable Entity', 500: 'Internal Server Error',
+                503: 'Service Unavailable'}
+
+
+def resolve_cover(name, cover_dir):
+    # map a request's cover name into the server's cover directory, refusing escapes
+    if cover_dir is None:
+        raise StegoError("server has no --cover-dir; upload the cover with cover_bytes=N")
+    root = os.path.realpath(cover_dir)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root:
+        raise StegoError(f"cover '{name}' is outside the cover directory")
+    return path
+
+
+def serve_task(op, params, body, cover_dir):
+    """
+    Runs one service request in a pool worker and returns (status, content_type, body).
+      hide:     body is the payload; the cover is `cover=<name>` from the cover
+                directory, the first `cover_bytes=N` bytes of the body, or else the
+                best-fitting cataloged cover
+      extract:  body is the stego image; returns the payload
+      capacity: `cover=<name>` or an image body; returns JSON sizes for M
+    """
+    try:
+        M = min_run_arg(params.get('M', 2)) if op == 'extract' else int(params.get('M', 2))
+        if op == 'extract':
+            return 200, 'application/octet-stream', extract_bytes(body, M)
+        if op == 'capacity':
+            img = (cover_cache.get(resolve_cover(params['cover'], cover_dir)) if 'cover' in params
+                   else open_image(body))
+            bands = len(img.getbands())
+            samples = img.width * img.height * bands
+            info = {'width': img.width, 'height': img.height, 'mode': img.mode,
+                    'pixels': img.width * img.height, 'samples': samples, 'M': M,
+                    'max_bytes': max_payload_bytes(samples, M, 8 if bands > 1 else 4)}
+            return 200, 'application/json', json.dumps(info).encode()
+        compress = params.get('compress', 'none')
+        if 'cover_bytes' in params:
+            n = int(params['cover_bytes'])
+            cover, data = body[:n], body[n:]
+        elif 'cover' in params:
+            cover, data = resolve_cover(params['cover'], cover_dir), body
+        else:
+            if cover_dir is None:
+                raise StegoError("no cover given (use cover=, cover_bytes= or start with --cover-dir)")
+            data = body
+            # size the cover for the payload as stored (compressed, extended header)
+            compress, payload = compress_payload(data, compress)
+            header = build_header(len(payload), extended=True,
+                                  checksum=payload_checksum(payload, params.get('checksum', 'none')))
+            cover = select_cover(cover_dir, needed_pixels(payload_bits(payload, header), M))
+        out = hide_bytes(data, cover, M, mode=params.get('mode', 'overwrite'),
+                         layout=params.get('layout', 'interleaved'), compress=compress,
+                         checksum=params.get('checksum', 'none'), cache=cover_cache)
+        return 200, 'image/png' if out.startswith(b'\x89PNG') else 'image/bmp', out
+    except (ImageFormatError, CapacityError, NoPayloadError) as e:
+        return 422, 'text/plain', str(e).encode()
+    except (StegoError, ValueError, KeyError) as e:
+        return 400, 'text/plain', str(e).encode()
+
+
+def serve_batch(tasks):
+    # one pool round trip for a whole batch of queued requests, plus this
+    # worker's cover cache counters
+    return [serve_task(*task) for task in tasks], (os.getpid(), cover_cache.stats())
+
+
+def _init_serve_worker(cache_bytes):
+    cover_cache.max_bytes = cache_bytes
+
+
+class StegoServer:
+    """
+    Local HTTP front end for hide/extract/capacity.
+
+    Requests wait in a queue of at most `queue_size` entries (503 when it is full).
+    A dispatcher hands them to a process pool in batches of up to `batch_size`, with
+    at most `workers` batches running at once, so bursts of small requests share
+    pool round trips. Each worker keeps decoded covers in a CoverCache of
+    `cache_bytes`. GET /stats reports queue depth, per-endpoint latency and
+    the cover cache counters summed over the workers.
+    """
+
+    def __init__(self, cover_dir=None, workers=None, queue_size=64, batch_size=8,
+                 max_body=64 << 20, cache_bytes=COVER_CACHE_BYTES):
+        self.cover_dir = cover_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_body = max_body
+        self.cache_bytes = cache_bytes
+        self.counters = {'accepted': 0, 'rejected': 0, 'batches': 0, 'in_flight': 0,
+                         'queue_peak': 0}
+        self.latency = {}
+        self.caches = {}  # worker pid → its latest cover cache counters
+
+    async def run(self, host, port, ready=None):
+        self.queue = asyncio.Queue(self.queue_size)
+        self.slots = asyncio.Semaphore(self.workers)
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_init_serve_worker,
+                                        initargs=(self.cache_bytes,))
+        with self.pool:
+            dispatcher = asyncio.create_task(self._dispatch())
+            server = await asyncio.start_server(self._handle, host, port)
+            host, port = server.sockets[0].getsockname()[:2]
+            if ready:
+                ready(host, port)
+            try:
+                async with server:
+                    await server.serve_forever()
+            finally:
+                dispatcher.cancel()
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # wait for a free worker first, so requests pile up and get batched meanwhile
+            await self.slots.acquire()
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self.counters['batches'] += 1
+            self.counters['in_flight'] += len(batch)
+            fut = loop.run_in_executor(self.pool, serve_batch, [task for task, _ in batch])
+            fut.add_done_callback(lambda f, batch=batch: self._finish(batch, f))
+
+    def _finish(self, batch, fut):
+        self.slots.release()
+        self.counters['in_flight'] -= len(batch)
+        try:
+            results, (pid, cache) = fut.result()
+            self.caches[pid] = cache
+        except Exception as e:  # a worker died; fail the batch, keep serving
+            results = [(500, 'text/plain', str(e).encode())] * len(batch)
+        for (_, waiter), result in zip(batch, results):
+            if not waiter.done():
+                waiter.set_result(result)
+
+    def stats(self):
+        endpoints = {name: dict(c, mean_ms=c['total_ms'] / c['requests'] if c['requests'] else 0.0)
+                     for name, c in self.latency.items()}
+        cache = {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'bytes': 0}
+        for worker in self.caches.values():
+            for key in cache:
+                cache[key] += worker[key]
+        cache['max_bytes_per_worker'] = self.cache_bytes
+        return dict(self.counters, queue_depth=self.queue.qsize(), queue_size=self.queue_size,
+                    workers=self.workers, endpoints=endpoints, cover_cache=cache)
+
+    def _record(self, op, status, ms):
+        c = self.latency.setdefault(op, {'requests': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        c['requests'] += 1
+        c['errors'] += status >= 400
+        c['total_ms'] += ms
+        c['max_ms'] = max(c['max_ms'], ms)
+
+    async def _submit(self, op, params, body):
+        if self.queue.full():
+            self.counters['rejected'] += 1
+            return 503, 'text/plain', b'queue full, retry later'
+        waiter = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(((op, params, body, self.cover_dir), waiter))
+        self.counters['accepted'] += 1
+        self.counters['queue_peak'] = max(self.counters['queue_peak'], self.queue.qsize())
+        return await waiter
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, target, _ = line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b'\r\n', b'\n', b''):
+                        break
+                    k, _, v = h.decode('latin-1').partition(':')
+                    headers[k.strip().lower()] = v.strip()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                length = int(headers.get('content-length', 0))
+                if length > self.max_body:
+                    await self._respond(writer, 413, 'text/plain', b'body too large', False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                url = urlsplit(target)
+                op = url.path.strip('/')
+                params = dict(parse_qsl(url.query))
+                start = time.perf_counter()
+                if op == 'stats' and method == 'GET':
+                    status, ctype, out = 200, 'application/json', json.dumps(self.stats()).encode()
+                elif op in ('hide', 'extract', 'capacity') and method in ('GET', 'POST'):
+                    status, ctype, out = await self._submit(op, params, body)
+                    self._record(op, status, (time.perf_counter() - start) * 1000)
+                else:
+                    status, ctype, out = 404, 'text/plain', b'unknown endpoint'
+                await self._respond(writer, status, ctype, out, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, ctype, body, keep_alive):
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode('latin-1') + b'\r\n' + body)
+        await writer.drain()
+
+
+def serve(host, port, cover_dir=None, workers=None, queue_size=64, batch_size=8,
+          cache_bytes=COVER_CACHE_BYTES):
+    server = StegoServer(cover_dir, workers, queue_size, batch_size, cache_bytes=cache_bytes)
+    ready = lambda h, p: print(f"(✓): Serving hide/extract/capacity on http://{h}:{p} "
+                               f"({server.workers} workers)", flush=True)
+    try:
+        asyncio.run(server.run(host, port, ready))
+    except KeyboardInterrupt:
+        print("(✓): Server stopped")
+
+
+def bench_case(message_file, cover_file, M, repeat, workdir):
+    """
+    Times hide and extract of one message/cover/M combination. Times are the best of
+    `repeat` runs; peak memory comes from one extra run of each under tracemalloc so
+    that tracing does not skew the timings.
+    """
+    stego_file = os.path.join(workdir, 'bench.bmp')
+    out_file = os.path.join(workdir, 'bench.bin')
+    hide_s, extract_s = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hide(message_file, cover_file, stego_file, M, None)
+        hide_s.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        extract(stego_file, out_file, M, None)
+        extract_s.append(time.perf_counter() - start)
+
+    peaks = []
+    for run in (lambda: hide(message_file, cover_file, stego_file, M, None),
+                lambda: extract(stego_file, out_file, M, None)):
+        tracemalloc.start()
+        run()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
 
+    with open(message_file, 'rb') as f, open(out_file, 'rb') as g:
+        roundtrip = f.read() == g.read()
+    with _pil().open(cover_file) as img:
+        pixels = img.width * img.height
+    size = os.path.getsize(message_file)
+    hide_t, extract_t = min(hide_s), min(extract_s)
+    return {
+        'case': f"{os.path.basename(cover_file)}|{os.path.basename(message_file)}|M={M}",
+        'cover': os.path.basename(cover_file), 'message': os.path.basename(message_file),
+        'M': M, 'payload_bytes': size, 'pixels': pixels, 'roundtrip_ok': roundtrip,
+        'hide_s': hide_t, 'extract_s': extract_t,
+        'hide_MBps': size / 1e6 / hide_t, 'extract_MBps': size / 1e6 / extract_t,
+        'hide_pixels_per_s': pixels / hide_t, 'extract_pixels_per_s': pixels / extract_t,
+        'hide_peak_bytes': peaks[0], 'extract_peak_bytes': peaks[1],
+    }
 
-# aesthetic loading function 
-def loading_HIDE(message_file, stego_file, cover_file):
+
+def compare_bench(results, baseline, tolerance):
+    # cases whose hide or extract time grew by more than `tolerance` over the baseline
+    base = {c['case']: c for c in baseline.get('cases', [])}
+    regressions = []
+    for c in results['cases']:
+        old = base.get(c['case'])
+        if old is None:
+            continue
+        for key in ('hide_s', 'extract_s'):
+            if c[key] > old[key] * (1 + tolerance):
+                regressions.append((c['case'], key, old[key], c[key]))
+    return regressions
+
+
+def bench(covers_dir, messages_dir, Ms, limit=2, repeat=3, json_file=None,
+          baseline_file=None, tolerance=0.15):
+    """
+    Runs hide, extract and round-trip over the first `limit` covers in `covers_dir`
+    and every message in `messages_dir` that fits, for each M in `Ms`. Prints a
+    table, optionally writes the results as JSON, and compares them with a saved
+    baseline. Returns the number of regressions plus round-trip failures.
+    """
+    try:
+        covers = sorted(os.path.join(covers_dir, n) for n in os.listdir(covers_dir)
+                        if n.lower().endswith('.bmp'))[:limit]
+        messages = sorted(os.path.join(messages_dir, n) for n in os.listdir(messages_dir)
+                          if os.path.isfile(os.path.join(messages_dir, n)))
+    except OSError as e:
+        raise StegoError(f"cannot list benchmark corpus: {e}")
+
+    cases = []
+    print(f"  {'case':<58} {'hide ms':>9} {'extract ms':>11} {'MB/s':>7} {'Mpx/s':>7} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for cover in covers:
+            with _pil().open(cover) as img:
+                cap = img.width * img.height
+            for message in messages:
+                with open(message, 'rb') as f:
+                    bits = payload_bits(f.read())
+                for M in Ms:
+                    if needed_pixels(bits, M) > cap:
+                        continue
+                    c = bench_case(message, cover, M, repeat, workdir)
+                    cases.append(c)
+                    flag = '' if c['roundtrip_ok'] else '  ROUNDTRIP FAILED'
+                    print(f"  {c['case']:<58} {c['hide_s'] * 1000:>9.2f} {c['extract_s'] * 1000:>11.2f} "
+                          f"{c['hide_MBps']:>7.2f} {c['hide_pixels_per_s'] / 1e6:>7.1f} "
+                          f"{max(c['hide_peak_bytes'], c['extract_peak_bytes']) / 1e6:>8.1f}{flag}")
+
+    results = {'version': 1, 'python': platform.python_version(), 'numpy': np.__version__,
+               'repeat': repeat, 'cases': cases}
+    if json_file:
+        try:
+            with open(json_file, 'w') as f:
+                json.dump(results, f, indent=1)
+        except OSError as e:
+            raise StegoError(f"cannot write benchmark results '{json_file}': {e}")
+
+    failures = sum(not c['roundtrip_ok'] for c in cases)
+    regressions = []
+    if baseline_file:
+        try:
+            with open(baseline_file) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise StegoError(f"cannot read baseline '{baseline_file}': {e}")
+        regressions = compare_bench(results, baseline, tolerance)
+        for case, key, old, new in regressions:
+            print(f"(✗): REGRESSION {case} {key}: {old * 1000:.2f} ms → {new * 1000:.2f} ms "
+                  f"(+{(new / old - 1) * 100:.0f}%)")
+    print(f"(=): {len(cases)} cases, {failures} round-trip failures, {len(regressions)} regressions")
+    return failures + len(regressions)
+
+
+def chi2_embedding_probability(chi2, df):
+    # P(X >= chi2) for X ~ chi-square(df), Wilson-Hilferty approximation
+    if df < 1:
+        return None
+    z = ((chi2 / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def lsb_statistics(arr, max_run=16):
+    """
+    Cover-independent detectability figures for an image array:
+      - hist: LSB run-length histogram, lengths 1..max_run (the last bucket holds
+        longer runs too)
+      - chi2, chi2_df, p_embed: Westfeld and Pfitzmann's chi-square over the value
+        pairs 2k/2k+1, and the probability that their counts are as level as LSB
+        overwriting leaves them (near 1 is suspicious)
+      - head_samples, head_run: the leading samples covered by runs of only two
+        adjacent lengths (head_run and head_run + 1), which is the stretch the
+        overwrite encoder writes at the start of the image
+    """
+    samples = arr.reshape(-1)
+    _, lengths = find_runs(samples & 1)
+    hist = np.bincount(np.minimum(lengths, max_run), minlength=max_run + 1)[1:]
+
+    values = np.bincount(samples, minlength=2)
+    values = values[:len(values) // 2 * 2]
+    expected = (values[0::2] + values[1::2]) / 2
+    keep = expected >= 5  # the usual minimum cell count for the test
+    chi2 = float(np.sum((values[0::2][keep] - expected[keep]) ** 2 / expected[keep]))
+    df = int(np.count_nonzero(keep)) - 1
+
+    # the first run is M or M + 1 long, and both leading runs are M + 1 when the
+    # payload starts with bits 1, 1 (every extended header): try either as M and
+    # keep the longer prefix of conforming runs
+    head_run, head_samples = 0, 0
+    for m in (int(lengths[0]), int(lengths[0]) - 1) if len(lengths) else ():
+        if m < 1:
+            continue
+        uniform = (lengths == m) | (lengths == m + 1)
+        n = len(lengths) if uniform.all() else int(np.argmin(uniform))
+        if int(lengths[:n].sum()) > head_samples:
+            head_run, head_samples = m, int(lengths[:n].sum())
+    return {'samples': int(samples.size), 'runs': int(len(lengths)),
+            'mean_run': float(samples.size / max(len(lengths), 1)), 'hist': hist.tolist(),
+            'chi2': chi2, 'chi2_df': df, 'p_embed': chi2_embedding_probability(chi2, df),
+            'head_samples': head_samples, 'head_run': head_run}
+
+
+def compare_to_cover(arr, cover_arr):
+    # samples changed and PSNR (None when identical) of a stego array against its cover
+    diff = arr.astype(np.int64) - cover_arr.astype(np.int64)
+    changed = int(np.count_nonzero(diff))
+    mse = float(np.mean(diff ** 2)) if diff.size else 0.0
+    peak = 65535 if arr.dtype == np.uint16 else 255
+    return {'flips': changed, 'psnr': 10 * math.log10(peak ** 2 / mse) if mse else None}
+
+
+def _analyze_file(task):
+    """
+    Process-pool worker: statistics for one image (reused from `cached` when the
+    file's hash was seen before) and, given candidate covers, the comparison with
+    the same-shaped cover that differs in the fewest samples.
+    Returns (result, error).
+    """
+    path, cached, covers, max_run = task
+    try:
+        img = open_image(path)
+        result = {'file': path, 'mode': img.mode, 'width': img.width, 'height': img.height}
+        if img.mode not in COVER_MODES:
+            raise ImageFormatError(f"mode {img.mode} has no LSB samples to analyze")
+        if cached is not None and not covers:
+            result.update(cached)
+            return result, None
+        arr = np.asarray(img)
+        result.update(cached if cached is not None else lsb_statistics(arr, max_run))
+        best = None
+        for cover_file in covers:
+            cover = np.asarray(open_image(cover_file))
+            if cover.shape != arr.shape or cover.dtype != arr.dtype:
+                continue
+            cmp = compare_to_cover(arr, cover)
+            if best is None or cmp['flips'] < best['flips']:
+                best = dict(cmp, cover=cover_file)
+        if best is not None:
+            result.update(best)
+        return result, None
+    except (StegoError, OSError) as e:
+        return None, f"'{path}': {e}"
+
+
+def analyze(paths, cover=None, cover_dir=None, workers=None, json_file=None, max_run=16):
+    """
+    Detectability report for the images in `paths` (files, or directories whose
+    images are all taken) computed on a process pool. With `cover` or
+    `cover_dir`, each image is also compared with that cover, or with the
+    same-sized cataloged cover it differs from least, for flipped samples and
+    PSNR. Cover-independent statistics are cached per file hash in an
+    ANALYSIS_NAME file next to the images. Prints a table, or writes JSON to
+    `json_file` ('-' for stdout). Returns the number of images that failed.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            try:
+                files += sorted(os.path.join(path, n) for n in os.listdir(path)
+                                if not n.startswith('.') and os.path.isfile(os.path.join(path, n)))
+            except OSError as e:
+                raise StegoError(f"cannot list '{path}': {e}")
+        else:
+            files.append(path)
+    covers = [cover] if cover else []
+    if cover_dir:
+        covers = cataloged_covers(cover_dir)
+
+    # cached statistics, one cache per image directory
+    caches, digests, failed = {}, {}, 0
+    for f in list(files):
+        try:
+            digests[f] = file_sha256(f)
+        except OSError as e:
+            failed += 1
+            files.remove(f)
+            print(f"(✗): '{f}': {e}", file=sys.stderr)
+            continue
+        d = os.path.dirname(os.path.abspath(f))
+        if d not in caches:
+            try:
+                with open(os.path.join(d, ANALYSIS_NAME)) as fh:
+                    index = json.load(fh)
+                ok = index.get('version') == ANALYSIS_VERSION and index.get('max_run') == max_run
+                caches[d] = index.get('images', {}) if ok else {}
+            except (OSError, ValueError):
+                caches[d] = {}
+
+    stat_keys = ('samples', 'runs', 'mean_run', 'hist', 'chi2', 'chi2_df', 'p_embed',
+                 'head_samples', 'head_run')
+    results, dirty = [], set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tasks = []
+        for f in files:
+            d = os.path.dirname(os.path.abspath(f))
+            others = [c for c in covers if os.path.abspath(c) != os.path.abspath(f)]
+            tasks.append((f, caches[d].get(digests[f]), others, max_run))
+        for f, (result, error) in zip(files, pool.map(_analyze_file, tasks)):
+            if error is not None:
+                failed += 1
+                print(f"(✗): {error}", file=sys.stderr)
+                continue
+            d = os.path.dirname(os.path.abspath(f))
+            if digests[f] not in caches[d]:
+                caches[d][digests[f]] = {k: result[k] for k in stat_keys}
+                dirty.add(d)
+            results.append(result)
+
+    for d in dirty:
+        index_path = os.path.join(d, ANALYSIS_NAME)
+        tmp = f"{index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w') as fh:
+                json.dump({'version': ANALYSIS_VERSION, 'max_run': max_run, 'images': caches[d]},
+                          fh, sort_keys=True)
+            os.replace(tmp, index_path)
+        except OSError:
+            pass  # the cache only saves time; a read-only directory still gets its report
+
+    if json_file:
+        text = json.dumps({'version': 1, 'images': results}, indent=1)
+        if json_file == '-':
+            print(text)
+        else:
+            try:
+                with open(json_file, 'w') as fh:
+                    fh.write(text)
+            except OSError as e:
+                raise StegoError(f"cannot write analysis '{json_file}': {e}")
+        return failed
+
+    print(f"  {'image':<40} {'runs':>8} {'mean':>5} {'1-2':>5} {'p_embed':>8} "
+          f"{'head px':>9} {'flips':>8} {'PSNR dB':>8}")
+    for r in results:
+        short = r['hist'][0] + r['hist'][1] if len(r['hist']) > 1 else r['hist'][0]
+        p = '-' if r['p_embed'] is None else f"{r['p_embed']:.3f}"
+        flips = f"{r['flips']}" if 'flips' in r else '-'
+        psnr = '-' if 'flips' not in r else ('inf' if r['psnr'] is None else f"{r['psnr']:.2f}")
+        print(f"  {os.path.basename(r['file']):<40} {r['runs']:>8} {r['mean_run']:>5.2f} "
+              f"{short / max(r['runs'], 1):>5.2f} {p:>8} {r['head_samples']:>9} {flips:>8} {psnr:>8}")
+    print(f"(=): {len(results)} images analyzed, {failed} failed")
+    return failed
+
+
+def progress_bar(stream=None):
+    """
+    Returns a progress(done, total) callback that redraws a 10-cell bar in place,
+    or None when the stream is not a terminal, so piped and automated runs skip
+    progress reporting altogether.
+    """
+    stream = stream or sys.stdout
+    if not stream.isatty():
+        return None
+    last = -1
+
+    def progress(done, total):
+        nonlocal last
+        pct = 100 * done // total if total else 100
+        if pct == last:
+            return
+        last = pct
+        cells = pct // 10
+        stream.write(f"\r{'█' * cells}{'▒' * (10 - cells)} {pct}%")
+        if done >= total:
+            stream.write("\n")
+        stream.flush()
+    return progress
+
+
+def loading_HIDE(message_file, stego_file, cover_file, quiet=False):
+    # prints the hide header and returns the progress callback for hide()
+    if quiet:
+        return None
     print(f"-------------------------Loading...---------------------------\n"
           f"(+): HIDE embedding '{message_file}' into '{cover_file}'")
     print(f"(→): Writing file to {stego_file}")
-    time.sleep(0.5); print("█▒▒▒▒▒▒▒▒▒ 10%")
-    time.sleep(0.5); print("██▒▒▒▒▒▒▒▒ 20%")
-    time.sleep(0.5); print("███▒▒▒▒▒▒▒ 30%")
-    time.sleep(0.5); print("████▒▒▒▒▒▒ 40%")
-    time.sleep(0.5); print("█████▒▒▒▒▒ 50%")
-    time.sleep(0.5); print("██████▒▒▒▒ 60%")
-    time.sleep(0.5); print("███████▒▒▒ 70%")
-    time.sleep(0.5); print('████████▒▒ 80%')
-    time.sleep(0.5); print('█████████▒ 90%')
-    time.sleep(1);   print('██████████ 100%')
-
-#aesthetic loading function
-def loading_EXTRACT(stego_file, message_file):
+    return progress_bar()
+
+
+def loading_EXTRACT(stego_file, message_file, quiet=False):
+    # prints the extract header and returns the progress callback for extract()
+    if quiet:
+        return None
     print(f"-------------------------Loading...---------------------------\n"
           f"(/): EXTRACT MODE: Extracting hidden data in '{stego_file}' to '{message_file}'")
     print(f"(→): Extracting data to {message_file}")
-    time.sleep(0.5); print("█▒▒▒▒▒▒▒▒▒ 10%")
-    time.sleep(0.5); print("██▒▒▒▒▒▒▒▒ 20%")
-    time.sleep(0.5); print("███▒▒▒▒▒▒▒ 30%")
-    time.sleep(0.5); print("████▒▒▒▒▒▒ 40%")
-    time.sleep(0.5); print("█████▒▒▒▒▒ 50%")
-    time.sleep(0.5); print("██████▒▒▒▒ 60%")
-    time.sleep(0.5); print("███████▒▒▒ 70%")
-    time.sleep(0.5); print('████████▒▒ 80%')
-    time.sleep(0.5); print('█████████▒ 90%')
-    time.sleep(1);  print('██████████ 100%')
+    return progress_bar()
 
 
 def main():
@@ -182,57 +3353,322 @@ def main():
    |░▒█▄▄▄█░░▀░░▀▀▀░▀▀▀▀░░▀▀░░░░▒█░░░░▀░▀▀░░▀▀░░▀▀▀▀░▀░▀▀░▀░░▀░▀░░▒▀ |
     ----By: Levi Torres, Lawrence Skergan, Andrew Kolb, Ryan Hunt-----
     """
-    print(ascii_art)
-
     parser = argparse.ArgumentParser(
         prog='stego.py',
         description='Hide/Extract Data within an 8-bit BMP using LSB+RLE'
     )
     if len(sys.argv) == 1:
+        print(ascii_art)
         parser.print_help()
         print("""
 Examples:
   python stego.py hide   -m secret.txt -c cover_gray.bmp -o stego.bmp -M 8
   python stego.py extract -s stego.bmp     -o recovered.bin -M 8
+  python stego.py update  -s stego.bmp     -m secret_v2.txt -M 8
+  python stego.py analyze ./archive --cover-dir ./testfiles/Grayscale
+  python stego.py batch   jobs.csv -j 8
+  python stego.py catalog ./testfiles/Grayscale
+  python stego.py serve   --cover-dir ./testfiles/Grayscale --port 8463
+  python stego.py bench   -M 2,4,8 --json bench.json --baseline old.json
 
 Arguments for hide:
-  -m, --message   Path to message file to hide
-  -c, --cover     Path to 8-bit grayscale BMP cover
-  -o, --output    Output stego image (default: stego.bmp)
+  -m, --message   Path to message file to hide ('-' reads standard input); several are
+                  stored as a multi-file container
+  -c, --cover     Path to cover (8-bit grayscale, RGB, RGBA or 16-bit grayscale; lossless);
+                  several with --shards
+  --cover-dir     Pick the smallest fitting cover from a cataloged directory
+  -o, --output    Output stego image (default: stego.bmp; '-' writes standard output)
   -M, --min-run   Minimum RLE run length (default: 2)
+  --mode          overwrite (default) or adaptive (reuse the cover's runs, fewer flips)
+  --layout        interleaved (default) or concatenated channel order for RGB/RGBA
+  --compress      none (default), zlib, bz2, lzma or auto (smallest) before embedding
+  --checksum      none (default), crc32 or blake2 digest of the payload in the header
+  --in-place      Patch only the used rows of an uncompressed BMP
+  --shards DIR    Split the message across the covers (or the cataloged directory,
+                  largest first) and write one stego image per shard into DIR
+  -j, --workers   Worker processes for --shards (default: CPU count)
 
 Arguments for extract:
-  -s, --stego     Path to stego image
-  -o, --output    Recovered message file (default: message.bin)
-  -M, --min-run   Minimum RLE run length used during extraction
+  -s, --stego     Path to stego image ('-' reads standard input), or every shard
+                  image of a sharded message
+  -o, --output    Recovered message file (default: message.bin; '-' writes standard output),
+                  or for a container the directory to write all of its files to
+  -M, --min-run   Minimum RLE run length used during hiding, or 'auto' to detect it
+  -j, --workers   Worker processes when decoding shards (default: CPU count)
+  --name          Extract only this file of a multi-file container (default output:
+                  its own name)
+  --list          List the files of a multi-file container
+
+Arguments for update:
+  -s, --stego     Stego image holding the old message (no cover needed)
+  -m, --message   New message file ('-' reads standard input); several are stored as
+                  a multi-file container
+  -o, --output    Updated image (default: the stego image itself, an 8-bit BMP patched
+                  in place; '-' writes standard output)
+  -M, --min-run   Minimum RLE run length used during hiding, or 'auto' to detect it
+  --compress      Codec for the new message (default: the one the image already uses)
+  --checksum      Payload checksum (default: the one the image already uses)
+
+Arguments for verify:
+  stego           Stego images to check (read-only; exit status 1 if any fail)
+  -M, --min-run   Minimum RLE run length used during hiding, or 'auto' (default: 2)
+  -j, --workers   Worker processes (default: CPU count)
+
+Arguments for analyze:
+  images          Images, or directories of images, to report on
+  --cover         Original cover to count flipped samples and PSNR against
+  --cover-dir     Match each image against the closest cataloged cover instead
+  --max-run       Longest run length with its own histogram bucket (default: 16)
+  --json          Write the report as JSON ('-' writes standard output)
+  -j, --workers   Worker processes (default: CPU count)
+
+Arguments for serve:
+  --host, --port  Address to listen on (default: 127.0.0.1:8463)
+  --cover-dir     Covers the service may embed into (by name or best fit)
+  -j, --workers   Worker processes (default: CPU count)
+  --queue         Queued requests before answering 503 (default: 64)
+  --batch         Requests handed to a worker at once (default: 8)
+  --cache-mb      Decoded covers each worker keeps in memory, in MiB (default: 256;
+                  0 disables)
+
+Arguments for bench:
+  --covers        Cover directory (default: testfiles/Grayscale)
+  --messages      Payload directory (default: testfiles/message)
+  -M, --min-run   Comma-separated M values (default: 2,4,8)
+  --limit         Number of covers to use (default: 2)
+  --repeat        Timed runs per case, best kept (default: 3)
+  --json          Write results as JSON
+  --baseline      Compare with a saved JSON run and flag regressions
+  --tolerance     Allowed slowdown before flagging (default: 0.15)
+
+Common arguments:
+  -q, --quiet     No banner, headers or progress bar (progress only shows on a TTY)
+  --stats         (hide/extract) Print per-stage timings and counters as JSON
+  --profile STAGE (hide/extract) Run STAGE ('*' for all) under cProfile
+
+Arguments for catalog:
+  cover_dir       Directory of covers to index (refreshed by mtime)
+
+Arguments for batch:
+  manifest        CSV or JSONL file of hide/extract jobs
+  -j, --workers   Number of worker processes (default: CPU count)
 """)
         sys.exit(0)
 
     subs = parser.add_subparsers(dest='command', required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-q', '--quiet', action='store_true',
+                        help='Suppress the banner, headers and progress bar')
+
+    instrument = argparse.ArgumentParser(add_help=False)
+    instrument.add_argument('--stats', action='store_true',
+                            help='Print per-stage timings and counters as JSON')
+    instrument.add_argument('--profile', metavar='STAGE',
+                            help="Run this stage ('*' for all) under cProfile and print the top calls")
 
     # Hide mode
-    h = subs.add_parser('hide', help='Embed a message into a cover image')
-    h.add_argument('-m', '--message', required=True, help='Path to message file')
-    h.add_argument('-c', '--cover',   required=True, help='Path to 8-bit grayscale BMP cover')
-    h.add_argument('-o', '--output',  default='stego.bmp', help='Output stego image')
+    h = subs.add_parser('hide', parents=[common, instrument], help='Embed a message into a cover image')
+    h.add_argument('-m', '--message', required=True, nargs='+',
+                   help="Path to message file ('-' for stdin); several are stored as a container")
+    cover = h.add_mutually_exclusive_group(required=True)
+    cover.add_argument('-c', '--cover', nargs='+',
+                       help='Path to cover image (L, RGB, RGBA or I;16, lossless format); several with --shards')
+    cover.add_argument('--cover-dir', help='Pick the smallest fitting cover from this cataloged directory')
+    h.add_argument('-o', '--output',  default='stego.bmp', help="Output stego image ('-' for stdout)")
     h.add_argument('-M', '--min-run', type=int, default=2, help='Minimum RLE run length')
+    h.add_argument('--mode', choices=EMBED_MODES, default='overwrite',
+                   help='overwrite: fresh runs from the first pixel; adaptive: adjust the cover\'s own runs')
+    h.add_argument('--compress', choices=[*CODECS, 'auto'], default='none',
+                   help='Compress the message before embedding (auto keeps the smallest)')
+    h.add_argument('--checksum', choices=list(CHECKSUMS), default='none',
+                   help='Store a digest of the payload so extract and verify can check it')
+    h.add_argument('--layout', choices=LAYOUTS, default='interleaved',
+                   help='Channel order of the LSB stream for RGB/RGBA covers')
+    h.add_argument('--in-place', action='store_true',
+                   help='Patch only the used pixel rows of an uncompressed BMP (output may equal the cover)')
+    h.add_argument('--shards', metavar='DIR',
+                   help='Split the message across the covers and write one stego image per shard to DIR')
+    h.add_argument('-j', '--workers', type=int, default=None, help='Worker processes for --shards')
 
     # Extract mode
-    e = subs.add_parser('extract', help='Extract a message from a stego image')
-    e.add_argument('-s', '--stego',   required=True, help='Path to stego image')
-    e.add_argument('-o', '--output',  default='message.bin', help='Recovered message file')
-    e.add_argument('-M', '--min-run', type=int, default=2, help='Minimum RLE run length')
+    e = subs.add_parser('extract', parents=[common, instrument], help='Extract a message from a stego image')
+    e.add_argument('-s', '--stego',   required=True, nargs='+',
+                   help='Path to stego image (several: the shards of one message, any order)')
+    e.add_argument('-o', '--output',  default=None,
+                   help="Recovered message file ('-' for stdout; default message.bin), "
+                        "or the directory for a container's files")
+    e.add_argument('-M', '--min-run', type=min_run_arg, default=2,
+                   help="Minimum RLE run length, or 'auto' to detect it")
+    e.add_argument('-j', '--workers', type=int, default=None,
+                   help='Worker processes decoding shards or one large image')
+    e.add_argument('--name', help="Extract only this file of a multi-file container")
+    e.add_argument('--list', action='store_true', help="List the files of a multi-file container")
+
+    # Update mode
+    u = subs.add_parser('update', parents=[common],
+                        help='Replace the message in a stego image without its cover')
+    u.add_argument('-s', '--stego', required=True, help='Stego image holding the old message')
+    u.add_argument('-m', '--message', required=True, nargs='+',
+                   help="New message file ('-' for stdin); several are stored as a container")
+    u.add_argument('-o', '--output', default=None,
+                   help="Updated image ('-' for stdout; default: the stego image itself, an 8-bit BMP "
+                        "patched in place)")
+    u.add_argument('-M', '--min-run', type=min_run_arg, default=2,
+                   help="Minimum RLE run length, or 'auto' to detect it")
+    u.add_argument('--compress', choices=[*CODECS, 'auto'], default=None,
+                   help='Compress the new message (default: the codec the image already uses)')
+    u.add_argument('--checksum', choices=list(CHECKSUMS), default=None,
+                   help='Payload checksum (default: the one the image already uses)')
+
+    # Verify mode
+    y = subs.add_parser('verify', parents=[common], help='Check stego images against their payload checksums')
+    y.add_argument('stego', nargs='+', help='Stego images to check')
+    y.add_argument('-M', '--min-run', type=min_run_arg, default=2,
+                   help="Minimum RLE run length, or 'auto' to detect it per image")
+    y.add_argument('-j', '--workers', type=int, default=None, help='Number of worker processes')
+
+    # Analyze mode
+    a = subs.add_parser('analyze', parents=[common], help='Report how detectable the LSB payloads of images are')
+    a.add_argument('images', nargs='+', help='Images or directories of images to analyze')
+    a.add_argument('--cover', help='Original cover to count flipped samples and PSNR against')
+    a.add_argument('--cover-dir', help='Cataloged covers to match each image against')
+    a.add_argument('--max-run', type=int, default=16, help='Longest run length with its own histogram bucket')
+    a.add_argument('--json', help="Write the report as JSON to this file ('-' for stdout)")
+    a.add_argument('-j', '--workers', type=int, default=None, help='Number of worker processes')
+
+    # Catalog mode
+    c = subs.add_parser('catalog', parents=[common], help='Index the covers in a directory for hide --cover-dir')
+    c.add_argument('cover_dir', help='Directory of cover images')
+
+    # Batch mode
+    b = subs.add_parser('batch', parents=[common], help='Run a manifest of hide/extract jobs on a process pool')
+    b.add_argument('manifest', help='CSV or JSONL job manifest (columns: op, message, cover, cover_dir, stego, output, M, in_place, mode, layout, compress, checksum)')
+    b.add_argument('-j', '--workers', type=int, default=None, help='Number of worker processes')
+
+    # Serve mode
+    v = subs.add_parser('serve', parents=[common], help='Run a local HTTP hide/extract/capacity service')
+    v.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+    v.add_argument('--port', type=int, default=8463, help='Port to listen on (0 picks a free one)')
+    v.add_argument('--cover-dir', help='Directory of covers requests may use')
+    v.add_argument('-j', '--workers', type=int, default=None, help='Number of worker processes')
+    v.add_argument('--queue', type=int, default=64, help='Maximum queued requests before 503')
+    v.add_argument('--batch', type=int, default=8, help='Maximum requests per worker batch')
+    v.add_argument('--cache-mb', type=int, default=COVER_CACHE_BYTES >> 20,
+                   help='Decoded covers each worker keeps in memory, in MiB (0 disables)')
+
+    # Bench mode
+    n = subs.add_parser('bench', parents=[common], help='Benchmark hide/extract over the bundled corpus')
+    n.add_argument('--covers', default=os.path.join(TESTFILES, 'Grayscale'), help='Cover directory')
+    n.add_argument('--messages', default=os.path.join(TESTFILES, 'message'), help='Payload directory')
+    n.add_argument('-M', '--min-run', default='2,4,8', help='Comma-separated minimum run lengths')
+    n.add_argument('--limit', type=int, default=2, help='Number of covers to benchmark')
+    n.add_argument('--repeat', type=int, default=3, help='Timed runs per case (best is kept)')
+    n.add_argument('--json', help='Write machine-readable results to this file')
+    n.add_argument('--baseline', help='Saved JSON results to compare against')
+    n.add_argument('--tolerance', type=float, default=0.15, help='Allowed relative slowdown')
 
     args = parser.parse_args()
+    # payload or stego image on stdout: keep everything else off it
+    to_stdout = (args.command in ('hide', 'extract', 'update') and args.output == '-'
+                 or args.command == 'analyze' and args.json == '-')
+    if to_stdout:
+        args.quiet = True
+    if not args.quiet:
+        print(ascii_art)
 
-    if args.command == 'hide':
-        loading_HIDE(args.message, args.output, args.cover)
-        hide(args.message, args.cover, args.output, args.min_run, None)
-        print(f"(✓): Embedded '{args.message}' into '{args.output}' using M={args.min_run}")
-    else:
-        loading_EXTRACT(args.stego, args.output)
-        extract(args.stego, args.output, args.min_run, None)
-        print(f"(✓): Extracted hidden data to '{args.output}' using M={args.min_run}")
+    stats = None
+    if args.command in ('hide', 'extract') and (args.stats or args.profile):
+        stats = Stats(args.profile)
+
+    try:
+        if args.command == 'hide' and args.shards:
+            if args.mode != 'overwrite' or args.in_place:
+                raise StegoError("--shards sizes covers for overwrite mode; drop --mode adaptive and --in-place")
+            if len(args.message) > 1:
+                raise StegoError("--shards splits one message; give a single -m")
+            args.message = args.message[0]
+            covers = args.cover or cataloged_covers(args.cover_dir)
+            written = hide_shards(args.message, covers, args.shards, args.min_run, args.workers,
+                                  args.compress, args.layout, args.checksum)
+            if not args.quiet:
+                for cover_file, stego_file, size in written:
+                    print(f"(✓): {size} bytes → '{stego_file}' (cover '{cover_file}')")
+                print(f"(✓): Embedded '{args.message}' as {len(written)} shard(s) using M={args.min_run}")
+        elif args.command == 'hide':
+            if args.cover and len(args.cover) > 1:
+                raise StegoError("several covers need --shards DIR")
+            cover_file = args.cover[0] if args.cover else None
+            messages = "', '".join(args.message)
+            progress = loading_HIDE(messages, args.output, cover_file or args.cover_dir, args.quiet)
+            used = hide(args.message, cover_file, args.output, args.min_run, None,
+                        in_place=args.in_place, cover_dir=args.cover_dir, progress=progress,
+                        stats=stats, mode=args.mode, layout=args.layout, compress=args.compress,
+                        checksum=args.checksum)
+            if not args.quiet:
+                print(f"(✓): Embedded '{messages}' into '{args.output}' using M={args.min_run} (cover '{used}')")
+        elif args.command == 'extract' and len(args.stego) > 1:
+            if args.name or args.list:
+                raise StegoError("--name and --list read one container image")
+            args.output = args.output or 'message.bin'
+            total = extract_shards(args.stego, args.output, args.min_run, args.workers)
+            if not args.quiet:
+                print(f"(✓): Reassembled {total} shards into '{args.output}' using M={args.min_run}")
+        elif args.command == 'extract' and args.list:
+            source = open_stego(args.stego[0])
+            M = detect_min_run(source) if args.min_run == 'auto' else args.min_run
+            for entry in list_entries(source, M):
+                codec = next(c for c, i in CODECS.items() if i == entry['codec'])
+                print(f"{entry['size']:>12}  {entry['stored']:>12}  {codec:<5}  {entry['name']}")
+        elif args.command == 'extract':
+            output = args.output or args.name or 'message.bin'
+            progress = loading_EXTRACT(args.stego[0], output, args.quiet)
+            M = extract(args.stego[0], args.output, args.min_run, None, progress=progress, stats=stats,
+                        workers=args.workers, name=args.name)
+            if not args.quiet:
+                detected = ' (detected)' if args.min_run == 'auto' else ''
+                print(f"(✓): Extracted hidden data to '{output}' using M={M}{detected}")
+        elif args.command == 'update':
+            result = update(args.message, args.stego, args.output, args.min_run, args.compress,
+                            args.checksum)
+            if not args.quiet and result['start'] is None:
+                print(f"(✓): '{args.stego}' already holds this message; nothing rewritten")
+            elif not args.quiet:
+                rows = f", {result['rows']} pixel rows patched" if 'rows' in result else ''
+                print(f"(✓): Updated '{args.output or args.stego}' using M={result['M']}: rewrote samples "
+                      f"{result['start']}-{result['stop']} of {result['samples']}{rows}")
+        elif args.command == 'verify':
+            if verify(args.stego, args.min_run, args.workers):
+                sys.exit(1)
+        elif args.command == 'analyze':
+            if args.cover and args.cover_dir:
+                raise StegoError("use either --cover or --cover-dir")
+            if args.max_run < 2:
+                raise StegoError("--max-run must be at least 2")
+            if analyze(args.images, args.cover, args.cover_dir, args.workers, args.json, args.max_run):
+                sys.exit(1)
+        elif args.command == 'catalog':
+            catalog(args.cover_dir)
+        elif args.command == 'bench':
+            Ms = [int(m) for m in args.min_run.split(',')]
+            if bench(args.covers, args.messages, Ms, args.limit, args.repeat, args.json,
+                     args.baseline, args.tolerance):
+                sys.exit(1)
+        elif args.command == 'serve':
+            serve(args.host, args.port, args.cover_dir, args.workers, args.queue, args.batch,
+                  args.cache_mb << 20)
+        else:
+            if batch(args.manifest, args.workers):
+                sys.exit(1)
+    except StegoError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if stats:
+        for name, prof in stats.profiles.items():
+            print(f"(i): cProfile of stage '{name}'", file=sys.stderr)
+            pstats.Stats(prof, stream=sys.stderr).sort_stats('cumulative').print_stats(15)
+        if args.stats:
+            print(json.dumps(stats.as_dict(), indent=1), file=sys.stderr if to_stdout else sys.stdout)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_cover(tmp_path):
+    """
+    Writes a noise cover to tmp_path and returns its path: make_cover(name,
+    shape, mode) with mode L, RGB, RGBA or I;16, or P for a colour palette.
+    """
+    def make(name='cover.bmp', shape=(64, 64), mode='L', seed=0):
+        rng = np.random.default_rng(seed)
+        if mode == 'I;16':
+            img = Image.fromarray(rng.integers(0, 1 << 16, shape, dtype=np.uint16))
+        elif mode in ('RGB', 'RGBA'):
+            img = Image.fromarray(rng.integers(0, 256, (*shape, len(mode)), dtype=np.uint8), mode)
+        else:
+            img = Image.fromarray(rng.integers(0, 256, shape, dtype=np.uint8))
+            if mode == 'P':
+                img = img.convert('P')
+                img.putpalette(rng.integers(0, 256, 768, dtype=np.uint8).tolist())
+        path = tmp_path / name
+        img.save(path)
+        return str(path)
+    return make
+
+
+@pytest.fixture
+def make_message(tmp_path):
+    # make_message(name, size) writes `size` random bytes and returns the path
+    def make(name='message.bin', size=100, seed=1):
+        path = tmp_path / name
+        path.write_bytes(np.random.default_rng(seed).bytes(size))
+        return str(path)
+    return make
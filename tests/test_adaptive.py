@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pytest
+
+import stego
+
+
+def test_adaptive_flips_decode_to_the_bits():
+    rng = np.random.default_rng(5)
+    for _ in range(2000):
+        M = int(rng.integers(1, 6))
+        lsbs = (rng.random(int(rng.integers(1, 120))) < rng.random()).astype(np.uint8)
+        bits = rng.integers(0, 2, int(rng.integers(0, 12))).astype(np.uint8)
+        try:
+            flips = stego.adaptive_flips(lsbs, bits, M)
+        except stego.CapacityError:
+            continue
+        assert len(np.unique(flips)) == len(flips)
+        out = lsbs.copy()
+        out[flips] ^= 1
+        assert np.array_equal(stego.decode_runs(out, M)[:len(bits)], bits)
+
+
+def test_adaptive_flips_fewer_lsbs_than_overwrite(make_cover, make_message):
+    data = open(make_message(size=100), 'rb').read()
+    adaptive, overwrite = stego.Stats(), stego.Stats()
+    img = stego.hide_bytes(data, make_cover(), M=2, mode='adaptive', stats=adaptive)
+    stego.hide_bytes(data, make_cover(), M=2, stats=overwrite)
+    assert adaptive.counters['lsb_flips'] < overwrite.counters['lsb_flips']
+    assert stego.extract_bytes(img, M=2) == data
+
+
+def test_adaptive_inplace_round_trip(make_cover, make_message, tmp_path):
+    message = make_message(size=100)
+    out = str(tmp_path / 'out.bmp')
+    stego.hide(message, make_cover(), out, 2, None, in_place=True, mode='adaptive')
+    assert stego.extract_bytes(out, M=2) == open(message, 'rb').read()
+
+
+def test_adaptive_inplace_capacity_error_leaves_no_output(make_cover, make_message, tmp_path):
+    out = str(tmp_path / 'out.bmp')
+    with pytest.raises(stego.CapacityError):
+        stego.hide(make_message(size=150), make_cover(), out, 2, None, in_place=True,
+                   mode='adaptive')
+    assert not os.path.exists(out)
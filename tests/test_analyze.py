@@ -0,0 +1,32 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+
+@pytest.mark.parametrize('M', [2, 4])
+@pytest.mark.parametrize('checksum', ['none', 'crc32', 'blake2'])
+def test_head_samples_cover_the_overwrite_runs(make_cover, make_message, tmp_path, M, checksum):
+    # an extended header starts with magic bits 1, 1, so its first two runs are M + 1
+    message, out = make_message(size=200), str(tmp_path / 'stego.png')
+    st = stego.Stats()
+    stego.hide(message, make_cover(shape=(128, 128)), out, M, None, stats=st, checksum=checksum)
+    report = stego.lsb_statistics(np.asarray(Image.open(out)))
+    assert report['head_run'] == M
+    assert report['head_samples'] >= st.counters['pixels_used'] - M
+
+
+def test_analyze_writes_json_report(make_cover, make_message, tmp_path):
+    cover = make_cover(shape=(128, 128))
+    out = str(tmp_path / 'stego.png')
+    stego.hide(make_message(size=200), cover, out, 2, None, checksum='crc32')
+    report = str(tmp_path / 'report.json')
+    assert stego.analyze([out], cover=cover, workers=1, json_file=report) == 0
+    image, = json.load(open(report))['images']
+    assert image['head_run'] == 2 and image['head_samples'] > 4000
+    assert image['flips'] > 0
+    assert os.path.exists(tmp_path / stego.ANALYSIS_NAME)
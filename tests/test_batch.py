@@ -0,0 +1,48 @@
+import csv
+import json
+
+import pytest
+
+import stego
+
+
+@pytest.mark.parametrize('format', ['jsonl', 'csv'])
+def test_batch_runs_past_a_failing_job(make_cover, make_message, tmp_path, monkeypatch, capsys,
+                                       format):
+    message, cover = make_message(size=300), make_cover(shape=(128, 128))
+    jobs = [{'op': 'hide', 'message': message, 'cover': cover,
+             'output': str(tmp_path / 'a.png'), 'checksum': 'crc32'},
+            {'op': 'hide', 'message': str(tmp_path / 'missing.bin'), 'cover': cover,
+             'output': str(tmp_path / 'b.png')},
+            {'op': 'hide', 'message': message, 'cover': cover,
+             'output': str(tmp_path / 'c.png'), 'M': 4}]
+    manifest = str(tmp_path / f'jobs.{format}')
+    with open(manifest, 'w', newline='') as f:
+        if format == 'jsonl':
+            f.writelines(json.dumps(job) + '\n' for job in jobs)
+        else:
+            writer = csv.DictWriter(f, ['op', 'message', 'cover', 'output', 'M', 'checksum'])
+            writer.writeheader()
+            writer.writerows(jobs)
+    monkeypatch.setattr('sys.argv', ['stego.py', 'batch', manifest, '-j', '2'])
+    with pytest.raises(SystemExit) as exit:
+        stego.main()
+    assert exit.value.code == 1
+    out = capsys.readouterr().out
+    assert out.count('(✓): job') == 2
+    assert "(✗): job 2 hide" in out and 'missing.bin' in out
+    assert '3 jobs, 1 failed' in out
+    assert not (tmp_path / 'b.png').exists()
+    for name, M in (('a.png', 2), ('c.png', 4)):
+        assert stego.extract_bytes((tmp_path / name).read_bytes(), M) == open(message, 'rb').read()
+
+
+def test_batch_returns_the_number_of_failed_jobs(make_cover, make_message, tmp_path, capsys):
+    message = make_message(size=100)
+    manifest = tmp_path / 'jobs.jsonl'
+    manifest.write_text(json.dumps({'op': 'hide', 'message': message, 'cover': make_cover(),
+                                    'output': str(tmp_path / 'a.png')}) + '\n'
+                        + json.dumps({'op': 'extract', 'stego': make_cover(),
+                                      'output': str(tmp_path / 'x.bin')}) + '\n')
+    assert stego.batch(str(manifest), 1) == 1
+    assert 'no hidden data' in capsys.readouterr().out.lower()
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+import stego
+
+
+@pytest.fixture
+def corpus(make_cover, tmp_path):
+    (tmp_path / 'covers').mkdir()
+    (tmp_path / 'messages').mkdir()
+    make_cover('covers/cover.bmp', shape=(96, 96))
+    (tmp_path / 'messages' / 'note.txt').write_bytes(b'benchmark payload ' * 10)
+    return str(tmp_path / 'covers'), str(tmp_path / 'messages')
+
+
+def scaled(results, factor):
+    # a baseline whose hide and extract times are `factor` times those measured
+    return {'cases': [dict(c, hide_s=c['hide_s'] * factor, extract_s=c['extract_s'] * factor)
+                      for c in results['cases']]}
+
+
+def test_compare_bench_flags_slowdowns_beyond_the_tolerance():
+    results = {'cases': [{'case': 'a', 'hide_s': 1.1, 'extract_s': 2.0},
+                         {'case': 'b', 'hide_s': 1.0, 'extract_s': 1.5},
+                         {'case': 'new', 'hide_s': 9.0, 'extract_s': 9.0}]}
+    baseline = {'cases': [{'case': 'a', 'hide_s': 1.0, 'extract_s': 2.0},
+                          {'case': 'b', 'hide_s': 1.0, 'extract_s': 1.0}]}
+    assert stego.compare_bench(results, baseline, 0.15) == [('b', 'extract_s', 1.0, 1.5)]
+    assert stego.compare_bench(results, baseline, 0.05) == [('a', 'hide_s', 1.0, 1.1),
+                                                            ('b', 'extract_s', 1.0, 1.5)]
+    assert stego.compare_bench(results, {}, 0.0) == []
+
+
+def test_bench_baseline_exit_status(corpus, tmp_path, monkeypatch, capsys):
+    covers, messages = corpus
+    results = str(tmp_path / 'results.json')
+    assert stego.bench(covers, messages, [2, 4], repeat=1, json_file=results) == 0
+    measured = json.load(open(results))
+    assert [c['case'] for c in measured['cases']] == ['cover.bmp|note.txt|M=2',
+                                                      'cover.bmp|note.txt|M=4']
+    assert all(c['roundtrip_ok'] for c in measured['cases'])
+
+    for factor, code in ((100.0, None), (1e-6, 1)):
+        baseline = tmp_path / 'baseline.json'
+        baseline.write_text(json.dumps(scaled(measured, factor)))
+        monkeypatch.setattr('sys.argv', ['stego.py', 'bench', '--covers', covers,
+                                         '--messages', messages, '-M', '2,4', '--repeat', '1',
+                                         '--baseline', str(baseline)])
+        if code is None:
+            stego.main()
+        else:
+            with pytest.raises(SystemExit) as exit:
+                stego.main()
+            assert exit.value.code == code
+        out = capsys.readouterr().out
+        assert ('REGRESSION' in out) == (code == 1)
+        assert f"{0 if code is None else 4} regressions" in out
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+
+@pytest.fixture(params=[65536, 64, 7])
+def chunk(request, monkeypatch):
+    monkeypatch.setattr(stego, 'CHUNK_PIXELS', request.param)
+    return request.param
+
+
+def test_slices_share_the_buffer_and_match_numpy(chunk):
+    rng = np.random.default_rng(3)
+    for _ in range(300):
+        bits = rng.integers(0, 2, int(rng.integers(0, 200))).astype(np.uint8)
+        stream = stego.BitStream.from_array(bits)
+        a, b = sorted(rng.integers(-5, len(bits) + 5, 2).tolist())
+        view = stream[a:b]
+        expected = bits[a:b]
+        assert view._buf is stream._buf
+        assert len(view) == len(expected)
+        assert np.array_equal(view.unpack(), expected)
+        assert view.count() == int(expected.sum())
+        assert view.tobytes() == np.packbits(expected).tobytes()
+        assert np.array_equal(stream[a:b:3].unpack(), bits[a:b:3])
+        if len(expected):
+            assert view[-1] == expected[-1] and view[0] == expected[0]
+        assert np.array_equal(np.concatenate([*view.blocks(), np.zeros(0, np.uint8)]), expected)
+
+
+def test_extend_copies_before_growing(chunk):
+    rng = np.random.default_rng(4)
+    for _ in range(200):
+        head = rng.integers(0, 2, int(rng.integers(0, 40))).astype(np.uint8)
+        tail = rng.integers(0, 2, int(rng.integers(0, 40))).astype(np.uint8)
+        base = stego.BitStream.from_array(np.concatenate((head, tail)))
+        view = base[:len(head)]
+        grown = base[:len(head)]
+        grown.extend(stego.BitStream.from_array(tail)[0:])
+        grown.extend(tail[::-1])
+        assert np.array_equal(grown.unpack(), np.concatenate((head, tail, tail[::-1])))
+        assert np.array_equal(view.unpack(), head)  # the shared buffer is untouched
+        assert len(base) == len(head) + len(tail)
+
+
+def test_bytes_are_wrapped_without_copying():
+    data = bytearray(b'\xa5\x0f\xff')
+    stream = stego.BitStream(data, 20)
+    assert stream._buf is data
+    assert (len(stream), stream.count(), stream.tobytes()) == (20, 12, b'\xa5\x0f\xf0')
+    assert stego.BitStream.of(stream) is stream
+    with pytest.raises(IndexError):
+        stream[20]
+
+
+def test_embed_lsbs_is_independent_of_chunk_size(chunk):
+    # the LSB stream hide writes is the same whatever size of block it is built in
+    rng = np.random.default_rng(5)
+    for M in (2, 4, 8):
+        bits = rng.integers(0, 2, 300).astype(np.uint8)
+        pixels = rng.integers(0, 256, 4000).astype(np.uint8)
+        expected = pixels.copy()
+        lsbs = stego.encode_runs(bits, M, pixels[0] & 1)
+        expected[:len(lsbs)] = (expected[:len(lsbs)] & 0xFE) | lsbs
+        if expected[len(lsbs)] & 1 == lsbs[-1]:
+            expected[len(lsbs)] ^= 1
+        stego.embed_lsbs(pixels, stego.BitStream.from_array(bits), M)
+        assert np.array_equal(pixels, expected)
+        assert np.array_equal(stego.decode_runs(pixels & 1, M)[:len(bits)], bits)
+
+
+def test_hide_extract_round_trip_at_any_chunk_size(chunk, make_cover):
+    data = np.random.default_rng(6).bytes(700)
+    img = stego.hide_image(data, Image.open(make_cover(shape=(128, 128))), 2, checksum='crc32')
+    assert stego.extract_bytes(img, M=2) == data
+
+
+def test_bit_reader_hands_out_packed_bits(chunk):
+    rng = np.random.default_rng(7)
+    for M in (1, 2, 4):
+        lsbs = rng.integers(0, 2, 3000).astype(np.uint8)
+        expected = stego.decode_runs(lsbs, M)
+        reader = stego.BitReader(lsbs, M)
+        pieces, pos = [], 0
+        while pos < len(expected) + 10:
+            n = int(rng.integers(0, 90))
+            piece = reader.read_packed(n)
+            pieces.append((pos, piece))
+            pos += n
+            assert isinstance(reader._bits, stego.BitStream)
+            assert reader.consumed == min(pos, len(expected))
+        # bits handed out keep their values while later reads refill the buffer
+        for pos, piece in pieces:
+            assert np.array_equal(piece.unpack(), expected[pos:pos + len(piece)])
+        assert reader.ones == int(expected.sum())
+
+        reader = stego.BitReader(lsbs, M)
+        assert np.array_equal(reader.read(5), expected[:5])
+        full = (len(expected) - 5) // 8
+        assert reader.read_bytes(full + 1) == stego.bits_to_bytes(expected[5:])
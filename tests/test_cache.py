@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+COVER_BYTES = 64 * 64 * 2  # pixels plus the LSB plane
+
+
+def test_cache_evicts_least_recently_used_within_its_budget(make_cover):
+    a, b, c = (make_cover(f'{name}.bmp', seed=i) for i, name in enumerate('abc'))
+    cache = stego.CoverCache(max_bytes=2 * COVER_BYTES + 100)
+    first = cache.get(a)
+    cache.get(b)
+    assert cache.get(a) is first  # a is now the most recently used
+    cache.get(c)
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'evictions': 1, 'entries': 2,
+                             'bytes': 2 * COVER_BYTES, 'max_bytes': 2 * COVER_BYTES + 100}
+    assert cache.get(a) is first and cache.get(c) is cache.get(c)
+    cache.get(b)
+    assert cache.stats()['evictions'] == 2 and cache.stats()['misses'] == 4
+    cache.get(a)  # evicted by b
+    assert cache.stats()['misses'] == 5
+
+
+def test_cache_skips_covers_bigger_than_its_budget(make_cover):
+    cache = stego.CoverCache(max_bytes=COVER_BYTES - 1)
+    path = make_cover()
+    assert cache.get(path) is not cache.get(path)
+    assert cache.stats() == {'hits': 0, 'misses': 2, 'evictions': 0, 'entries': 0, 'bytes': 0,
+                             'max_bytes': COVER_BYTES - 1}
+
+
+def test_cache_decodes_a_changed_file_again(make_cover, tmp_path):
+    path = make_cover()
+    cache = stego.CoverCache()
+    old = cache.get(path)
+    st = os.stat(path)
+    # same size, new content and mtime
+    Image.fromarray(255 - np.asarray(Image.open(path))).save(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    new = cache.get(path)
+    assert new is not old and np.array_equal(new.array, 255 - old.array)
+    # another size
+    make_cover('cover.bmp', shape=(32, 32))
+    assert cache.get(path).size == (32, 32)
+    assert cache.stats()['misses'] == 3 and cache.stats()['entries'] == 1
+    assert cache.stats()['bytes'] == 32 * 32 * 2
+    with pytest.raises(stego.ImageFormatError, match='cannot open image'):
+        cache.get(str(tmp_path / 'missing.bmp'))
+
+
+def test_cached_buffers_are_read_only_and_shared(make_cover):
+    cache = stego.CoverCache()
+    path = make_cover(mode='RGB')
+    entry = cache.get(path)
+    assert entry.array.flags.writeable is False and entry.lsbs.flags.writeable is False
+    with pytest.raises(ValueError):
+        entry.array[0, 0, 0] = 1
+    assert np.array(entry).flags.writeable
+    before = entry.array.copy()
+    data = b'cached cover'
+    out = stego.hide_bytes(data, path, 2, cache=cache)
+    assert out == stego.hide_bytes(data, path, 2)
+    assert np.array_equal(entry.array, before)
+    assert stego.extract_bytes(out, 2) == data
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+import stego
+
+
+def test_select_cover_picks_smallest_fit(make_cover):
+    small = make_cover('small.bmp', (32, 32))
+    make_cover('large.bmp', (64, 64))
+    cover_dir = os.path.dirname(small)
+    assert stego.select_cover(cover_dir, 1000) == small
+    assert stego.select_cover(cover_dir, 2000).endswith('large.bmp')
+    with pytest.raises(stego.StegoError, match='capacity'):
+        stego.select_cover(cover_dir, 10000)
+
+
+def test_catalog_skips_changed_files_only(make_cover):
+    cover_dir = os.path.dirname(make_cover('a.bmp'))
+    make_cover('b.png')
+    covers, changed, removed = stego.update_catalog(cover_dir)
+    assert (changed, removed) == (2, 0)
+    assert covers['a.bmp']['format'] == 'BMP' and covers['b.png']['format'] == 'PNG'
+    os.remove(os.path.join(cover_dir, 'b.png'))
+    assert stego.update_catalog(cover_dir)[1:] == (0, 1)
+
+
+def test_inplace_selection_needs_a_grayscale_bmp(make_cover, make_message, tmp_path):
+    png = make_cover('a.png', (32, 32))
+    cover_dir = os.path.dirname(png)
+    assert stego.select_cover(cover_dir, 500) == png
+    with pytest.raises(stego.StegoError, match='BMP'):
+        stego.select_cover(cover_dir, 500, in_place=True)
+
+    make_cover('palette.bmp', (40, 40), mode='P')
+    bmp = make_cover('gray.bmp', (64, 64))
+    assert stego.select_cover(cover_dir, 500, in_place=True) == bmp
+    message, out = make_message(size=20), str(tmp_path / 'out.bmp')
+    assert stego.hide(message, None, out, 2, None, in_place=True, cover_dir=cover_dir) == bmp
+    assert stego.extract_bytes(out, M=2) == open(message, 'rb').read()
+
+
+def test_bmp_output_selects_a_bmp_storable_cover(make_cover, make_message, tmp_path):
+    cover_dir = os.path.dirname(make_cover('rgba.png', (32, 32), mode='RGBA'))
+    make_cover('i16.png', (32, 32), mode='I;16')
+    assert stego.select_cover(cover_dir, 500).endswith('.png')
+    with pytest.raises(stego.StegoError, match='L/RGB'):
+        stego.select_cover(cover_dir, 500, output='stego.bmp')
+
+    rgb = make_cover('rgb.png', (64, 64), mode='RGB')
+    assert stego.select_cover(cover_dir, 500, output='stego.BMP') == rgb
+    message, out = make_message(size=20), str(tmp_path / 'stego.bmp')
+    assert stego.hide(message, None, out, 2, None, cover_dir=cover_dir) == rgb
+    assert stego.extract_bytes(out, M=2) == open(message, 'rb').read()
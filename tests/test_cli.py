@@ -0,0 +1,23 @@
+import re
+
+import pytest
+
+import stego
+
+
+def help_text(monkeypatch, capsys, *args):
+    monkeypatch.setattr('sys.argv', ['stego.py', *args])
+    with pytest.raises(SystemExit):
+        stego.main()
+    return capsys.readouterr().out
+
+
+def test_builtin_help_lists_every_command_and_option(monkeypatch, capsys):
+    text = help_text(monkeypatch, capsys)
+    commands = re.search(r'\{([a-z,]+)\}', help_text(monkeypatch, capsys, '-h')).group(1)
+    for command in commands.split(','):
+        assert f'Arguments for {command}:' in text, command
+        usage = help_text(monkeypatch, capsys, command, '-h')
+        for option in re.findall(r'^\s+(?:-\w, )?(--[a-z-]+)', usage, re.M):
+            if option != '--help':
+                assert option in text, (command, option)
@@ -0,0 +1,55 @@
+import importlib
+
+import numpy as np
+import pytest
+
+import stego
+
+TEXT = b'the quick brown fox jumps over the lazy dog\n' * 40
+NOISE = np.random.default_rng(6).bytes(1500)
+
+
+def available(codec):
+    try:
+        stego.compress_payload(b'', codec)
+        return True
+    except stego.StegoError:
+        return False
+
+
+@pytest.mark.parametrize('codec', [*stego.CODECS, 'auto'])
+@pytest.mark.parametrize('data', [TEXT, NOISE], ids=['text', 'noise'])
+@pytest.mark.parametrize('mode', ['L', 'RGB'])
+def test_every_codec_round_trips(make_cover, codec, data, mode):
+    if codec != 'auto' and not available(codec):
+        pytest.skip(f'{codec} is not built into this Python')
+    img = stego.open_image(stego.hide_bytes(data, make_cover(shape=(256, 256), mode=mode), 2,
+                                            compress=codec))
+    header, _ = stego.locate_payload(img, 2)
+    stored = stego.compress_payload(data, codec)[0]
+    assert header['codec'] == stego.CODECS[stored]
+    assert header['extended'] == (stored != 'none' or mode == 'RGB')
+    if codec == 'auto':
+        # the smallest available codec wins text; nothing beats storing noise as is
+        assert stored != 'none' if data is TEXT else stored == 'none'
+    assert stego.extract_image(img, 2) == data
+
+
+def test_auto_skips_a_codec_missing_from_the_build(monkeypatch):
+    import_module = importlib.import_module
+
+    def without_lzma(name, *args):
+        if name == 'lzma':
+            raise ImportError(name)
+        return import_module(name, *args)
+    monkeypatch.setattr(importlib, 'import_module', without_lzma)
+    with pytest.raises(stego.StegoError, match="codec 'lzma' is not available"):
+        stego.compress_payload(TEXT, 'lzma')
+    assert stego.compress_payload(TEXT, 'auto')[0] in ('zlib', 'bz2')
+
+
+def test_unknown_codec_id_is_no_payload():
+    with pytest.raises(stego.NoPayloadError, match='unknown codec id 9'):
+        stego.decompress_payload(b'x', 9)
+    with pytest.raises(stego.StegoError, match='unknown codec'):
+        stego.compress_payload(b'x', 'zstd')
@@ -0,0 +1,90 @@
+import io
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+STEGO_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'stego.py')
+
+
+@pytest.fixture
+def files(tmp_path):
+    rng = np.random.default_rng(7)
+    contents = {'settings.json': b'{"a": [1, 2, 3]}' * 10, 'notes.txt': b'hello world ' * 60,
+                'blob.bin': rng.bytes(400), 'empty': b''}
+    for name, data in contents.items():
+        (tmp_path / name).write_bytes(data)
+    return contents
+
+
+@pytest.mark.parametrize('M', [2, 4])
+@pytest.mark.parametrize('compress, checksum', [('none', 'none'), ('zlib', 'crc32'),
+                                                ('auto', 'blake2')])
+def test_container_entries_round_trip(make_cover, files, tmp_path, M, compress, checksum):
+    out = str(tmp_path / 'stego.png')
+    stego.hide([str(tmp_path / name) for name in files], make_cover(shape=(256, 256)), out, M,
+               None, compress=compress, checksum=checksum)
+    assert [e['name'] for e in stego.list_entries(out, M)] == list(files)
+    for name, data in files.items():
+        assert stego.extract_entry(out, name, M) == data
+        assert stego.extract_entry(Image.open(out), name, M) == data
+    with pytest.raises(stego.StegoError, match='no file'):
+        stego.extract_entry(out, 'missing', M)
+
+
+def test_container_entry_offsets_are_independent(make_cover, files, tmp_path):
+    # damage inside one entry's runs fails that entry's digest and no other
+    out = str(tmp_path / 'stego.bmp')
+    stego.hide([str(tmp_path / name) for name in files], make_cover(shape=(256, 256)), out, 2, None)
+    header, reader, kind, entries, base = stego.open_container(Image.open(out), 2)
+    start = base + stego.find_entry(entries, 'blob.bin')['offset']
+    arr = np.array(Image.open(out))
+    arr.reshape(-1)[start + 100:start + 103] ^= 1
+    Image.fromarray(arr).save(out)
+    with pytest.raises(stego.NoPayloadError, match='blob.bin'):
+        stego.extract_entry(out, 'blob.bin', 2)
+    for name in ('settings.json', 'notes.txt', 'empty'):
+        assert stego.extract_entry(out, name, 2) == files[name]
+
+
+def test_container_cli(make_cover, files, tmp_path):
+    def run(*args):
+        return subprocess.run([sys.executable, STEGO_PY, *args], capture_output=True, cwd=tmp_path)
+
+    paths = [str(tmp_path / name) for name in files]
+    assert run('hide', '-q', '-m', *paths, '-c', make_cover(shape=(256, 256)), '-o', 'o.bmp').returncode == 0
+    listing = run('extract', '-q', '-s', 'o.bmp', '--list').stdout.decode()
+    assert all(name in listing for name in files)
+    assert run('extract', '-q', '-s', 'o.bmp', '--name', 'notes.txt', '-o', '-').stdout == files['notes.txt']
+    assert run('extract', '-q', '-s', 'o.bmp', '-o', 'all').returncode == 0
+    assert {name: (tmp_path / 'all' / name).read_bytes() for name in files} == files
+    assert 'pick one with --name' in run('extract', '-q', '-s', 'o.bmp').stderr.decode()
+
+
+def test_container_list_opens_like_extract(make_cover, files, tmp_path, monkeypatch, capsys):
+    def run(*args):
+        monkeypatch.setattr('sys.argv', ['stego.py', 'extract', '-q', *args])
+        try:
+            stego.main()
+            code = 0
+        except SystemExit as e:
+            code = e.code
+        return code, capsys.readouterr()
+
+    out = str(tmp_path / 'stego.png')
+    stego.hide([str(tmp_path / name) for name in files], make_cover(shape=(256, 256)), out, 2, None)
+    (tmp_path / 'not-an-image.png').write_bytes(b'plain text')
+    for path in (str(tmp_path / 'missing.png'), str(tmp_path / 'not-an-image.png')):
+        code, captured = run('-s', path, '--list')
+        assert code == 1
+        assert captured.err.startswith(f"Error: cannot open stego file '{path}'")
+
+    monkeypatch.setattr('sys.stdin', io.TextIOWrapper(io.BytesIO(open(out, 'rb').read())))
+    code, captured = run('-s', '-', '--list', '-M', 'auto')
+    assert code == 0
+    assert [line.split()[-1] for line in captured.out.splitlines()] == list(files)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+
+def reference_decode(s, M):
+    # the original character-by-character decoder
+    i, n, out = 0, len(s), []
+    while i < n:
+        start = i
+        while i < n and s[i] == s[start]:
+            i += 1
+        if i - start >= M:
+            out.append('1' if (i - start) % 2 else '0')
+    return ''.join(out)
+
+
+def random_lsbs(rng, n):
+    # LSB streams with short and long runs alike
+    return (np.cumsum(rng.random(n) < rng.uniform(0.05, 0.9)) & 1).astype(np.uint8)
+
+
+@pytest.mark.parametrize('M', [1, 2, 3, 4, 8])
+def test_decode_runs_matches_the_reference(M):
+    rng = np.random.default_rng(M)
+    for n in (0, 1, 2, 7, 500, 5000):
+        lsbs = random_lsbs(rng, n)
+        s = ''.join(map(str, lsbs.tolist()))
+        expected = reference_decode(s, M)
+        assert ''.join(map(str, stego.decode_runs(lsbs, M).tolist())) == expected
+        assert stego.find_runs_and_convert_to_output_string(s, M) == expected
+
+
+@pytest.mark.parametrize('chunk', [1, 3, 64, 4096])
+def test_iter_run_bits_matches_decode_runs_for_any_chunking(chunk):
+    rng = np.random.default_rng(chunk)
+    for M in (1, 2, 5):
+        lsbs = random_lsbs(rng, 3000)
+        bits = [b for block in stego.iter_run_bits(lsbs, M, chunk) for b in block.tolist()]
+        assert bits == stego.decode_runs(lsbs, M).tolist()
+
+
+def test_decode_rejects_a_non_positive_m():
+    with pytest.raises(ValueError):
+        stego.decode_runs(np.zeros(4, np.uint8), 0)
+
+
+def test_extracts_images_from_the_original_encoder(make_cover, tmp_path):
+    # a 32-bit length header and the list-based encoder the first version wrote
+    data = np.random.default_rng(8).bytes(300)
+    bits = [int(b) for b in f'{len(data):032b}' + ''.join(f'{b:08b}' for b in data)]
+    img = Image.open(make_cover(shape=(128, 128)))
+    pixels = list(np.asarray(img).reshape(-1).tolist())
+    lsbs, cur = [], pixels[0] & 1
+    for b in bits:
+        lsbs.extend([cur] * (2 + b))
+        cur ^= 1
+    # it did not close the last run; this cover's next pixel happens to do so
+    assert pixels[len(lsbs)] & 1 != lsbs[-1]
+    out = [(px & 0xFE) | lsb for px, lsb in zip(pixels, lsbs)] + pixels[len(lsbs):]
+    Image.fromarray(np.array(out, np.uint8).reshape(128, 128)).save(tmp_path / 'old.bmp')
+    assert stego.extract_bytes(str(tmp_path / 'old.bmp'), M=2) == data
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+import stego
+
+
+@pytest.mark.parametrize('mode', ['L', 'RGB'])
+@pytest.mark.parametrize('checksum', ['none', 'crc32'])
+def test_detect_min_run_finds_overwrite_M(make_cover, mode, checksum):
+    cover = make_cover(shape=(128, 128), mode=mode)
+    data = np.random.default_rng(3).bytes(200)
+    for M in (2, 4, 6, 8):
+        out = stego.hide_bytes(data, cover, M, checksum=checksum)
+        assert stego.detect_min_run(stego.open_image(out)) == M
+
+
+def test_detect_min_run_cannot_tell_legacy_adaptive_apart(make_cover):
+    # an adaptive payload behind a bare length header leaves no evidence for M = 1 over 2
+    out = stego.hide_bytes(bytes(range(50)), make_cover(shape=(128, 128)), 1, mode='adaptive')
+    with pytest.raises(stego.NoPayloadError, match='cannot tell M apart: 1, 2'):
+        stego.detect_min_run(stego.open_image(out))
+
+
+def test_detect_min_run_on_a_clean_cover(make_cover):
+    with pytest.raises(stego.NoPayloadError, match='no hidden data found'):
+        stego.detect_min_run(stego.open_image(make_cover(shape=(128, 128))))
+
+
+@pytest.mark.parametrize('checksum', ['none', 'crc32'])
+def test_detect_min_run_reads_a_strip_prefix(make_cover, tmp_path, monkeypatch, checksum):
+    monkeypatch.setattr(stego, 'STRIP_SAMPLES', 3000)
+    monkeypatch.setattr(stego, 'DETECT_SAMPLES', 20000)
+
+    def whole(*args, **kwargs):
+        raise AssertionError('decoded the whole image')
+    monkeypatch.setattr(stego.StripReader, 'image', whole)
+    monkeypatch.setattr(stego.StripReader, '__array__', whole)
+    rows = []
+    read_rows = stego.StripReader._read_rows
+    monkeypatch.setattr(stego.StripReader, '_read_rows',
+                        lambda self, f, a, b: rows.append(b) or read_rows(self, f, a, b))
+    # the payload runs on well past the prefix, so only its checksum streams further
+    out = tmp_path / 'stego.bmp'
+    out.write_bytes(stego.hide_bytes(np.random.default_rng(4).bytes(2000),
+                                     make_cover(shape=(400, 300)), 4, checksum=checksum))
+    assert stego.detect_min_run(stego.StripReader(str(out))) == 4
+    if checksum == 'none':
+        assert max(rows) * 300 < 20000 + 3000
+    else:
+        assert max(rows) * 300 > 20000
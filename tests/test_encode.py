@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+
+def reference_encode(data, pixels, M):
+    # the original list-based encoder: a 32-bit length header, then M + b equal LSBs a bit
+    bits = [int(b) for b in f'{len(data):032b}' + ''.join(f'{b:08b}' for b in data)]
+    lsbs, cur = [], pixels[0] & 1
+    for b in bits:
+        lsbs.extend([cur] * (M + b))
+        cur ^= 1
+    return [(px & 0xFE) | lsb for px, lsb in zip(pixels, lsbs)] + pixels[len(lsbs):]
+
+
+@pytest.mark.parametrize('M', [2, 4, 6, 8])
+def test_hide_image_writes_the_original_bitstream(make_cover, M):
+    data = np.random.default_rng(M).bytes(120)
+    cover = Image.open(make_cover(shape=(128, 128), seed=M))
+    pixels = np.asarray(cover).reshape(-1).tolist()
+    expected = reference_encode(data, pixels, M)
+    out = np.asarray(stego.hide_image(data, cover, M)).reshape(-1)
+    needed = stego.needed_pixels(stego.payload_bits(data), M)
+    assert out[:needed].tolist() == expected[:needed]
+    # the pixel after the stream is only flipped when it would extend the last run
+    assert out[needed] in (expected[needed], expected[needed] ^ 1)
+    assert (out[needed] & 1) != (out[needed - 1] & 1)
+    assert out[needed + 1:].tolist() == pixels[needed + 1:]
+    assert stego.extract_bytes(stego.hide_bytes(data, cover, M), M) == data
+
+
+def test_needed_pixels_and_capacity():
+    bits = stego.payload_bits(b'\x00\xff')
+    assert stego.needed_pixels(bits, 2) == 2 * 48 + bits.count() == 96 + 8 + 1
+    with pytest.raises(stego.CapacityError):
+        stego.hide_image(bytes(100), Image.new('L', (20, 20)), 2)
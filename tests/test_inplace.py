@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+
+def test_inplace_round_trip_matches_full_encode(make_cover, make_message, tmp_path):
+    cover = make_cover()
+    message = make_message(size=120)
+    full, patched = str(tmp_path / 'full.bmp'), str(tmp_path / 'patched.bmp')
+    stego.hide(message, cover, full, 2, None)
+    stego.hide(message, cover, patched, 2, None, in_place=True)
+    assert np.array_equal(np.asarray(Image.open(full)), np.asarray(Image.open(patched)))
+    assert stego.extract_bytes(patched, M=2) == open(message, 'rb').read()
+
+
+def test_inplace_patches_the_cover_itself(make_cover, make_message):
+    cover = make_cover()
+    message = make_message(size=50)
+    stego.hide(message, cover, cover, 2, None, in_place=True)
+    assert stego.extract_bytes(cover, M=2) == open(message, 'rb').read()
+
+
+@pytest.mark.parametrize('mode, size', [('L', 250), ('P', 10), ('RGB', 10)])
+def test_inplace_failure_leaves_no_output(make_cover, make_message, tmp_path, mode, size):
+    # too large a payload, a colour palette and a 24-bit BMP all fail cleanly
+    cover = make_cover(mode=mode)
+    before = open(cover, 'rb').read()
+    out = str(tmp_path / 'out.bmp')
+    with pytest.raises(stego.StegoError, match='in place'):
+        stego.hide(make_message(size=size), cover, out, 2, None, in_place=True)
+    assert not os.path.exists(out)
+    assert open(cover, 'rb').read() == before
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+
+@pytest.mark.parametrize('mode, layout', [('L', 'interleaved'), ('RGB', 'interleaved'),
+                                          ('RGB', 'concatenated')])
+def test_parallel_run_bits_match_the_sequential_decoder(make_cover, mode, layout):
+    # strips of 5 rows split runs at every boundary; stitching must restore them
+    path = make_cover(shape=(96, 50), mode=mode)
+    source = stego.StripReader(path, rows=5)
+    samples = stego.sample_stream(np.asarray(Image.open(path)), layout)
+    for M in (1, 2, 4):
+        bits = [b for block in stego.iter_parallel_run_bits(source, layout, M, workers=2)
+                for b in block.tolist()]
+        assert bits == stego.decode_runs(samples & 1, M).tolist()
+
+
+@pytest.mark.parametrize('layout', ['interleaved', 'concatenated'])
+def test_parallel_extract_matches_sequential(make_cover, make_message, tmp_path, monkeypatch,
+                                             layout):
+    monkeypatch.setattr(stego, 'PARALLEL_MIN_SAMPLES', 0)
+    monkeypatch.setattr(stego, 'STRIP_SAMPLES', 2000)
+    calls = []
+    parallel = stego.iter_parallel_run_bits
+    monkeypatch.setattr(stego, 'iter_parallel_run_bits',
+                        lambda *args: calls.append(args[1:]) or parallel(*args))
+    message, out = make_message(size=1500), str(tmp_path / 'stego.bmp')
+    stego.hide(message, make_cover(shape=(160, 120), mode='RGB'), out, 2, None, layout=layout,
+               checksum='crc32')
+    for workers in (1, 3):
+        result = str(tmp_path / f'out{workers}.bin')
+        stego.extract(out, result, 2, None, workers=workers)
+        assert open(result, 'rb').read() == open(message, 'rb').read()
+        # the interleaved layout is tried first, so a concatenated image is read twice
+        assert len(calls) == (0 if workers == 1 else 2 if layout == 'concatenated' else 1)
+        calls.clear()
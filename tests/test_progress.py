@@ -0,0 +1,65 @@
+import io
+
+import pytest
+
+import stego
+
+
+def recorder():
+    calls = []
+    return calls, lambda done, total: calls.append((done, total))
+
+
+def assert_monotonic(calls):
+    assert calls
+    total = calls[0][1]
+    assert all(t == total for _, t in calls)
+    dones = [done for done, _ in calls]
+    assert dones == sorted(dones) and dones[-1] == total
+
+
+@pytest.mark.parametrize('mode', ['overwrite', 'adaptive'])
+@pytest.mark.parametrize('output', ['stego.png', 'stego.bmp'])
+def test_hide_and_extract_progress_is_monotonic(make_cover, make_message, tmp_path, monkeypatch,
+                                                mode, output):
+    monkeypatch.setattr(stego, 'CHUNK_PIXELS', 512)
+    monkeypatch.setattr(stego, 'STRIP_SAMPLES', 2000)
+    message, out = make_message(size=800), str(tmp_path / output)
+    calls, progress = recorder()
+    stego.hide(message, make_cover(shape=(256, 256)), out, 2, None, progress=progress, mode=mode,
+               checksum='crc32')
+    assert_monotonic(calls)
+    calls.clear()
+    stego.extract(out, str(tmp_path / 'out.bin'), 2, None, progress=progress)
+    assert_monotonic(calls)
+    calls.clear()
+    pieces = stego.iter_extract(stego.open_image(out), 2, progress=progress, block_bits=512)
+    assert b''.join(pieces) == open(message, 'rb').read()
+    assert_monotonic(calls)
+    assert len(calls) > 10
+
+
+def test_inplace_progress_is_monotonic(make_cover, make_message, tmp_path, monkeypatch):
+    monkeypatch.setattr(stego, 'CHUNK_PIXELS', 512)
+    calls, progress = recorder()
+    stego.hide(make_message(size=500), make_cover(shape=(128, 128)), str(tmp_path / 'stego.bmp'),
+               2, None, in_place=True, progress=progress)
+    assert_monotonic(calls)
+
+
+def test_no_bar_without_a_terminal():
+    assert stego.progress_bar(io.StringIO()) is None
+
+
+def test_bar_redraws_only_on_a_new_percentage():
+    class Terminal(io.StringIO):
+        def isatty(self):
+            return True
+    stream = Terminal()
+    progress = stego.progress_bar(stream)
+    for done in (0, 1, 2, 50, 51, 100):
+        progress(done, 100)
+    frames = stream.getvalue().split('\r')[1:]
+    assert [frame.split()[-1] for frame in frames] == ['0%', '1%', '2%', '50%', '51%', '100%']
+    assert frames[3].startswith('█' * 5 + '▒' * 5)
+    assert stream.getvalue().endswith('100%\n')
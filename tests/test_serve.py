@@ -0,0 +1,105 @@
+import asyncio
+import http.client
+import json
+import socket
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+
+import stego
+
+
+@contextmanager
+def running(server):
+    # runs `server` on an ephemeral localhost port in a thread; yields the port
+    started = threading.Event()
+    state = {}
+
+    def ready(host, port):
+        state.update(port=port, loop=asyncio.get_running_loop(), task=asyncio.current_task())
+        started.set()
+
+    def run():
+        try:
+            asyncio.run(server.run('127.0.0.1', 0, ready))
+        except asyncio.CancelledError:
+            pass
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(10)
+    try:
+        yield state['port']
+    finally:
+        state['loop'].call_soon_threadsafe(state['task'].cancel)
+        thread.join(10)
+
+
+def request(port, method, target, body=b''):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        conn.request(method, target, body)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def cover_dir(make_cover, tmp_path):
+    (tmp_path / 'covers').mkdir()
+    make_cover('covers/cover.bmp', shape=(128, 128))
+    return str(tmp_path / 'covers')
+
+
+def test_serve_round_trip_capacity_and_stats(cover_dir):
+    data = np.random.default_rng(5).bytes(500)
+    with running(stego.StegoServer(cover_dir, workers=1)) as port:
+        status, body = request(port, 'GET', '/capacity?cover=cover.bmp&M=4')
+        assert status == 200
+        info = json.loads(body)
+        assert (info['width'], info['height'], info['samples']) == (128, 128, 128 * 128)
+        assert info['max_bytes'] == stego.max_payload_bytes(128 * 128, 4)
+
+        status, image = request(port, 'POST', '/hide?cover=cover.bmp&checksum=crc32', data)
+        assert status == 200 and image.startswith(b'BM')
+        assert request(port, 'POST', '/extract', image) == (200, data)
+        assert request(port, 'POST', '/extract?M=auto', image) == (200, data)
+
+        status, body = request(port, 'POST', '/hide?cover=../cover.bmp', data)
+        assert status == 400 and b'outside the cover directory' in body
+        status, body = request(port, 'POST', '/hide?cover=cover.bmp', bytes(5000))
+        assert status == 422
+
+        status, body = request(port, 'GET', '/stats')
+        assert status == 200
+        stats = json.loads(body)
+    assert stats['accepted'] == 6 and stats['rejected'] == 0
+    assert stats['queue_depth'] == 0 and stats['in_flight'] == 0
+    assert {op: (c['requests'], c['errors']) for op, c in stats['endpoints'].items()} == \
+        {'capacity': (1, 0), 'hide': (3, 2), 'extract': (2, 0)}
+    # one worker: the capacity query decodes the cover, the hides reuse it
+    assert stats['cover_cache']['misses'] == 1 and stats['cover_cache']['hits'] >= 2
+
+
+def test_serve_rejects_requests_beyond_the_queue(cover_dir, monkeypatch):
+    async def stalled(self):
+        await asyncio.Event().wait()  # no dispatcher: queued requests stay queued
+    monkeypatch.setattr(stego.StegoServer, '_dispatch', stalled)
+    with running(stego.StegoServer(cover_dir, workers=1, queue_size=1)) as port:
+        waiting = socket.create_connection(('127.0.0.1', port))
+        waiting.sendall(b'GET /capacity?cover=cover.bmp HTTP/1.1\r\nHost: x\r\n\r\n')
+        for _ in range(100):
+            if json.loads(request(port, 'GET', '/stats')[1])['queue_depth'] == 1:
+                break
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        conn.request('GET', '/capacity?cover=cover.bmp')
+        response = conn.getresponse()
+        assert response.status == 503
+        assert response.getheader('Retry-After') == '1'
+        response.read()
+        conn.close()
+        stats = json.loads(request(port, 'GET', '/stats')[1])
+        waiting.close()
+    assert (stats['accepted'], stats['rejected'], stats['queue_depth']) == (1, 1, 1)
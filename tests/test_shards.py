@@ -0,0 +1,63 @@
+import random
+
+import numpy as np
+import pytest
+
+import stego
+
+
+@pytest.fixture
+def covers(make_cover):
+    return [make_cover(f'cover{i}.bmp', shape=(64, 64), seed=i) for i in range(4)]
+
+
+def split(message, covers, tmp_path, name, **kwargs):
+    # hide_shards into tmp_path/name; returns the shard images in index order
+    written = stego.hide_shards(message, covers, str(tmp_path / name), 2, workers=2, **kwargs)
+    return [stego_file for _, stego_file, _ in written]
+
+
+@pytest.mark.parametrize('compress, checksum', [('none', 'none'), ('zlib', 'crc32')])
+def test_shards_reassemble_in_any_order(covers, make_message, tmp_path, compress, checksum):
+    message = make_message(size=400)
+    shards = split(message, covers, tmp_path, 'shards', compress=compress, checksum=checksum)
+    assert len(shards) == 3
+    out = str(tmp_path / 'out.bin')
+    for order in (shards[::-1], random.Random(2).sample(shards, 3), shards + shards[:1]):
+        assert stego.extract_shards(order, out, 2, workers=2) == 3
+        assert open(out, 'rb').read() == open(message, 'rb').read()
+
+
+def test_shards_fail_when_one_is_missing_or_foreign(covers, make_message, tmp_path):
+    shards = split(make_message(size=400), covers, tmp_path, 'a')
+    other = split(make_message('other.bin', size=400, seed=2), covers, tmp_path, 'b')
+    longer = split(make_message('longer.bin', size=600, seed=3), covers, tmp_path, 'c')
+    assert len(longer) == 4
+    out = str(tmp_path / 'out.bin')
+    with pytest.raises(stego.NoPayloadError, match='missing shard.s. 2 of 3'):
+        stego.extract_shards([shards[0], shards[2]], out, 2)
+    # same shard count, another message's hash; then another shard count
+    for foreign in (other[1], longer[1]):
+        with pytest.raises(stego.NoPayloadError, match='different sharded payloads'):
+            stego.extract_shards([shards[0], foreign, shards[2]], out, 2)
+    whole = str(tmp_path / 'whole.bmp')
+    stego.hide(make_message(size=50), covers[0], whole, 2, None)
+    with pytest.raises(stego.NoPayloadError, match='whole payload, not a shard'):
+        stego.extract_shards(shards + [whole], out, 2)
+    assert not (tmp_path / 'out.bin').exists()
+
+
+def test_a_lone_shard_of_a_split_is_refused(covers, make_message, tmp_path):
+    shards = split(make_message(size=400), covers, tmp_path, 'shards')
+    with pytest.raises(stego.NoPayloadError, match='shard 2 of 3; extract it together'):
+        stego.extract(shards[1], str(tmp_path / 'out.bin'), 2, None)
+    # a payload that fits one cover is a single shard, which extracts on its own
+    message = make_message('small.bin', size=100)
+    single = split(message, covers, tmp_path, 'single')
+    assert len(single) == 1
+    assert stego.extract_bytes(open(single[0], 'rb').read(), 2) == open(message, 'rb').read()
+
+
+def test_shards_need_enough_covers(covers, make_message, tmp_path):
+    with pytest.raises(stego.CapacityError, match='covers hold'):
+        split(make_message(size=2000), covers, tmp_path, 'shards')
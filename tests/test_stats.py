@@ -0,0 +1,54 @@
+import pytest
+
+import stego
+
+HIDE_STAGES = {'read_message', 'open', 'compress', 'checksum', 'bits', 'decode', 'encode', 'save'}
+
+
+@pytest.mark.parametrize('mode', ['overwrite', 'adaptive'])
+def test_hide_and_extract_stats(make_cover, make_message, tmp_path, mode):
+    message, out = make_message(size=800), str(tmp_path / 'stego.png')
+    st = stego.Stats()
+    stego.hide(message, make_cover(shape=(256, 256)), out, 2, None, stats=st, mode=mode,
+               compress='zlib', checksum='crc32')
+    assert set(st.stages) == HIDE_STAGES
+    c = st.counters
+    assert c['message_bytes'] == 800 and c['pixels'] == 256 * 256
+    assert c['payload_bits'] == c['runs_emitted'] == 8 * (c['payload_bytes'] + 12)  # extended header, crc32
+    assert 0 < c['lsb_flips'] < c['pixels_used'] <= c['pixels']
+
+    st = stego.Stats()
+    stego.extract(out, str(tmp_path / 'out.bin'), 2, None, stats=st)
+    assert set(st.stages) == {'open', 'rle_decode', 'pack', 'checksum', 'decompress', 'write'}
+    assert st.counters['runs_decoded'] == c['payload_bits']
+    assert st.counters['payload_bytes'] == c['payload_bytes']
+    assert st.counters['message_bytes'] == 800
+    assert st.counters['pixels'] == 256 * 256
+    assert c['pixels_used'] <= st.counters['pixels_scanned'] <= 256 * 256
+
+    st = stego.Stats()
+    stego.extract(out, str(tmp_path / 'out.bin'), 'auto', None, stats=st)
+    assert 'detect_min_run' in st.stages
+
+
+def test_inplace_hide_stats(make_cover, make_message, tmp_path):
+    st = stego.Stats()
+    stego.hide(make_message(size=300), make_cover(shape=(128, 128)), str(tmp_path / 'stego.bmp'),
+               2, None, in_place=True, stats=st)
+    assert set(st.stages) == {'read_message', 'compress', 'copy', 'bits', 'encode_inplace'}
+    assert st.counters['message_bytes'] == st.counters['payload_bytes'] == 300
+    assert st.counters['payload_bits'] == 8 * (300 + 4)
+    assert 'pixels' not in st.counters and st.counters['pixels_used'] > 0
+
+
+def test_stats_as_dict_adds_up_the_stages():
+    st = stego.Stats()
+    with st.stage('a'):
+        pass
+    with st.stage('a'):
+        pass
+    st.count('bytes', 3)
+    st.count('bytes', 4)
+    d = st.as_dict()
+    assert set(d['stages']) == {'a'} and d['total_s'] == d['stages']['a']
+    assert d['counters'] == {'bytes': 7}
@@ -0,0 +1,112 @@
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+
+@pytest.mark.parametrize('codec', ['none', 'zlib', 'bz2', 'lzma'])
+def test_iter_extract_streams_the_payload(make_cover, codec):
+    data = bytes(range(256)) * 4 + bytes(1000)
+    img = stego.open_image(stego.hide_bytes(data, make_cover(shape=(256, 256)), M=2,
+                                            compress=codec, checksum='crc32'))
+    pieces = list(stego.iter_extract(img, 2, block_bits=512))
+    assert len(pieces) > 1
+    assert b''.join(pieces) == data
+
+
+class NestingStats(stego.Stats):
+    # records stages entered while another one is still timing
+    def __init__(self):
+        super().__init__()
+        self.active, self.nested = [], []
+
+    @contextmanager
+    def stage(self, name):
+        if self.active:
+            self.nested.append((self.active[-1], name))
+        self.active.append(name)
+        try:
+            with super().stage(name):
+                yield
+        finally:
+            self.active.pop()
+
+
+def test_iter_extract_stages_do_not_overlap(make_cover):
+    # each stage is timed once, so the per-stage breakdown adds up to the call
+    data = bytes(range(256)) * 8 + bytes(20000)
+    img = stego.open_image(stego.hide_bytes(data, make_cover(shape=(128, 128)), M=2,
+                                            compress='zlib'))
+    st = NestingStats()
+    assert b''.join(stego.iter_extract(img, 2, stats=st, block_bits=1024)) == data
+    assert {'rle_decode', 'pack', 'decompress'} <= set(st.stages)
+    assert st.nested == []
+    assert st.counters['message_bytes'] == len(data)
+
+
+def test_extract_writes_stdout(make_cover, make_message, tmp_path, capsysbinary):
+    message, out = make_message(size=150), str(tmp_path / 'stego.bmp')
+    stego.hide(message, make_cover(), out, 2, None)
+    stego.extract(out, '-', 2, None)
+    assert capsysbinary.readouterr().out == open(message, 'rb').read()
+
+
+def test_extract_stops_once_the_payload_is_decoded(make_cover, tmp_path, monkeypatch):
+    monkeypatch.setattr(stego, 'STRIP_SAMPLES', 4000)
+    rows = []
+    read_rows = stego.StripReader._read_rows
+    monkeypatch.setattr(stego.StripReader, '_read_rows',
+                        lambda self, f, a, b: rows.append(b) or read_rows(self, f, a, b))
+    out, result = str(tmp_path / 'stego.bmp'), str(tmp_path / 'out.txt')
+    open(str(tmp_path / 'secret.txt'), 'wb').write(b'hidden' * 13)
+    stego.hide(str(tmp_path / 'secret.txt'), make_cover(shape=(800, 400)), out, 2, None)
+    rows.clear()
+    st = stego.Stats()
+    stego.extract(out, result, 2, None, stats=st)
+    assert open(result, 'rb').read() == b'hidden' * 13
+    # 78 bytes need about 1600 samples: the first strip of 10 rows of 400 holds them
+    assert max(rows) == 10
+    assert st.counters['pixels_scanned'] == 4000
+
+
+class FullDisk:
+    # a file whose writes fail after the first, like a disk filling up
+    def __init__(self, f):
+        self.f, self.writes = f, 0
+
+    def write(self, data):
+        self.writes += 1
+        if self.writes > 1:
+            raise OSError(28, 'No space left on device')
+        return self.f.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+
+def test_extract_leaves_no_partial_message(make_cover, make_message, tmp_path, monkeypatch):
+    monkeypatch.setattr(stego, 'IO_BLOCK', 256)
+    out, result = str(tmp_path / 'stego.png'), tmp_path / 'out.bin'
+    stego.hide(make_message(size=3000), make_cover(shape=(256, 256)), out, 2, None,
+               checksum='crc32')
+    result.write_bytes(b'previous')
+    monkeypatch.setattr(stego, 'open', lambda *args: FullDisk(open(*args)), raising=False)
+    with pytest.raises(stego.StegoError, match="cannot write message file .*No space left"):
+        stego.extract(out, str(result), 2, None)
+    monkeypatch.undo()
+
+    # a checksum mismatch is only found once every block has been written
+    arr = np.asarray(Image.open(out)).copy()
+    flat = arr.reshape(-1)
+    starts, lengths = stego.find_runs(flat & 1)
+    k = next(k for k in range(200, len(lengths)) if (lengths[k], lengths[k + 1]) == (2, 3))
+    flat[starts[k + 1]] ^= 1
+    Image.fromarray(arr).save(out)
+    with pytest.raises(stego.NoPayloadError, match='fails its crc32 check'):
+        stego.extract(out, str(result), 2, None)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['cover.bmp', 'message.bin', 'out.bin',
+                                                          'stego.png']
+    assert result.read_bytes() == b'previous'
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+
+@pytest.fixture
+def small_strips(monkeypatch):
+    monkeypatch.setattr(stego, 'STRIP_SAMPLES', 1000)  # 64-pixel rows: 15 rows a strip
+
+
+@pytest.mark.parametrize('mode, ext', [('L', '.bmp'), ('RGB', '.bmp'), ('RGBA', '.png'),
+                                       ('I;16', '.png')])
+def test_strip_hide_matches_hide_image(small_strips, make_cover, make_message, tmp_path,
+                                       mode, ext):
+    cover, message = make_cover(f'cover{ext}', mode=mode), make_message(size=120)
+    out = str(tmp_path / f'stego{ext}')
+    stego.hide(message, cover, out, 2, None, checksum='crc32')
+    expected = stego.hide_image(open(message, 'rb').read(), Image.open(cover), 2,
+                                checksum='crc32')
+    assert np.array_equal(np.asarray(Image.open(out)), np.asarray(expected))
+    if ext == '.bmp':
+        buf = tmp_path / 'expected.bmp'
+        expected.save(buf)
+        assert open(out, 'rb').read() == buf.read_bytes()
+    assert stego.extract_bytes(out, M=2) == open(message, 'rb').read()
+
+
+def test_strip_hide_progress_counts_rows(small_strips, make_cover, make_message, tmp_path):
+    calls = []
+    stego.hide(make_message(size=20), make_cover(), str(tmp_path / 'stego.bmp'), 2, None,
+               progress=lambda done, total: calls.append((done, total)))
+    assert len(calls) == 5  # 64 rows, 15 a strip
+    assert all(total == 64 for _, total in calls)
+    assert [done for done, _ in calls] == [15, 30, 45, 60, 64]
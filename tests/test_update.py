@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+
+def pixels(path):
+    return np.asarray(Image.open(path))
+
+
+@pytest.fixture
+def stego_bmp(make_cover, tmp_path):
+    # (cover, stego) with a 150-byte message and no checksum, which would sit in the
+    # header and move every run after it when the message changes
+    cover = make_cover(shape=(128, 128))
+    old = tmp_path / 'old.bin'
+    old.write_bytes(bytes(range(150)))
+    out = str(tmp_path / 'stego.bmp')
+    stego.hide(str(old), cover, out, 2, None)
+    return cover, out
+
+
+@pytest.mark.parametrize('M', [2, 4])
+def test_update_matches_a_fresh_embed(make_cover, tmp_path, M):
+    cover, old, new = make_cover(shape=(128, 128)), tmp_path / 'old.bin', tmp_path / 'new.bin'
+    old.write_bytes(bytes(range(100)))
+    new.write_bytes(bytes(range(100)) + b'appended')
+    stego.hide(str(old), cover, str(tmp_path / 'stego.png'), M, None, compress='zlib')
+    stego.hide(str(new), cover, str(tmp_path / 'fresh.png'), M, None, compress='zlib')
+    result = stego.update(str(new), str(tmp_path / 'stego.png'), str(tmp_path / 'updated.png'), M)
+    assert result['start'] is not None
+    assert np.array_equal(pixels(tmp_path / 'updated.png'), pixels(tmp_path / 'fresh.png'))
+
+
+def test_update_patches_changed_rows_of_a_bmp(stego_bmp, tmp_path):
+    cover, out = stego_bmp
+    before = pixels(out).copy()
+    new = tmp_path / 'new.bin'
+    new.write_bytes(bytes(range(149)) + b'\xff')
+    result = stego.update(str(new), out)
+    assert result['rows'] <= 2
+    changed = np.flatnonzero((pixels(out) != before).any(axis=1))
+    assert len(changed) == result['rows']
+    assert stego.extract_bytes(out, M=2) == new.read_bytes()
+    stego.hide(str(new), cover, str(tmp_path / 'fresh.bmp'), 2, None)
+    assert np.array_equal(pixels(out), pixels(tmp_path / 'fresh.bmp'))
+
+
+def test_update_shorter_and_unchanged(stego_bmp, tmp_path):
+    _, out = stego_bmp
+    short = tmp_path / 'short.bin'
+    short.write_bytes(b'short')
+    result = stego.update(str(short), out)
+    assert stego.extract_bytes(out, M=2) == b'short'
+    # the old payload's tail is left with no runs that could carry bits
+    _, lengths = stego.find_runs(pixels(out).reshape(-1)[result['stop'] - 200:result['stop']] & 1)
+    assert lengths.max() == 1
+    assert stego.update(str(short), out)['start'] is None
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import stego
+
+
+def run_verify(monkeypatch, capsys, *args):
+    # `verify` on the command line: (exit code, output)
+    monkeypatch.setattr('sys.argv', ['stego.py', 'verify', *args])
+    try:
+        stego.main()
+        code = 0
+    except SystemExit as e:
+        code = e.code
+    return code, capsys.readouterr().out
+
+
+@pytest.fixture
+def stego_image(make_cover, make_message, tmp_path):
+    # stego_image(name, checksum) hides 300 bytes at M=2 into a fresh PNG
+    def make(name='stego.png', checksum='crc32'):
+        out = str(tmp_path / name)
+        stego.hide(make_message(size=300), make_cover(shape=(128, 128)), out, 2, None,
+                   checksum=checksum)
+        return out
+    return make
+
+
+def test_verify_passes_clean_images(stego_image, monkeypatch, capsys):
+    images = [stego_image('a.png', 'crc32'), stego_image('b.png', 'blake2'),
+              stego_image('c.png', 'none')]
+    code, out = run_verify(monkeypatch, capsys, *images, '-M', '2')
+    assert code == 0
+    assert "a.png': 300 bytes, crc32 ok" in out and "b.png': 300 bytes, blake2 ok" in out
+    assert "(?): " in out and "c.png': 300 bytes, complete but no checksum" in out
+    assert '3 images, 0 failed' in out
+    code, out = run_verify(monkeypatch, capsys, images[0], '-M', 'auto')
+    assert code == 0 and 'crc32 ok (M=2)' in out
+
+
+def test_verify_reports_a_flipped_payload_lsb(stego_image, tmp_path, monkeypatch, capsys):
+    path = stego_image()
+    arr = np.asarray(Image.open(path)).copy()
+    flat = arr.reshape(-1)
+    # swap a payload bit pair: runs of M, M + 1 become M + 1, M, so the length holds
+    starts, lengths = stego.find_runs(flat & 1)
+    k = next(k for k in range(200, len(lengths)) if (lengths[k], lengths[k + 1]) == (2, 3))
+    flat[starts[k + 1]] ^= 1
+    damaged = str(tmp_path / 'damaged.png')
+    Image.fromarray(arr).save(damaged)
+    code, out = run_verify(monkeypatch, capsys, path, damaged, '-M', '2')
+    assert code == 1
+    assert "(✗): '" + damaged + "': crc32 mismatch" in out
+    assert '2 images, 1 failed' in out
+    with pytest.raises(stego.NoPayloadError, match='fails its crc32 check'):
+        stego.extract(damaged, str(tmp_path / 'out.bin'), 2, None)
+
+
+def test_verify_fails_fast_on_an_impossible_length(make_cover, tmp_path, monkeypatch, capsys):
+    cover = Image.open(make_cover(shape=(128, 128)))
+    flat = np.asarray(cover).reshape(-1).copy()
+    # a bare length header claiming far more than 128 x 128 samples can hold
+    stego.embed_lsbs(flat, np.unpackbits(np.frombuffer((10 ** 6).to_bytes(4, 'big'), np.uint8)), 2)
+    path = str(tmp_path / 'bogus.png')
+    Image.fromarray(flat.reshape(128, 128)).save(path)
+    code, out = run_verify(monkeypatch, capsys, path, '-M', '2')
+    assert code == 1
+    assert 'header claims 1000000 bytes but this image holds at most' in out